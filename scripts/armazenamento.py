@@ -0,0 +1,426 @@
+import errno
+import json
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+
+from construtor_acl import HERANCA, INHERITED_ACE
+from resolvedor_principais import ResolvedorFalso, ResolvedorPosix, ResolvedorWindows
+
+# Atributo estendido onde o modelo de ACL é guardado no backend POSIX
+XATTR_ACL = 'user.reorganizacao.acl'
+
+# Bits de acesso NT usados para derivar as permissões POSIX do grupo
+FILE_READ_DATA = 0x1
+FILE_WRITE_DATA = 0x2
+
+# Entrada de uma listagem; mtime (ns) só é preenchido para pastas
+EntradaPasta = namedtuple('EntradaPasta', ['nome', 'e_pasta', 'mtime'])
+
+
+class Armazenamento:
+    """
+    Interface do sistema de arquivos usada pelos scripts de geração.
+
+    ACLs são listas de ``(flags, mascara, sid)`` no formato das ACEs NTFS; cada
+    implementação conta as operações realizadas em ``operacoes``.
+    """
+
+    nome = None
+
+    def __init__(self):
+        self.operacoes = Counter()
+        self._lock_contagem = threading.Lock()
+
+    def _contar(self, operacao):
+        with self._lock_contagem:
+            self.operacoes[operacao] += 1
+
+    # Cria a pasta (e os pais ausentes); devolve False se ela já existia
+    def criar_pasta(self, caminho):
+        raise NotImplementedError
+
+    def existe(self, caminho):
+        raise NotImplementedError
+
+    def renomear(self, origem, destino):
+        raise NotImplementedError
+
+    # Entradas diretas de uma pasta: [EntradaPasta]
+    def listar(self, caminho):
+        raise NotImplementedError
+
+    # Data de modificação (ns) da pasta, que muda quando entradas são criadas/removidas nela
+    def mtime(self, caminho):
+        raise NotImplementedError
+
+    def ler_acl(self, caminho):
+        raise NotImplementedError
+
+    # Grava as entradas [(flags, mascara, sid)]; com propagar=True a ACL fica protegida
+    # e as entradas herdáveis são repassadas às subpastas existentes
+    def gravar_acl(self, caminho, aces, propagar=False):
+        raise NotImplementedError
+
+    # Resolvedor de grupos adequado ao backend
+    def resolvedor_padrao(self):
+        raise NotImplementedError
+
+    def relatorio(self):
+        total = sum(self.operacoes.values())
+        detalhes = ', '.join(f"{operacao}={quantidade}" for operacao, quantidade in sorted(self.operacoes.items()))
+        return f"{total} operações no backend {self.nome} ({detalhes or 'nenhuma'})"
+
+
+# Função para listar uma pasta com os.scandir (no Windows o mtime vem da própria listagem)
+def _listar_scandir(caminho):
+    with os.scandir(caminho) as entradas:
+        listagem = []
+        for entrada in entradas:
+            e_pasta = entrada.is_dir(follow_symlinks=False)
+            mtime = entrada.stat(follow_symlinks=False).st_mtime_ns if e_pasta else None
+            listagem.append(EntradaPasta(entrada.name, e_pasta, mtime))
+        return listagem
+
+
+class ArmazenamentoNtfs(Armazenamento):
+    """Pastas e DACLs reais em NTFS (pywin32 importado só quando necessário)."""
+
+    nome = 'ntfs'
+
+    def criar_pasta(self, caminho):
+        self._contar('criar_pasta')
+        try:
+            os.makedirs(caminho)
+            return True
+        except FileExistsError:
+            return False
+
+    def existe(self, caminho):
+        self._contar('existe')
+        return os.path.isdir(caminho)
+
+    def renomear(self, origem, destino):
+        self._contar('renomear')
+        os.rename(origem, destino)
+
+    def listar(self, caminho):
+        self._contar('listar')
+        return _listar_scandir(caminho)
+
+    def mtime(self, caminho):
+        self._contar('mtime')
+        return os.stat(caminho).st_mtime_ns
+
+    def ler_acl(self, caminho):
+        import win32security
+
+        self._contar('ler_acl')
+        sd = win32security.GetFileSecurity(caminho, win32security.DACL_SECURITY_INFORMATION)
+        dacl = sd.GetSecurityDescriptorDacl()
+        aces = []
+        if dacl is not None:
+            for i in range(dacl.GetAceCount()):
+                (tipo, flags), mascara, sid = dacl.GetAce(i)
+                aces.append((flags, mascara, sid))
+        return aces
+
+    def gravar_acl(self, caminho, aces, propagar=False):
+        import win32security
+
+        self._contar('gravar_acl')
+        nova_dacl = win32security.ACL()
+        for flags, mascara, sid in aces:
+            nova_dacl.AddAccessAllowedAceEx(win32security.ACL_REVISION, flags, mascara, sid)
+
+        if propagar:
+            # SetNamedSecurityInfo repassa as entradas herdáveis às subpastas já existentes
+            win32security.SetNamedSecurityInfo(
+                caminho, win32security.SE_FILE_OBJECT,
+                win32security.DACL_SECURITY_INFORMATION | win32security.PROTECTED_DACL_SECURITY_INFORMATION,
+                None, None, nova_dacl, None
+            )
+        else:
+            sd = win32security.SECURITY_DESCRIPTOR()
+            sd.SetSecurityDescriptorDacl(1, nova_dacl, 0)
+            win32security.SetFileSecurity(caminho, win32security.DACL_SECURITY_INFORMATION, sd)
+
+    def resolvedor_padrao(self):
+        return ResolvedorWindows()
+
+
+class _ArmazenamentoModelado(Armazenamento):
+    """
+    Base dos backends que simulam a herança de ACL do NTFS.
+
+    Cada pasta guarda ``(protegida, aces)``; ao ser criada recebe as entradas
+    herdáveis do pai, e ``gravar_acl(propagar=True)`` as repassa às subpastas
+    não protegidas, como o SetNamedSecurityInfo.
+    """
+
+    def _ler_registro(self, caminho):
+        raise NotImplementedError
+
+    def _gravar_registro(self, caminho, protegida, aces):
+        raise NotImplementedError
+
+    def _subpastas(self, caminho):
+        raise NotImplementedError
+
+    def _existe(self, caminho):
+        raise NotImplementedError
+
+    def _mkdir(self, caminho):
+        raise NotImplementedError
+
+    @staticmethod
+    def _herdaveis(aces):
+        return [(HERANCA | INHERITED_ACE, mascara, sid) for flags, mascara, sid in aces if flags & HERANCA]
+
+    def criar_pasta(self, caminho):
+        self._contar('criar_pasta')
+        faltantes = []
+        atual = os.path.normpath(caminho)
+        while not self._existe(atual):
+            faltantes.append(atual)
+            pai = os.path.dirname(atual)
+            if pai == atual:
+                break
+            atual = pai
+        if not faltantes:
+            return False
+
+        for pasta in reversed(faltantes):
+            try:
+                self._mkdir(pasta)
+            except FileExistsError:
+                continue
+            pai = os.path.dirname(pasta)
+            herdadas = self._herdaveis(self._ler_registro(pai)[1]) if self._existe(pai) else []
+            self._gravar_registro(pasta, False, herdadas)
+        return True
+
+    def ler_acl(self, caminho):
+        self._contar('ler_acl')
+        return list(self._ler_registro(os.path.normpath(caminho))[1])
+
+    def gravar_acl(self, caminho, aces, propagar=False):
+        self._contar('gravar_acl')
+        caminho = os.path.normpath(caminho)
+        if not self._existe(caminho):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), caminho)
+        if not propagar:
+            protegida = self._ler_registro(caminho)[0]
+            self._gravar_registro(caminho, protegida, list(aces))
+            return
+
+        explicitas = [(flags & ~INHERITED_ACE, mascara, sid) for flags, mascara, sid in aces]
+        self._gravar_registro(caminho, True, explicitas)
+        self._propagar(caminho, self._herdaveis(explicitas))
+
+    def _propagar(self, caminho, herdadas):
+        pendentes = [(subpasta, herdadas) for subpasta in self._subpastas(caminho)]
+        while pendentes:
+            pasta, herdadas_pai = pendentes.pop()
+            protegida, aces = self._ler_registro(pasta)
+            if protegida:
+                continue
+            novas = [ace for ace in aces if not ace[0] & INHERITED_ACE] + herdadas_pai
+            self._gravar_registro(pasta, False, novas)
+            herdadas_filhas = self._herdaveis(novas)
+            pendentes.extend((subpasta, herdadas_filhas) for subpasta in self._subpastas(pasta))
+
+
+class ArmazenamentoPosix(_ArmazenamentoModelado):
+    """
+    Pastas POSIX com o modelo de ACL em atributo estendido (``user.reorganizacao.acl``).
+
+    Os bits de modo do grupo acompanham a ACL (rwx com escrita, r-x só com leitura),
+    com setgid para que as subpastas mantenham o grupo.
+    """
+
+    nome = 'posix'
+
+    def _existe(self, caminho):
+        return os.path.isdir(caminho)
+
+    def _mkdir(self, caminho):
+        os.mkdir(caminho)
+
+    def _subpastas(self, caminho):
+        with os.scandir(caminho) as entradas:
+            return [entrada.path for entrada in entradas if entrada.is_dir(follow_symlinks=False)]
+
+    def _ler_registro(self, caminho):
+        try:
+            registro = json.loads(os.getxattr(caminho, XATTR_ACL))
+        except OSError as e:
+            if e.errno in (errno.ENODATA, getattr(errno, 'ENOATTR', errno.ENODATA)):
+                return False, []
+            raise
+        return registro['protegida'], [tuple(ace) for ace in registro['aces']]
+
+    def _gravar_registro(self, caminho, protegida, aces):
+        registro = {'protegida': protegida, 'aces': [list(ace) for ace in aces]}
+        os.setxattr(caminho, XATTR_ACL, json.dumps(registro).encode('utf-8'))
+        os.chmod(caminho, self._modo(aces))
+
+    @staticmethod
+    def _modo(aces):
+        mascaras = 0
+        for _, mascara, _ in aces:
+            mascaras |= mascara
+        if mascaras & FILE_WRITE_DATA:
+            grupo = 0o070
+        elif mascaras & FILE_READ_DATA:
+            grupo = 0o050
+        else:
+            grupo = 0
+        return 0o2700 | grupo
+
+    def existe(self, caminho):
+        self._contar('existe')
+        return self._existe(caminho)
+
+    def renomear(self, origem, destino):
+        self._contar('renomear')
+        os.rename(origem, destino)
+
+    def listar(self, caminho):
+        self._contar('listar')
+        return _listar_scandir(caminho)
+
+    def mtime(self, caminho):
+        self._contar('mtime')
+        return os.stat(caminho).st_mtime_ns
+
+    def resolvedor_padrao(self):
+        return ResolvedorPosix()
+
+
+class ArmazenamentoMemoria(_ArmazenamentoModelado):
+    """Sistema de arquivos em memória, com latência opcional por operação (benchmarks e testes)."""
+
+    nome = 'memoria'
+
+    def __init__(self, latencia=0.0):
+        super().__init__()
+        self.latencia = latencia
+        self._pastas = {}
+        self._filhos = {}
+        self._mtimes = {}
+        self._lock = threading.RLock()
+
+    def _tocar(self, caminho):
+        self._mtimes[caminho] = time.time_ns()
+
+    def _esperar(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _existe(self, caminho):
+        return caminho in self._pastas or os.path.dirname(caminho) == caminho
+
+    def _mkdir(self, caminho):
+        self._esperar()
+        with self._lock:
+            if caminho in self._pastas:
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), caminho)
+            pai = os.path.dirname(caminho)
+            if not self._existe(pai):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), pai)
+            self._pastas[caminho] = (False, [])
+            self._filhos.setdefault(pai, set()).add(caminho)
+            self._tocar(caminho)
+            self._tocar(pai)
+
+    def _subpastas(self, caminho):
+        with self._lock:
+            return list(self._filhos.get(caminho, ()))
+
+    def _ler_registro(self, caminho):
+        with self._lock:
+            registro = self._pastas.get(caminho)
+        if registro is None:
+            if os.path.dirname(caminho) == caminho:
+                return False, []
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), caminho)
+        return registro
+
+    def _gravar_registro(self, caminho, protegida, aces):
+        self._esperar()
+        with self._lock:
+            self._pastas[caminho] = (protegida, list(aces))
+
+    def existe(self, caminho):
+        self._contar('existe')
+        self._esperar()
+        with self._lock:
+            return self._existe(os.path.normpath(caminho))
+
+    def renomear(self, origem, destino):
+        self._contar('renomear')
+        self._esperar()
+        origem = os.path.normpath(origem)
+        destino = os.path.normpath(destino)
+        with self._lock:
+            if origem not in self._pastas:
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), origem)
+            if destino in self._pastas:
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destino)
+            if not self._existe(os.path.dirname(destino)):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), os.path.dirname(destino))
+
+            # Move a pasta e toda a subárvore
+            prefixo = origem + os.sep
+            movidas = [caminho for caminho in self._pastas if caminho == origem or caminho.startswith(prefixo)]
+            for caminho in movidas:
+                novo = destino + caminho[len(origem):]
+                self._pastas[novo] = self._pastas.pop(caminho)
+                if caminho in self._filhos:
+                    self._filhos[novo] = {destino + filho[len(origem):] for filho in self._filhos.pop(caminho)}
+                self._mtimes[novo] = self._mtimes.pop(caminho, 0)
+            self._filhos[os.path.dirname(origem)].discard(origem)
+            self._filhos.setdefault(os.path.dirname(destino), set()).add(destino)
+            self._tocar(os.path.dirname(origem))
+            self._tocar(os.path.dirname(destino))
+
+    def listar(self, caminho):
+        self._contar('listar')
+        self._esperar()
+        caminho = os.path.normpath(caminho)
+        with self._lock:
+            if not self._existe(caminho):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), caminho)
+            return [
+                EntradaPasta(os.path.basename(filho), True, self._mtimes.get(filho, 0))
+                for filho in sorted(self._filhos.get(caminho, ()))
+            ]
+
+    def mtime(self, caminho):
+        self._contar('mtime')
+        self._esperar()
+        caminho = os.path.normpath(caminho)
+        with self._lock:
+            if not self._existe(caminho):
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), caminho)
+            return self._mtimes.get(caminho, 0)
+
+    def resolvedor_padrao(self):
+        return ResolvedorFalso(aceitar_qualquer=True)
+
+
+BACKENDS = {
+    ArmazenamentoNtfs.nome: ArmazenamentoNtfs,
+    ArmazenamentoPosix.nome: ArmazenamentoPosix,
+    ArmazenamentoMemoria.nome: ArmazenamentoMemoria,
+}
+
+
+# Função para criar o backend pelo nome (padrão: ntfs no Windows, posix nos demais sistemas)
+def criar_armazenamento(nome=None, **opcoes):
+    nome = nome or ('ntfs' if os.name == 'nt' else 'posix')
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de armazenamento desconhecido: {nome} (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[nome](**opcoes)
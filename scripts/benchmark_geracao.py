@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import CHAR, Column, Index, Integer, MetaData, String, Table, Text, bindparam, create_engine, event, insert, select, update
+from sqlalchemy.engine import Engine
+
+from armazenamento import BACKENDS, criar_armazenamento
+from inventario_pastas import preparar_inventario
+from indice_estruturas import ID_PASTA_ANO, ID_PASTA_EMPRESA, ID_PASTA_MES, IndiceEstruturas
+from modelo_estruturas import compilar_modelos
+from resolvedor_principais import CacheResolvedor, ResolvedorFalso
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Escala padrão (ajustável pela linha de comando)
+EMPRESAS_PADRAO = 200
+PROFUNDIDADE_PADRAO = 8
+RAMIFICACAO_PADRAO = 3
+FRACAO_RENOMEAR_PADRAO = 0.1
+
+
+# Função para criar, no banco de benchmark, as tabelas WeBotPastas* com o mesmo formato de src/models.py
+def criar_esquema_sintetico(engine):
+    metadata = MetaData()
+    Table('WeBotPastasPastas', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nomepasta', String(255)))
+    Table('WeBotPastasEstruturas', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('WeBotPastas_pasta_id', Integer),
+          Column('auto', String(10)),
+          Column('gerado', String(10)),
+          Column('pai_id', Integer, index=True),
+          Column('replicar_para_empresas', Integer, server_default='0'))
+    Table('WeBotPastasEmpresas', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nome', String(255)),
+          Column('cnpj', String(20)),
+          Column('nomepasta', String(255)),
+          Column('gerado', String(10)),
+          Column('razao_social_atualizar', CHAR(1), server_default='N'))
+    Table('WeBotPastasEmpresasEstruturas', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('empresa_id', Integer),
+          Column('estrutura_id', Integer),
+          Column('nomepasta', String(255)),
+          Column('caminho_completo', String(255)),
+          Column('nivel', Integer),
+          Column('gerado', CHAR(1), server_default='N'),
+          Column('razao_social_atualizar', CHAR(1), server_default='N'),
+          Column('old_path', Text),
+          Index('empresa_id', 'empresa_id'),
+          Index('estrutura_id', 'estrutura_id'))
+    Table('WeBotPastasgrupos', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nome', String(255)))
+    Table('WeBotPastastipos_permissao', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('nome', String(50)))
+    Table('WeBotPastasPermissoes', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('estrutura_id', Integer, index=True),
+          Column('grupo_id', Integer),
+          Column('permissao_id', Integer))
+    metadata.create_all(engine)
+    return metadata
+
+
+# Função para montar o modelo sintético: uma "espinha" de `profundidade` níveis abaixo da
+# pasta da empresa, com `ramificacao` filhos por nível e ANO/MÊS nos níveis 2 e 3
+def gerar_modelo_sintetico(profundidade, ramificacao):
+    pastas = {
+        1: 'Arquivo Digital', 2: 'Empresas', ID_PASTA_EMPRESA: 'AutoPastaWebot - Empresas',
+        ID_PASTA_ANO: 'AutoPastaWebot - ANO', ID_PASTA_MES: 'AutoPastaWebot - MÊS',
+    }
+    estruturas = [(1, 1, 'N', None), (2, 2, 'N', 1), (3, ID_PASTA_EMPRESA, 'S', 2)]
+    proximo_pasta = 1000
+    espinha = 3
+    for nivel in range(1, profundidade + 1):
+        primeiro_filho = None
+        for i in range(ramificacao):
+            if i == 0 and nivel == 2:
+                pasta_id = ID_PASTA_ANO
+            elif i == 0 and nivel == 3:
+                pasta_id = ID_PASTA_MES
+            else:
+                pasta_id = proximo_pasta
+                pastas[pasta_id] = f"Nivel {nivel} - Pasta {i + 1}"
+                proximo_pasta += 1
+            estrutura_id = len(estruturas) + 1
+            estruturas.append((estrutura_id, pasta_id, 'S', espinha))
+            if primeiro_filho is None:
+                primeiro_filho = estrutura_id
+        espinha = primeiro_filho
+    return pastas, estruturas
+
+
+# Função para gravar os dados sintéticos (modelo, permissões e empresas) no banco de benchmark
+def gerar_dados_sinteticos(engine, empresas, profundidade, ramificacao):
+    metadata = criar_esquema_sintetico(engine)
+    tabelas = metadata.tables
+    pastas, estruturas = gerar_modelo_sintetico(profundidade, ramificacao)
+
+    grupos = ['G-Admin', 'G-Empresas', 'G-Leitura'] + [f"G-Setor {i + 1}" for i in range(ramificacao)]
+    permissoes = [(1, 1, 3), (3, 1, 3), (3, 2, 1)]
+    for estrutura_id, _, _, pai_id in estruturas[3:]:
+        if pai_id == 3:
+            # Cada setor (filho da pasta da empresa) tem o seu grupo com Modify
+            permissoes.append((estrutura_id, 4 + len([p for p in permissoes if p[2] == 2]), 2))
+        elif estrutura_id % 5 == 0:
+            permissoes.append((estrutura_id, 3, 1))
+
+    with engine.begin() as conn:
+        conn.execute(insert(tabelas['WeBotPastasPastas']), [
+            {'id': pasta_id, 'nomepasta': nome} for pasta_id, nome in pastas.items()
+        ])
+        conn.execute(insert(tabelas['WeBotPastasEstruturas']), [
+            {'id': estrutura_id, 'WeBotPastas_pasta_id': pasta_id, 'auto': auto, 'gerado': 'N', 'pai_id': pai_id}
+            for estrutura_id, pasta_id, auto, pai_id in estruturas
+        ])
+        conn.execute(insert(tabelas['WeBotPastasgrupos']), [
+            {'id': i + 1, 'nome': nome} for i, nome in enumerate(grupos)
+        ])
+        conn.execute(insert(tabelas['WeBotPastastipos_permissao']), [
+            {'id': 1, 'nome': 'ReadAndExecute'}, {'id': 2, 'nome': 'Modify'}, {'id': 3, 'nome': 'FullControl'}
+        ])
+        conn.execute(insert(tabelas['WeBotPastasPermissoes']), [
+            {'id': i + 1, 'estrutura_id': estrutura_id, 'grupo_id': grupo_id, 'permissao_id': permissao_id}
+            for i, (estrutura_id, grupo_id, permissao_id) in enumerate(permissoes)
+        ])
+        conn.execute(insert(tabelas['WeBotPastasEmpresas']), [
+            {'id': i, 'nome': f"Empresa {i} LTDA", 'cnpj': f"{i:014d}", 'nomepasta': f"Empresa {i}", 'gerado': 'N'}
+            for i in range(1, empresas + 1)
+        ])
+    return {'pastas': len(pastas), 'estruturas': len(estruturas), 'permissoes': len(permissoes), 'grupos': len(grupos)}
+
+
+# Função para simular a troca de razão social de uma fração das empresas já geradas
+# (old_path = caminho atual; caminho_completo com o novo nome; razao_social_atualizar = 'S')
+def marcar_renomeacoes(engine, fracao):
+    metadata = MetaData()
+    metadata.reflect(engine, only=['WeBotPastasEmpresas', 'WeBotPastasEmpresasEstruturas'])
+    empresas = metadata.tables['WeBotPastasEmpresas']
+    empresas_estruturas = metadata.tables['WeBotPastasEmpresasEstruturas']
+
+    with engine.begin() as conn:
+        lista = conn.execute(select(empresas.c.id, empresas.c.nomepasta).order_by(empresas.c.id)).fetchall()
+        passo = max(1, round(1 / fracao)) if fracao > 0 else 0
+        renomeadas = {empresa.id: empresa.nomepasta for empresa in lista[::passo]} if passo else {}
+        if not renomeadas:
+            return 0
+
+        conn.execute(
+            update(empresas).where(empresas.c.id.in_(renomeadas)).values(
+                nomepasta=empresas.c.nomepasta + ' (Nova)', razao_social_atualizar='S'
+            )
+        )
+
+        linhas = conn.execute(
+            select(empresas_estruturas.c.id, empresas_estruturas.c.empresa_id, empresas_estruturas.c.caminho_completo)
+            .where(empresas_estruturas.c.empresa_id.in_(renomeadas))
+        ).fetchall()
+        alteracoes = []
+        for linha in linhas:
+            antigo = renomeadas[linha.empresa_id]
+            separador = os.sep + antigo
+            posicao = linha.caminho_completo.find(separador)
+            if posicao < 0:
+                continue
+            fim = posicao + len(separador)
+            if fim < len(linha.caminho_completo) and linha.caminho_completo[fim] != os.sep:
+                continue
+            novo = linha.caminho_completo[:fim] + ' (Nova)' + linha.caminho_completo[fim:]
+            alteracoes.append({'b_id': linha.id, 'b_old_path': linha.caminho_completo, 'b_caminho': novo})
+
+        if alteracoes:
+            conn.execute(
+                update(empresas_estruturas)
+                .where(empresas_estruturas.c.id == bindparam('b_id'))
+                .values(old_path=bindparam('b_old_path'), caminho_completo=bindparam('b_caminho'), razao_social_atualizar='S'),
+                alteracoes
+            )
+    return len(renomeadas)
+
+
+class MedidorFases:
+    """
+    Mede cada fase do benchmark: tempo, consultas ao banco, operações no armazenamento e memória.
+
+    As consultas são contadas por um evento em todas as engines (uma por ida ao banco,
+    inclusive executemany); as operações do backend são o equivalente às syscalls de
+    sistema de arquivos e ACL feitas pelos scripts. O pico de RSS é cumulativo; o pico
+    de alocações Python por fase (tracemalloc) é opcional por deixar a execução bem mais lenta.
+    """
+
+    def __init__(self, armazenamento, rastrear_memoria=False):
+        self.armazenamento = armazenamento
+        self.rastrear_memoria = rastrear_memoria
+        self.fases = {}
+        self.consultas = 0
+        event.listen(Engine, 'before_cursor_execute', self._contar_consulta)
+
+    def _contar_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        self.consultas += 1
+
+    def encerrar(self):
+        event.remove(Engine, 'before_cursor_execute', self._contar_consulta)
+
+    @contextmanager
+    def fase(self, nome):
+        consultas_inicio = self.consultas
+        operacoes_inicio = Counter(self.armazenamento.operacoes)
+        if self.rastrear_memoria:
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            operacoes = Counter(self.armazenamento.operacoes)
+            operacoes.subtract(operacoes_inicio)
+            self.fases[nome] = {
+                'segundos': round(segundos, 4),
+                'consultas_bd': self.consultas - consultas_inicio,
+                'operacoes_armazenamento': {operacao: quantidade for operacao, quantidade in sorted(operacoes.items()) if quantidade},
+                'pico_rss_mb': _pico_rss_mb(),
+            }
+            if self.rastrear_memoria:
+                self.fases[nome]['pico_memoria_python_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+            print(f"[{nome}] {segundos:.2f}s, {self.fases[nome]['consultas_bd']} consultas, "
+                  f"{sum(self.fases[nome]['operacoes_armazenamento'].values())} operações de armazenamento")
+
+
+# Função para identificar o commit medido (para comparar execuções entre commits)
+def _commit_atual():
+    try:
+        resultado = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+        )
+        return resultado.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Função para o pico de memória residente do processo (MB), quando disponível
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return round(pico / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 2)
+
+
+# Função para executar o pipeline completo sobre dados sintéticos e devolver as medições
+def executar_benchmark(args):
+    pasta_trabalho = tempfile.mkdtemp(prefix='benchmark_geracao_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    banco = args.banco or os.path.join(pasta_trabalho, 'benchmark.sqlite')
+    base_path = args.base_path or os.path.join(pasta_trabalho, 'Arquivos')
+
+    # Os scripts leem a configuração do ambiente ao serem importados
+    os.environ['DATABASE_URI'] = f"sqlite:///{banco}"
+    os.environ['ARQUIVOS_BACKEND'] = args.backend
+    os.environ['ARQUIVOS_BASE_PATH'] = base_path
+
+    engine = create_engine(os.environ['DATABASE_URI'])
+    print(f"Gerando dados sintéticos em {banco}...")
+    volumes = gerar_dados_sinteticos(engine, args.empresas, args.profundidade, args.ramificacao)
+
+    import criar_pastas_automatica_por_empresa as automatica
+    import renomear_pastas
+
+    opcoes = {'latencia': args.latencia} if args.backend == 'memoria' else {}
+    armazenamento = criar_armazenamento(args.backend, **opcoes)
+    automatica.armazenamento = armazenamento
+    automatica.resolvedor = CacheResolvedor(ResolvedorFalso(aceitar_qualquer=True))
+    automatica.base_path = base_path
+
+    medidor = MedidorFases(armazenamento, rastrear_memoria=args.tracemalloc)
+    if args.tracemalloc:
+        tracemalloc.start()
+    try:
+        if args.inventario:
+            with medidor.fase('inventario'):
+                armazenamento = preparar_inventario(armazenamento, base_path)
+            automatica.armazenamento = armazenamento
+
+        with medidor.fase('carregar_dados'):
+            estruturas_data, pastas_data, empresas_data, *_ = automatica.carregar_dados()
+            indice = IndiceEstruturas(estruturas_data, pastas_data)
+            modelos = compilar_modelos(indice)
+
+        with medidor.fase('preencher_tabela_empresas_estruturas'):
+            automatica.preencher_tabela_empresas_estruturas(empresas_data, modelos, workers=args.workers)
+
+        with medidor.fase('criar_estrutura_pastas'):
+            automatica.criar_estrutura_pastas(indice=indice if args.heranca else None)
+
+        empresas_renomeadas = marcar_renomeacoes(engine, args.renomear)
+        with medidor.fase('renomear_pastas'):
+            renomear_pastas.renomear_pastas(
+                armazenamento, caminho_diario=os.path.join(pasta_trabalho, 'renomear_pastas.diario.jsonl')
+            )
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        medidor.encerrar()
+
+    with engine.connect() as conn:
+        linhas = conn.exec_driver_sql('SELECT COUNT(*) FROM WeBotPastasEmpresasEstruturas').scalar()
+
+    return {
+        'executado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {
+            'empresas': args.empresas, 'profundidade': args.profundidade, 'ramificacao': args.ramificacao,
+            'backend': args.backend, 'latencia': args.latencia, 'workers': args.workers,
+            'heranca': args.heranca, 'inventario': args.inventario, 'fracao_renomear': args.renomear,
+            'tracemalloc': args.tracemalloc,
+        },
+        'volumes': dict(volumes, linhas_empresas_estruturas=linhas, empresas_renomeadas=empresas_renomeadas),
+        'fases': medidor.fases,
+        'total_segundos': round(sum(fase['segundos'] for fase in medidor.fases.values()), 4),
+        'pico_rss_mb': _pico_rss_mb(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de geração de pastas com dados sintéticos em SQLite.")
+    parser.add_argument('--empresas', type=int, default=EMPRESAS_PADRAO, help="Quantidade de empresas sintéticas")
+    parser.add_argument('--profundidade', type=int, default=PROFUNDIDADE_PADRAO, help="Níveis do modelo abaixo da pasta da empresa")
+    parser.add_argument('--ramificacao', type=int, default=RAMIFICACAO_PADRAO, help="Filhos por nível do modelo")
+    parser.add_argument('--renomear', type=float, default=FRACAO_RENOMEAR_PADRAO, help="Fração das empresas com razão social alterada")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='memoria', help="Backend de armazenamento (memoria ou posix em tmpfs)")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Latência simulada por operação no backend memoria (segundos)")
+    parser.add_argument('--workers', type=int, default=1, help="Processos usados para gerar as empresas pendentes")
+    parser.add_argument('--heranca', action='store_true', help="Usa o planejador de herança nas ACLs")
+    parser.add_argument('--inventario', action='store_true', help="Inventaria a árvore no início e responde as verificações de existência em memória")
+    parser.add_argument('--tracemalloc', action='store_true', help="Mede o pico de alocações Python por fase (execução mais lenta)")
+    parser.add_argument('--banco', help="Arquivo SQLite (padrão: pasta temporária, em /dev/shm quando existir)")
+    parser.add_argument('--base-path', help="Pasta raiz da árvore (padrão: pasta temporária)")
+    parser.add_argument('--saida', default='benchmark_geracao.json', help="Arquivo JSON com as medições")
+    args = parser.parse_args()
+
+    if args.backend == 'memoria' and args.workers > 1:
+        parser.error("o backend memoria não é compartilhado entre processos; use --backend posix com --workers > 1")
+
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s %(levelname)s: %(message)s")
+    resultado = executar_benchmark(args)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Medições gravadas em {args.saida} ({resultado['total_segundos']:.2f}s no total)")
@@ -0,0 +1,95 @@
+import threading
+
+# OBJECT_INHERIT_ACE | CONTAINER_INHERIT_ACE (mesmos valores de ntsecuritycon)
+OBJECT_INHERIT_ACE = 0x1
+CONTAINER_INHERIT_ACE = 0x2
+HERANCA = OBJECT_INHERIT_ACE | CONTAINER_INHERIT_ACE
+# Entrada recebida por herança do pai
+INHERITED_ACE = 0x10
+
+
+class EstatisticasAcl:
+    """Contadores de leituras/escritas de descritores de segurança."""
+
+    def __init__(self):
+        self.leituras = 0
+        self.escritas = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+    def contar(self, leituras=0, escritas=0, falhas=0):
+        with self._lock:
+            self.leituras += leituras
+            self.escritas += escritas
+            self.falhas += falhas
+
+    def relatorio(self):
+        return f"{self.leituras} leituras e {self.escritas} escritas de ACL ({self.falhas} falhas)"
+
+
+# Função para calcular a DACL final de uma pasta.
+# aces_existentes: [(mascara, sid)]; regras: [(sid, mascara)] na ordem do plano.
+# Devolve [(mascara, sid)] — todas as entradas recebem HERANCA ao serem gravadas.
+def calcular_dacl(aces_existentes, regras, manter_existentes=True):
+    """
+    Reproduz, em memória, o efeito das antigas gravações sucessivas.
+
+    Cada regra remove as entradas do mesmo SID e acrescenta a sua ao final;
+    a herança (OI|CI) é aplicada a todas as entradas na mesma gravação.
+    """
+    dacl = list(aces_existentes) if manter_existentes else []
+    for sid, mascara in regras:
+        dacl = [(m, s) for m, s in dacl if s != sid]
+        dacl.append((mascara, sid))
+    return dacl
+
+
+# Função para conferir se a DACL atual ([(flags, mascara, sid)]) já contém o resultado desejado
+def dacl_confere(aces_atuais, regras, manter_existentes=True):
+    desejada = calcular_dacl([], regras, manter_existentes=False)
+    sids_regras = [sid for _, sid in desejada]
+    for mascara, sid in desejada:
+        entradas = [(f, m) for f, m, s in aces_atuais if s == sid]
+        if len(entradas) != 1 or entradas[0][1] != mascara or entradas[0][0] & HERANCA != HERANCA:
+            return False
+    if not manter_existentes:
+        return all(s in sids_regras for _, _, s in aces_atuais)
+    return True
+
+
+# Função para ler a DACL atual de uma pasta e conferir com as regras
+def conferir_dacl(armazenamento, caminho, regras, manter_existentes=True, estatisticas=None):
+    try:
+        aces_atuais = armazenamento.ler_acl(caminho)
+        if estatisticas is not None:
+            estatisticas.contar(leituras=1)
+        return dacl_confere(aces_atuais, regras, manter_existentes)
+    except Exception as e:
+        print(f"Erro ao ler permissões de {caminho}: {e}")
+        return False
+
+
+# Função para aplicar a DACL final em uma pasta com uma única gravação.
+# Com propagar=True a DACL é protegida e as entradas herdáveis são repassadas
+# às subpastas já existentes (usado pelo planejador de herança).
+def aplicar_dacl(armazenamento, caminho, regras, manter_existentes=True, estatisticas=None, propagar=False):
+    try:
+        leituras = 0
+        aces_existentes = []
+        if manter_existentes:
+            aces_existentes = [(mascara, sid) for _, mascara, sid in armazenamento.ler_acl(caminho)]
+            leituras = 1
+
+        armazenamento.gravar_acl(
+            caminho,
+            [(HERANCA, mascara, sid) for mascara, sid in calcular_dacl(aces_existentes, regras, manter_existentes)],
+            propagar=propagar
+        )
+        if estatisticas is not None:
+            estatisticas.contar(leituras=leituras, escritas=1)
+        return True
+    except Exception as e:
+        if estatisticas is not None:
+            estatisticas.contar(falhas=1)
+        print(f"Erro ao definir permissões em {caminho}: {e}")
+        return False
@@ -1,20 +1,47 @@
 import os
-import win32security
-import ntsecuritycon as con
-from sqlalchemy import create_engine, Table, MetaData, select, insert, update, and_
+import time
+import argparse
+from sqlalchemy import create_engine, select, update, and_, not_, bindparam, inspect
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 from pathlib import Path
-
-# Caminho base onde as pastas serão criadas
-base_path = r'D:\Arquivos'
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from itertools import chain, repeat
+from collections import defaultdict, namedtuple
+# Permite importar os módulos compartilhados de src/
+sys.path.append(str(Path(__file__).parent.parent))
+from src.esquema import obter_esquema
+from indice_estruturas import ID_PASTA_EMPRESA, IndiceEstruturas, limpar_nome_diretorio
+from modelo_estruturas import (
+    PLACEHOLDER_ANO, PLACEHOLDER_MES, compilar_modelos, expandir_periodos, expandir_subarvore, interpretar_periodos
+)
+from materializar_pastas import EstatisticasPastas, materializar_pastas
+from fila_trabalho import (
+    TIPO_FILA_ESTRUTURA, criar_tabela_fila, enfileirar, reservar, concluir, liberar, manter_reserva, identificar_trabalhador
+)
+from resolvedor_principais import CacheResolvedor
+from construtor_acl import EstatisticasAcl, aplicar_dacl, conferir_dacl
+from armazenamento import BACKENDS, criar_armazenamento
+from inventario_pastas import ArmazenamentoInventariado, InventarioPastas, preparar_inventario
+from impressoes_acl import RegistroImpressoes, criar_tabela_impressoes, impressao_permissoes, impressoes_acl
+from plano_permissoes import carregar_plano_permissoes
+from planejador_heranca import planejar_heranca
+from gravacao_lote import EstatisticasGravacao, carregar_chaves_existentes, inserir_linhas_ausentes, em_blocos, ler_por_chave, depois_da_chave, TAMANHO_LOTE_IN
+from plano_execucao import EscritorPlano, sequencias_plano, validar_plano
+from registro_execucao import iniciar_execucao
 
 # Configuração da conexão com o banco de dados
 # Carrega o .env que está um nível acima de src/
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Caminho base onde as pastas serão criadas e backend de armazenamento (ntfs, posix ou memoria)
+base_path = os.getenv("ARQUIVOS_BASE_PATH", r'D:\Arquivos')
+armazenamento = criar_armazenamento(os.getenv("ARQUIVOS_BACKEND"))
+
 DATABASE_URI = os.getenv("DATABASE_URI")
 if not DATABASE_URI:
     raise ValueError("DATABASE_URI não definida nas variáveis de ambiente.")
@@ -24,25 +51,46 @@ engine = create_engine(DATABASE_URI, echo=False)  # echo=False para desabilitar
 # Configuração da sessão
 Session = sessionmaker(bind=engine)
 
+# Resolução de grupos (SID) memorizada durante toda a execução
+resolvedor = CacheResolvedor(armazenamento.resolvedor_padrao())
+estatisticas_acl = EstatisticasAcl()
+
+# Tipos dos itens de WeBotPastasFilaTrabalho usados na geração por empresa (linhas da hierarquia)
+# e na criação das pastas e ACLs dessas linhas; nos dois a chave é o id da empresa
+TIPO_FILA_EMPRESA = 'empresa'
+TIPO_FILA_PASTAS = 'pastas'
+
+# Nome do script gravado no cabeçalho dos planos (--plan) e no registro de execuções
+SCRIPT_PLANO = 'criar_pastas_automatica_por_empresa'
+
+# Fases registradas no checkpoint da execução
+FASE_PREENCHER = 'preencher_tabela_empresas_estruturas'
+FASE_CRIAR_PASTAS = 'criar_estrutura_pastas'
+
+# Linhas de WeBotPastasEmpresasEstruturas confirmadas por transação em criar_estrutura_pastas
+LINHAS_POR_COMMIT = 1000
+
+# Linha de WeBotPastasEmpresasEstruturas a processar, só com as colunas usadas e o caminho final
+LinhaPlanejada = namedtuple('LinhaPlanejada', ['id', 'estrutura_id', 'nivel', 'caminho_final'])
+
 # Função para carregar dados das tabelas
 def carregar_dados():
     try:
-        meta = MetaData()
-        meta.reflect(bind=engine)
-
-        estruturas = Table('WeBotPastasEstruturas', meta, autoload_with=engine)
-        pastas = Table('WeBotPastasPastas', meta, autoload_with=engine)
-        empresas = Table('WeBotPastasEmpresas', meta, autoload_with=engine)
-        empresas_estruturas = Table('WeBotPastasEmpresasEstruturas', meta, autoload_with=engine)
-        permissoes = Table('WeBotPastasPermissoes', meta, autoload_with=engine)
-        tipos_permissao = Table('WeBotPastastipos_permissao', meta, autoload_with=engine)
-        grupos = Table('WeBotPastasgrupos', meta, autoload_with=engine)
+        esquema = obter_esquema(engine)
+        estruturas = esquema.estruturas
+        pastas = esquema.pastas
+        empresas = esquema.empresas
+        empresas_estruturas = esquema.empresas_estruturas
+        permissoes = esquema.permissoes
+        tipos_permissao = esquema.tipos_permissao
+        grupos = esquema.grupos
 
         with Session() as session:
             print("Conectado ao banco de dados")
             estruturas_data = session.execute(select(estruturas)).fetchall()
             pastas_data = session.execute(select(pastas)).fetchall()
-            empresas_data = session.execute(select(empresas)).fetchall()
+            # Só as colunas usadas da tabela de empresas, que cresce com a base
+            empresas_data = session.execute(select(empresas.c.id, empresas.c.nomepasta, empresas.c.gerado)).fetchall()
             permissoes_data = session.execute(select(permissoes)).fetchall()
             tipos_permissao_data = session.execute(select(tipos_permissao)).fetchall()
             grupos_data = session.execute(select(grupos)).fetchall()
@@ -52,161 +100,35 @@ def carregar_dados():
         print(f"Erro ao carregar dados: {e}")
         return [], [], [], [], [], [], []
 
-# Função para limpar o nome dos diretórios
-def limpar_nome_diretorio(nome):
-    if nome is not None:
-        return nome.replace('\r', '').replace('\n', '').strip()
-    else:
-        return ''
-
-# Função para encontrar o nome da pasta pelo ID
-def encontrar_nome_pasta(pastas_data, id_pasta):
-    for pasta in pastas_data:
-        if pasta.id == id_pasta:
-            return limpar_nome_diretorio(pasta.nomepasta)
-    return None
-
-# Função para construir o caminho completo de uma estrutura
-def construir_caminho(estrutura, estruturas_data, pastas_data, base_path, empresa_nome=None):
-    partes_caminho = []
-    estrutura_atual = estrutura
-    while estrutura_atual and estrutura_atual.pai_id is not None:
-        nome_pasta = encontrar_nome_pasta(pastas_data, estrutura_atual.WeBotPastas_pasta_id)
-        if nome_pasta and nome_pasta != 'AutoPastaWebot - Empresas':
-            partes_caminho.insert(0, nome_pasta)
-        estrutura_atual = next((e for e in estruturas_data if e.id == estrutura_atual.pai_id), None)
-
-    if estrutura_atual:
-        nome_pasta = encontrar_nome_pasta(pastas_data, estrutura_atual.WeBotPastas_pasta_id)
-        if nome_pasta and nome_pasta != 'AutoPastaWebot - Empresas':
-            partes_caminho.insert(0, nome_pasta)
-
-    # Inserir 'Empresas' e 'Arquivo Digital' se não estiverem presentes
-    if 'Empresas' not in partes_caminho:
-        partes_caminho.insert(0, 'Empresas')
-    if 'Arquivo Digital' not in partes_caminho:
-        partes_caminho.insert(0, 'Arquivo Digital')
-
-    # Inserir o nome da empresa após 'Empresas'
-    if empresa_nome:
-        try:
-            index_empresas = partes_caminho.index('Empresas')
-            partes_caminho.insert(index_empresas + 1, empresa_nome)
-        except ValueError:
-            partes_caminho.insert(0, empresa_nome)
-
-    caminho = os.path.join(base_path, *partes_caminho)
-    return caminho
+# Função para ajustar permissões da pasta conforme o plano carregado de WeBotPastasPermissoes.
+# A DACL final (regras dos grupos + herança) é calculada em memória e gravada uma única vez;
+# com `impressoes`, pastas cujas permissões desejadas não mudaram são puladas.
+# Devolve True se a ACL foi gravada (com simular=True, se seria gravada, sem alterar nada).
+def ajustar_permissoes(plano, caminho, estrutura_id, impressoes=None, verificar_acl=False, propagar=False, simular=False):
+    regras = []
+    regras_impressao = []
+    for group_name, mascara in plano.get(estrutura_id, ()):
+        sid = resolvedor.resolver(group_name)
+        regras_impressao.append((group_name, sid, mascara))
+        if sid is None:
+            print(f"Grupo não encontrado: {group_name}")
+            continue
+        regras.append((sid, mascara))
+
+    if impressoes is not None:
+        impressao = impressao_permissoes(regras_impressao, propagar=propagar)
+        if impressoes.inalterada(caminho, impressao) and (
+            not verificar_acl or conferir_dacl(armazenamento, caminho, regras, estatisticas=estatisticas_acl)
+        ):
+            impressoes.puladas += 1
+            return False
 
-# Função para criar pastas se não existirem
-def criar_pasta_se_nao_existir(caminho):
-    try:
-        if not os.path.exists(caminho):
-            os.makedirs(caminho)
-            print(f'Pasta criada: {caminho}')
-        else:
-            print(f'Pasta já existe: {caminho}')
-    except OSError as e:
-        print(f"Erro ao criar pasta {caminho}: {e}")
-
-# Função para verificar se o grupo existe
-def grupo_existe(group_name):
-    try:
-        sid, domain, type = win32security.LookupAccountName(None, group_name)
-        #print(f"Grupo '{group_name}' encontrado. SID: {sid}, Domain: {domain}, Type: {type}")
+    if simular:
         return True
-    except win32security.error as e:
-        if e.winerror == 1332:  # ERROR_NONE_MAPPED
-            #print(f"Grupo '{group_name}' não encontrado.")
-            return False
-        else:
-            raise
-# Função para ajustar permissões da pasta conforme tabela WeBotPastasPermissoes
-def ajustar_permissoes(engine, caminho, estrutura_id):
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    permissoes = Table('WeBotPastasPermissoes', meta, autoload_with=engine)
-    tipos_permissao = Table('WeBotPastastipos_permissao', meta, autoload_with=engine)
-    grupos = Table('WeBotPastasgrupos', meta, autoload_with=engine)
-    
-    try:
-        with engine.connect() as conn:
-            permissoes_data = conn.execute(select(permissoes).where(permissoes.c.estrutura_id == estrutura_id)).fetchall()
-            for permissao in permissoes_data:
-                grupo = conn.execute(select(grupos).where(grupos.c.id == permissao.grupo_id)).fetchone()
-                permissao_tipo = conn.execute(select(tipos_permissao).where(tipos_permissao.c.id == permissao.permissao_id)).fetchone()
-                
-                if grupo and permissao_tipo:
-                    group_name = grupo.nome.strip()  # Remove espaços extras
-                    #print(f"Grupo encontrado: {group_name}")
-                    if grupo_existe(group_name):
-                        #print(f"Grupo existe: {group_name}")
-                        definir_permissoes(caminho, group_name, [permissao_tipo.nome])  # Alteração aqui
-                    else:
-                        print(f"Grupo não encontrado: {group_name}")
-    except SQLAlchemyError as e:
-        print(f"Erro ao ajustar permissões: {e}")
-
-
-# Função para definir permissões em uma pasta
-def definir_permissoes(caminho_pasta, nome_grupo, permissoes):
-    #print(f"Definindo permissões para {nome_grupo} com {permissoes} em {caminho_pasta}")
-    
-    # Mapear as permissões de texto para os valores apropriados de NT
-    mapa_permissoes = {
-        "ReadAndExecute": con.FILE_GENERIC_READ | con.FILE_GENERIC_EXECUTE,
-        "Modify": con.FILE_GENERIC_WRITE | con.FILE_GENERIC_READ | con.FILE_GENERIC_EXECUTE | con.DELETE,
-        "FullControl": con.FILE_ALL_ACCESS
-    }
-    
-    # Determinar permissões baseadas no texto
-    valor_permissao = 0
-    for permissao in permissoes:
-        valor_permissao |= mapa_permissoes.get(permissao, 0)
-
-    # Obter o SID do grupo
-    try:
-        sid, dominio, tipo = win32security.LookupAccountName(None, nome_grupo)
-        #print(f"SID obtido para {nome_grupo}: {sid}")
-
-        # Obter a DACL atual da pasta
-        sd = win32security.GetFileSecurity(caminho_pasta, win32security.DACL_SECURITY_INFORMATION)
-        dacl = sd.GetSecurityDescriptorDacl()
-
-        # Criar nova DACL
-        nova_dacl = win32security.ACL()
-        
-        # Copiar ACEs da DACL existente para a nova DACL, exceto a do grupo alvo
-        for i in range(dacl.GetAceCount()):
-            ace = dacl.GetAce(i)
-            if ace[2] != sid:
-                nova_dacl.AddAccessAllowedAce(win32security.ACL_REVISION, ace[1], ace[2])
-
-        # Adicionar nova regra de permissão
-        nova_dacl.AddAccessAllowedAce(win32security.ACL_REVISION, valor_permissao, sid)
-        sd.SetSecurityDescriptorDacl(1, nova_dacl, 0)
-        win32security.SetFileSecurity(caminho_pasta, win32security.DACL_SECURITY_INFORMATION, sd)
-        #print(f'Permissões definidas para {nome_grupo} com {permissoes} em {caminho_pasta}')
-    except Exception as e:
-        print(f"Erro ao definir permissões: {e}")
-
-
-# Função para garantir a herança de permissões
-def garantir_heranca(caminho):
-    try:
-        sd = win32security.GetFileSecurity(caminho, win32security.DACL_SECURITY_INFORMATION)
-        dacl = sd.GetSecurityDescriptorDacl()
-
-        nova_dacl = win32security.ACL()
-        for i in range(dacl.GetAceCount()):
-            ace = dacl.GetAce(i)
-            nova_dacl.AddAccessAllowedAceEx(win32security.ACL_REVISION, con.OBJECT_INHERIT_ACE | con.CONTAINER_INHERIT_ACE, ace[1], ace[2])
-        
-        sd.SetSecurityDescriptorDacl(1, nova_dacl, 0)
-        win32security.SetFileSecurity(caminho, win32security.DACL_SECURITY_INFORMATION, sd)
-        #print(f"Herança de permissões garantida para {caminho}")
-    except Exception as e:
-        print(f"Erro ao garantir herança de permissões: {e}")
+    aplicado = aplicar_dacl(armazenamento, caminho, regras, estatisticas=estatisticas_acl, propagar=propagar)
+    if aplicado and impressoes is not None:
+        impressoes.registrar(caminho, impressao)
+    return aplicado
 
 # Função para substituir placeholders no caminho
 def substituir_placeholders(caminho, valores_substituicao):
@@ -214,249 +136,785 @@ def substituir_placeholders(caminho, valores_substituicao):
         caminho = caminho.replace(placeholder, valor)
     return caminho
 
-# Função para preencher a tabela de hierarquia de pastas por empresa
-def preencher_tabela_empresas_estruturas(empresas_data, estruturas_data, pastas_data):
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    empresas_estruturas = Table('WeBotPastasEmpresasEstruturas', meta, autoload_with=engine)
-    empresas = Table('WeBotPastasEmpresas', meta, autoload_with=engine)
-
+# Função para montar as linhas de WeBotPastasEmpresasEstruturas de um lote de empresas (pares id, nomepasta)
+def linhas_lote_empresas(lote_empresas, modelos, base_path):
+    linhas = []
+    for empresa_id, nomepasta in lote_empresas:
+        empresa_nome = limpar_nome_diretorio(nomepasta)
+        for modelo in modelos:
+            for linha in modelo.aplicar(base_path, empresa_nome):
+                linhas.append({
+                    'empresa_id': empresa_id,
+                    'estrutura_id': linha.estrutura_id,
+                    'nomepasta': linha.nomepasta,
+                    'caminho_completo': linha.caminho_completo,
+                    'nivel': linha.nivel,
+                    'gerado': 'N'
+                })
+    return linhas
+
+# Função para gerar as linhas e pastas de um lote de empresas (pares id, nomepasta)
+def gerar_lote_empresas(session, empresas_estruturas, empresas, lote_empresas, modelos, estatisticas, estatisticas_pastas,
+                        base_path, armazenamento):
+    empresa_ids = [empresa_id for empresa_id, _ in lote_empresas]
+
+    # Uma consulta por lote no lugar de um SELECT por pasta
+    chaves_existentes = carregar_chaves_existentes(session, empresas_estruturas, empresa_ids, estatisticas)
+
+    linhas = linhas_lote_empresas(lote_empresas, modelos, base_path)
+    inserir_linhas_ausentes(session, empresas_estruturas, linhas, chaves_existentes, estatisticas)
+
+    # A raiz (nível 1) só é registrada; as subpastas já são criadas no disco
+    materializar_pastas(
+        ((linha['caminho_completo'], linha['nivel']) for linha in linhas if linha['nivel'] > 1),
+        armazenamento,
+        estatisticas=estatisticas_pastas
+    )
+
+    # Atualizar as empresas do lote para 'gerado' == 'S' após a criação das pastas
+    session.execute(
+        update(empresas).where(empresas.c.id.in_(empresa_ids)).values(gerado='S')
+    )
+
+
+# Estado de cada processo do pool (engine, tabelas e backend próprios)
+_worker = {}
+
+# Função executada uma vez em cada processo do pool
+def _iniciar_worker(caminho_base, nome_armazenamento, arquivo_inventario=None):
+    _worker['base_path'] = caminho_base
+    _worker['armazenamento'] = criar_armazenamento(nome_armazenamento)
+    if arquivo_inventario:
+        # Reaproveita o inventário salvo pelo processo principal, sem varrer de novo
+        _worker['armazenamento'] = ArmazenamentoInventariado(
+            _worker['armazenamento'], InventarioPastas.carregar(arquivo_inventario)
+        )
+    engine_worker = create_engine(DATABASE_URI, echo=False)
+    # O pool não avisa o fim dos processos: as conexões são fechadas na saída de cada um
+    Finalize(None, engine_worker.dispose, exitpriority=10)
+    esquema = obter_esquema(engine_worker)
+    _worker['Session'] = sessionmaker(bind=engine_worker)
+    _worker['empresas_estruturas'] = esquema.empresas_estruturas
+    _worker['empresas'] = esquema.empresas
+
+# Função para gerar um shard de empresas em um processo do pool, com commit próprio
+def _gerar_shard(lote_empresas, modelos):
+    estatisticas = EstatisticasGravacao()
+    estatisticas_pastas = EstatisticasPastas()
+    with _worker['Session']() as session:
+        try:
+            gerar_lote_empresas(
+                session, _worker['empresas_estruturas'], _worker['empresas'],
+                lote_empresas, modelos, estatisticas, estatisticas_pastas,
+                _worker['base_path'], _worker['armazenamento']
+            )
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            return estatisticas, estatisticas_pastas, f"{len(lote_empresas)} empresas: {e}"
+    return estatisticas, estatisticas_pastas, None
+
+# Função para preencher a tabela de hierarquia de pastas por empresa.
+# Cada lote de `tamanho_lote_empresas` empresas é confirmado em uma transação própria; com `execucao`,
+# o checkpoint avança junto com o lote e uma execução interrompida continua das empresas ainda pendentes.
+# Devolve False se a geração parou por erro no banco.
+def preencher_tabela_empresas_estruturas(empresas_data, modelos, tamanho_lote_empresas=200, workers=1, arquivo_inventario=None,
+                                         execucao=None):
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    empresas = esquema.empresas
+
+    estatisticas = EstatisticasGravacao()
+    estatisticas_pastas = EstatisticasPastas()
+    erro_shard = None
     try:
         with Session() as session:
             # Buscar empresas com 'gerado' == 'N'
-            empresas_nao_geradas = session.execute(
-                select(empresas).where(empresas.c.gerado == 'N')
-            ).fetchall()
-
-            for empresa in empresas_nao_geradas:
-                
-                for estrutura in estruturas_data:
-                    if estrutura.auto == 'S' and estrutura.WeBotPastas_pasta_id == 102:
-                        caminho_pai = construir_caminho(estrutura, estruturas_data, pastas_data, base_path, limpar_nome_diretorio(empresa.nomepasta))
-                        nivel = 1
-
-                        existe = session.execute(select(empresas_estruturas).where(
-                            and_(
-                                empresas_estruturas.c.empresa_id == empresa.id,
-                                empresas_estruturas.c.estrutura_id == estrutura.id,
-                                empresas_estruturas.c.caminho_completo == caminho_pai
-                            )
-                        )).fetchone()
-
-                        if not existe:
-                            ins_stmt = insert(empresas_estruturas).values(
-                                empresa_id=empresa.id,
-                                estrutura_id=estrutura.id,
-                                nomepasta=limpar_nome_diretorio(empresa.nomepasta),
-                                caminho_completo=caminho_pai,
-                                nivel=nivel,
-                                gerado='N'
-                            )
-                            session.execute(ins_stmt)
-
-                        # Chamar criar_subpastas com a estrutura atual
-                        criar_subpastas(session, empresa, estruturas_data, pastas_data, estrutura, caminho_pai, nivel)
-
-                # Atualizar a empresa para 'gerado' == 'S' após a criação das pastas
-                session.execute(
-                    update(empresas).where(empresas.c.id == empresa.id).values(gerado='S')
+            empresas_nao_geradas = [
+                (empresa.id, empresa.nomepasta)
+                for empresa in session.execute(
+                    select(empresas.c.id, empresas.c.nomepasta).where(empresas.c.gerado == 'N').order_by(empresas.c.id)
                 )
-            session.commit()
+            ]
+            lotes = list(em_blocos(empresas_nao_geradas, tamanho_lote_empresas))
+
+            if workers > 1 and len(lotes) > 1:
+                # Cada shard é gerado e confirmado por um processo com engine própria
+                erros = []
+                inicio = time.perf_counter()
+                with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                         initargs=(base_path, armazenamento.nome, arquivo_inventario)) as executor:
+                    for lote_empresas, (estatisticas_shard, estatisticas_pastas_shard, erro) in zip(
+                        lotes, executor.map(_gerar_shard, lotes, repeat(modelos))
+                    ):
+                        estatisticas.somar(estatisticas_shard)
+                        estatisticas_pastas.somar(estatisticas_pastas_shard)
+                        if erro:
+                            erros.append(erro)
+                        elif execucao is not None:
+                            # O shard já foi confirmado pelo processo do pool
+                            with engine.begin() as conn:
+                                execucao.avancar(conn, FASE_PREENCHER, lote_empresas[-1][0], len(lote_empresas))
+                # Os shards rodam em paralelo: o tempo (e as taxas) dos relatórios é o de parede
+                decorrido = time.perf_counter() - inicio
+                estatisticas.segundos = estatisticas_pastas.segundos = decorrido
+                for erro in erros:
+                    print(f"Erro ao preencher a tabela de hierarquia de pastas por empresa: {erro}")
+                print(
+                    f"Shards: {len(lotes) - len(erros)} de {len(lotes)} gerados com {workers} processos "
+                    f"em {decorrido:.2f}s"
+                )
+                erro_shard = erros[0] if erros else None
+            else:
+                # Um commit por lote: uma falha desfaz só o lote corrente, e as transações ficam curtas
+                for lote_empresas in lotes:
+                    gerar_lote_empresas(
+                        session, empresas_estruturas, empresas, lote_empresas, modelos,
+                        estatisticas, estatisticas_pastas, base_path, armazenamento
+                    )
+                    if execucao is not None:
+                        execucao.avancar(session, FASE_PREENCHER, lote_empresas[-1][0], len(lote_empresas))
+                    session.commit()
+        print(f"Hierarquia por empresa: {estatisticas.relatorio()}")
+        print(f"Pastas por empresa: {estatisticas_pastas.relatorio()}")
+        if erro_shard is not None:
+            # As empresas dos shards com erro continuam pendentes para a próxima execução
+            if execucao is not None:
+                execucao.falhar(erro_shard)
+            return False
+        return True
     except SQLAlchemyError as e:
         print(f"Erro ao preencher a tabela de hierarquia de pastas por empresa: {e}")
         session.rollback()
+        if execucao is not None:
+            execucao.falhar(e)
+        return False
+
+# Função para gerar as empresas pendentes reservando lotes na fila compartilhada,
+# permitindo várias execuções (ou máquinas) simultâneas sem disputa pelas mesmas empresas
+def preencher_tabela_empresas_estruturas_fila(modelos, tamanho_lote_empresas=200):
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    empresas = esquema.empresas
+
+    criar_tabela_fila(engine)
+    with engine.connect() as conn:
+        pendentes = [linha.id for linha in conn.execute(select(empresas.c.id).where(empresas.c.gerado == 'N'))]
+    enfileirar(engine, TIPO_FILA_EMPRESA, pendentes)
+
+    dono = identificar_trabalhador()
+    estatisticas = EstatisticasGravacao()
+    estatisticas_pastas = EstatisticasPastas()
+    lotes = 0
+    while True:
+        token, empresa_ids = reservar(engine, TIPO_FILA_EMPRESA, dono, tamanho_lote_empresas)
+        if not empresa_ids:
+            break
+
+        with Session() as session, manter_reserva(engine, token):
+            try:
+                # Empresas já geradas por outra execução são apenas concluídas na fila
+                lote_empresas = [
+                    (empresa.id, empresa.nomepasta)
+                    for empresa in session.execute(
+                        select(empresas.c.id, empresas.c.nomepasta)
+                        .where(and_(empresas.c.id.in_(empresa_ids), empresas.c.gerado == 'N'))
+                    )
+                ]
+                if lote_empresas:
+                    gerar_lote_empresas(
+                        session, empresas_estruturas, empresas, lote_empresas, modelos,
+                        estatisticas, estatisticas_pastas, base_path, armazenamento
+                    )
 
-
-def criar_subpastas(session, empresa, estruturas_data, pastas_data, estrutura_pai, caminho_pai, nivel_atual, visitados=None):
-    if visitados is None:
-        visitados = set()
-
-    # Verificar se já visitamos esta estrutura para evitar loops
-    if estrutura_pai.id in visitados:
-        print(f"Loop detectado na estrutura ID {estrutura_pai.id}")
+                if concluir(session, token) < len(empresa_ids):
+                    # A reserva expirou e foi assumida por outro trabalhador
+                    session.rollback()
+                    print(f"Reserva {token} expirada; lote descartado.")
+                    continue
+                session.commit()
+                lotes += 1
+            except SQLAlchemyError as e:
+                # O lote volta para a fila (ou fica como falho após MAX_TENTATIVAS) e esta execução
+                # para, no lugar de reservar de novo o mesmo lote em seguida
+                session.rollback()
+                liberar(engine, token)
+                print(f"Erro ao preencher a tabela de hierarquia de pastas por empresa: {e}")
+                break
+
+    print(f"Fila: {lotes} lotes concluídos por {dono}")
+    print(f"Hierarquia por empresa: {estatisticas.relatorio()}")
+    print(f"Pastas por empresa: {estatisticas_pastas.relatorio()}")
+
+# Função para inserir, abaixo das linhas pai já existentes em WeBotPastasEmpresasEstruturas, as linhas
+# das subárvores expandidas ({id da estrutura pai: [ItemModelo]}). As linhas pai são lidas em páginas
+# por id e cada bloco é confirmado em sua própria transação. As linhas entram com gerado = 'N'
+# (pastas e ACLs ficam para criar_estrutura_pastas) e as já existentes são puladas.
+# Devolve quantas pastas pai foram encontradas.
+def replicar_subarvores(session, subarvores, estatisticas, tamanho_lote_pais=200):
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    estrutura_ids = sorted({item.estrutura_id for itens in subarvores.values() for item in itens})
+    if not estrutura_ids:
+        return 0
+
+    pais = 0
+    consulta = select(
+        empresas_estruturas.c.id, empresas_estruturas.c.empresa_id, empresas_estruturas.c.estrutura_id,
+        empresas_estruturas.c.caminho_completo, empresas_estruturas.c.nivel
+    ).where(empresas_estruturas.c.estrutura_id.in_(list(subarvores)))
+
+    for bloco in ler_por_chave(engine, consulta, [empresas_estruturas.c.id], tamanho_lote_pais):
+        linhas = [
+            {
+                'empresa_id': pai.empresa_id,
+                'estrutura_id': item.estrutura_id,
+                'nomepasta': item.nomepasta,
+                'caminho_completo': os.path.join(pai.caminho_completo, item.caminho_relativo),
+                'nivel': pai.nivel + item.nivel,
+                'gerado': 'N'
+            }
+            for pai in bloco
+            for item in subarvores[pai.estrutura_id]
+        ]
+        chaves_existentes = carregar_chaves_existentes(
+            session, empresas_estruturas, sorted({pai.empresa_id for pai in bloco}), estatisticas, estrutura_ids
+        )
+        inserir_linhas_ausentes(session, empresas_estruturas, linhas, chaves_existentes, estatisticas)
+        session.commit()
+        pais += len(bloco)
+    return pais
+
+# Função para a virada de período: insere só as subárvores de ANO/MÊS dos períodos informados
+# ({ano: [meses]}) para as empresas que já têm a pasta pai do ANO. A virada pode ser repetida.
+def virar_periodo(periodos, indice):
+    subarvores = expandir_periodos(indice, periodos)
+    if not subarvores:
+        print("Virada: nenhuma estrutura automática de ANO no modelo.")
         return
-    visitados.add(estrutura_pai.id)
-
-    for child_estrutura in estruturas_data:
-        if child_estrutura.pai_id == estrutura_pai.id:
-            id_pasta_child = child_estrutura.WeBotPastas_pasta_id
-            nome_pasta_child = encontrar_nome_pasta(pastas_data, id_pasta_child)
-
-            # Garantir que o nome da pasta não seja None antes de continuar
-            if not nome_pasta_child:
-                print(f"Nome da pasta não encontrado para o ID {id_pasta_child}. Pulando esta estrutura.")
-                continue  # Pula para a próxima estrutura se o nome da pasta for inválido
-
-            nivel_novo = nivel_atual + 1
-            child_path = os.path.join(caminho_pai, nome_pasta_child)
-
-            existe = session.execute(select(empresas_estruturas).where(
-                and_(
-                    empresas_estruturas.c.empresa_id == empresa.id,
-                    empresas_estruturas.c.estrutura_id == child_estrutura.id,
-                    empresas_estruturas.c.caminho_completo == child_path
-                )
-            )).fetchone()
-
-            # Verificar se estamos no nível ANO (não criar a pasta com o placeholder, substituir pelo ano real)
-            if id_pasta_child == 114:  # AutoPastaWebot - ANO
-                anos = ['2025']  # Ajuste conforme necessário
-                for ano in anos:
-                    # Substituir o placeholder ANO antes de criar a pasta
-                    child_path_real = child_path.replace('AutoPastaWebot - ANO', ano)
-
-                    # Verificar se já existe o registro para o caminho real
-                    existe = session.execute(select(empresas_estruturas).where(
-                        and_(
-                            empresas_estruturas.c.empresa_id == empresa.id,
-                            empresas_estruturas.c.estrutura_id == child_estrutura.id,
-                            empresas_estruturas.c.caminho_completo == child_path_real
-                        )
-                    )).fetchone()
-
-                    if not existe:
-                        ins_stmt = insert(empresas_estruturas).values(
-                            empresa_id=empresa.id,
-                            estrutura_id=child_estrutura.id,
-                            nomepasta=nome_pasta_child,
-                            caminho_completo=child_path_real,
-                            nivel=nivel_novo,
-                            gerado='N'
-                        )
-                        session.execute(ins_stmt)
-
-                    # Criar fisicamente a pasta com o nome substituído (real)
-                    criar_pasta_se_nao_existir(child_path_real)
-
-                    # Continuar criando subpastas para este ano
-                    criar_subpastas(session, empresa, estruturas_data, pastas_data, child_estrutura, child_path_real, nivel_novo, visitados.copy())
-
-            # Verificar se estamos no nível MÊS (não criar a pasta com o placeholder, substituir pelo mês real)
-            elif id_pasta_child == 115:  # AutoPastaWebot - MÊS
-                meses = [f'{i:02d}' for i in range(1, 13)]
-                for mes in meses:
-                    # Substituir o placeholder MÊS antes de criar a pasta
-                    child_path_real = child_path.replace('AutoPastaWebot - MÊS', mes)
-
-                    # Verificar se já existe o registro para o caminho real
-                    existe = session.execute(select(empresas_estruturas).where(
-                        and_(
-                            empresas_estruturas.c.empresa_id == empresa.id,
-                            empresas_estruturas.c.estrutura_id == child_estrutura.id,
-                            empresas_estruturas.c.caminho_completo == child_path_real
-                        )
-                    )).fetchone()
-
-                    if not existe:
-                        ins_stmt = insert(empresas_estruturas).values(
-                            empresa_id=empresa.id,
-                            estrutura_id=child_estrutura.id,
-                            nomepasta=nome_pasta_child,
-                            caminho_completo=child_path_real,
-                            nivel=nivel_novo,
-                            gerado='N'
-                        )
-                        session.execute(ins_stmt)
 
-                    # Criar fisicamente a pasta com o nome substituído (real)
-                    criar_pasta_se_nao_existir(child_path_real)
+    estatisticas = EstatisticasGravacao()
+    with Session() as session:
+        pais = replicar_subarvores(session, subarvores, estatisticas)
+    anos = ', '.join(f"{ano} ({len(meses)} meses)" for ano, meses in periodos.items())
+    print(f"Virada {anos}: {pais} pastas pai, {estatisticas.relatorio()}")
+
+# Função para montar o índice de estruturas de novo, com as estruturas criadas depois do carregamento
+def _recarregar_indice():
+    esquema = obter_esquema(engine)
+    with Session() as session:
+        estruturas_data = session.execute(select(esquema.estruturas)).fetchall()
+        pastas_data = session.execute(select(esquema.pastas)).fetchall()
+    return IndiceEstruturas(estruturas_data, pastas_data)
+
+# Função para processar as estruturas automáticas novas enfileiradas pela API: cada estrutura com
+# replicar_para_empresas é replicada (com a subárvore) só abaixo das pastas pai já existentes em
+# cada empresa, no lugar de marcar todas as empresas para serem geradas de novo.
+# Uma estrutura reservada que o índice não conhece (criada depois do carregamento) faz o índice ser
+# montado de novo; só as que continuam desconhecidas (excluídas) são concluídas sem replicação.
+# replicar_subarvores confirma cada bloco de pastas pai, então a conferência da reserva em concluir()
+# só desfaz o último bloco: a reserva é renovada durante o lote para não ser assumida por outro
+# trabalhador, e se ainda assim expirar, quem refizer o lote pula as linhas já gravadas.
+# Devolve o índice usado (o recarregado, se houve estruturas novas).
+def processar_fila_estruturas(indice, tamanho_lote=50):
+    esquema = obter_esquema(engine)
+    empresas = esquema.empresas
+    criar_tabela_fila(engine)
+
+    dono = identificar_trabalhador()
+    estatisticas = EstatisticasGravacao()
+    replicadas = pais = 0
+    while True:
+        token, estrutura_ids = reservar(engine, TIPO_FILA_ESTRUTURA, dono, tamanho_lote)
+        if not estrutura_ids:
+            break
+
+        if any(estrutura_id not in indice.estruturas for estrutura_id in estrutura_ids):
+            indice = _recarregar_indice()
+
+        with Session() as session, manter_reserva(engine, token):
+            try:
+                for estrutura_id in estrutura_ids:
+                    estrutura = indice.estruturas.get(estrutura_id)
+                    if estrutura is None or estrutura.auto != 'S' or not estrutura.replicar_para_empresas:
+                        continue
+                    if estrutura.WeBotPastas_pasta_id == ID_PASTA_EMPRESA:
+                        # Nova raiz de empresa: a hierarquia de todas as empresas precisa ser gerada
+                        session.execute(update(empresas).values(gerado='N'))
+                    else:
+                        subarvores = {estrutura.pai_id: expandir_subarvore(indice, estrutura)}
+                        pais += replicar_subarvores(session, subarvores, estatisticas)
+                    replicadas += 1
+
+                if concluir(session, token) < len(estrutura_ids):
+                    session.rollback()
+                    print(f"Reserva {token} expirada; lote descartado.")
+                    continue
+                session.commit()
+            except SQLAlchemyError as e:
+                session.rollback()
+                liberar(engine, token)
+                print(f"Erro ao replicar estruturas novas: {e}")
+                break
+
+    if replicadas:
+        print(f"Estruturas novas: {replicadas} replicadas abaixo de {pais} pastas pai, {estatisticas.relatorio()}")
+    return indice
+
+# Função para verificar se o caminho ainda contém algum placeholder (linhas gravadas por versões antigas)
+def _tem_placeholder(caminho):
+    return PLACEHOLDER_ANO in caminho or PLACEHOLDER_MES in caminho
+
+# Função para montar o contexto de placeholders de cada caminho de uma empresa.
+# As linhas são percorridas por nível: cada pasta herda o contexto da pasta acima dela,
+# e a pasta cujo próprio nome é o placeholder define o valor para toda a sua subárvore.
+def _contextos_placeholders(linhas):
+    contextos = {}
+    for linha in sorted(linhas, key=lambda linha: linha.nivel):
+        caminho = linha.caminho_completo
+        if not _tem_placeholder(caminho):
+            continue
+
+        # Pasta mais próxima acima desta que já tem contexto
+        pai = os.path.dirname(caminho)
+        while pai not in contextos and os.path.dirname(pai) != pai:
+            pai = os.path.dirname(pai)
+
+        contexto = dict(contextos.get(pai, {}))
+        nome = os.path.basename(caminho)
+        for placeholder in (PLACEHOLDER_ANO, PLACEHOLDER_MES):
+            if placeholder in nome:
+                contexto[placeholder] = linha.nomepasta
+        contextos[caminho] = contexto
+    return contextos
+
+# Função para ler as linhas a processar em blocos, com os placeholders do caminho já substituídos.
+# As linhas vêm em páginas curtas na ordem (nível, id), cada uma lida após a última chave do bloco
+# anterior; só as empresas do bloco com placeholders no caminho têm a hierarquia consultada
+# (uma consulta por bloco). Com `depois_de` = [nivel, id], a reconciliação recomeça após essa linha
+# (retomada do checkpoint), depois de ler as linhas pendentes (gerado == 'N') que ficaram antes dela,
+# como as inseridas pela própria execução enquanto ela estava parada. Com `empresa_ids`, só as linhas
+# dessas empresas são lidas (lote reservado na fila).
+def planejar_estrutura_pastas(session, empresas_estruturas, reconciliar=False, depois_de=None,
+                              tamanho_bloco=LINHAS_POR_COMMIT, empresa_ids=None):
+    consulta = select(
+        empresas_estruturas.c.id, empresas_estruturas.c.empresa_id, empresas_estruturas.c.estrutura_id,
+        empresas_estruturas.c.nivel, empresas_estruturas.c.caminho_completo
+    )
+    if empresa_ids is not None:
+        consulta = consulta.where(empresas_estruturas.c.empresa_id.in_(empresa_ids))
+    # Buscar registros onde gerado == 'N'
+    if not reconciliar:
+        consulta = consulta.where(empresas_estruturas.c.gerado == 'N')
+    chaves = [empresas_estruturas.c.nivel, empresas_estruturas.c.id]
+    paginas = ler_por_chave(engine, consulta, chaves, tamanho_bloco, depois_de)
+    if reconciliar and depois_de is not None:
+        pendentes = consulta.where(and_(empresas_estruturas.c.gerado == 'N', not_(depois_da_chave(chaves, depois_de))))
+        paginas = chain(ler_por_chave(engine, pendentes, chaves, tamanho_bloco), paginas)
+
+    for bloco in paginas:
+        # Contexto de placeholders das empresas do bloco, montado em uma única passada pela hierarquia
+        empresas_com_placeholder = sorted({
+            linha.empresa_id for linha in bloco if _tem_placeholder(linha.caminho_completo)
+        })
+        contextos = {}
+        for empresas_bloco in em_blocos(empresas_com_placeholder, TAMANHO_LOTE_IN):
+            hierarquias = defaultdict(list)
+            for linha in session.execute(
+                select(
+                    empresas_estruturas.c.empresa_id, empresas_estruturas.c.nomepasta,
+                    empresas_estruturas.c.caminho_completo, empresas_estruturas.c.nivel
+                ).where(empresas_estruturas.c.empresa_id.in_(empresas_bloco))
+            ):
+                hierarquias[linha.empresa_id].append(linha)
+            for empresa_id, linhas in hierarquias.items():
+                contextos[empresa_id] = _contextos_placeholders(linhas)
+
+        planejadas = []
+        for linha in bloco:
+            caminho = linha.caminho_completo
+            substituicoes = contextos.get(linha.empresa_id, {}).get(caminho)
+
+            # Substituir os placeholders
+            caminho_final = substituir_placeholders(caminho, substituicoes) if substituicoes else caminho
+            planejadas.append(LinhaPlanejada(linha.id, linha.estrutura_id, linha.nivel, caminho_final))
+        yield planejadas
+
+# Cria as pastas e aplica as permissões das linhas lidas por planejar_estrutura_pastas, confirmando
+# cada bloco (marcação gerado = 'S', impressões e checkpoint) em sua própria transação.
+# Devolve a chave de retomada após o último bloco.
+def _criar_pastas_blocos(session, empresas_estruturas, plano, heranca, impressoes, estatisticas, reconciliar,
+                         verificar_acl, linhas_por_commit, execucao=None, retomada=None, empresa_ids=None):
+    for bloco in planejar_estrutura_pastas(
+        session, empresas_estruturas, reconciliar, depois_de=retomada, tamanho_bloco=linhas_por_commit,
+        empresa_ids=empresa_ids
+    ):
+        # Criar as pastas do bloco em paralelo, nível a nível (os pais vêm em blocos anteriores)
+        materializar_pastas(((linha.caminho_final, linha.nivel) for linha in bloco), armazenamento,
+                            estatisticas=estatisticas)
+
+        # Últimas impressões aplicadas, para pular as pastas sem mudança
+        impressoes.carregar(session, [linha.caminho_final for linha in bloco])
+
+        for linha in bloco:
+            # Ajustar permissões (as pastas que só herdam do pai ficam sem gravação)
+            if heranca is None:
+                ajustar_permissoes(plano, linha.caminho_final, linha.estrutura_id, impressoes, verificar_acl)
+            elif heranca.decidir(linha.estrutura_id):
+                ajustar_permissoes(plano, linha.caminho_final, linha.estrutura_id, impressoes, verificar_acl, propagar=True)
+
+        # Atualizar status 'gerado' para 'S'
+        session.execute(
+            update(empresas_estruturas)
+            .where(empresas_estruturas.c.id.in_([linha.id for linha in bloco]))
+            .values(gerado='S')
+        )
+        impressoes.gravar(session)
+        impressoes.esquecer()
+        if execucao is not None:
+            # As pendentes lidas antes do checkpoint não o fazem voltar
+            if reconciliar:
+                chave = [bloco[-1].nivel, bloco[-1].id]
+                retomada = chave if retomada is None else max(retomada, chave)
+            execucao.avancar(session, FASE_CRIAR_PASTAS, retomada, len(bloco))
+        session.commit()
+    return retomada
+
+# Cria as pastas pendentes (gerado == 'N') e aplica as permissões.
+# Com reconciliar=True todas as linhas são revisadas; as ACLs inalteradas são puladas pela impressão.
+# Com o índice de estruturas, só as pastas de fronteira recebem ACL explícita (planejador de herança).
+# As ACLs e as marcações são confirmadas a cada `linhas_por_commit` linhas; com `execucao`, o checkpoint
+# avança junto e uma execução interrompida retoma da última linha confirmada.
+# Com `fila`, as linhas são lidas por lotes de `empresas_por_reserva` empresas reservados na fila
+# compartilhada, para que execuções simultâneas não criem as mesmas pastas.
+# Devolve False se a criação parou por erro no banco.
+def criar_estrutura_pastas(reconciliar=False, verificar_acl=False, indice=None, linhas_por_commit=LINHAS_POR_COMMIT,
+                           execucao=None, fila=False, empresas_por_reserva=200):
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    criar_tabela_impressoes(engine)
+    impressoes = RegistroImpressoes()
 
-                    # Continuar criando subpastas para este mês
-                    criar_subpastas(session, empresa, estruturas_data, pastas_data, child_estrutura, child_path_real, nivel_novo, visitados.copy())
-            
-            # Se não for ANO ou MÊS, criar a pasta normalmente
+    try:
+        with Session() as session:
+            # Permissões de todas as estruturas, carregadas uma única vez
+            plano = carregar_plano_permissoes(session, esquema)
+            heranca = planejar_heranca(indice, plano) if indice is not None else None
+            estatisticas = EstatisticasPastas()
+
+            if fila:
+                _criar_pastas_fila(
+                    session, empresas_estruturas, plano, heranca, impressoes, estatisticas, reconciliar,
+                    verificar_acl, linhas_por_commit, empresas_por_reserva
+                )
             else:
-                if not existe:
-                    ins_stmt = insert(empresas_estruturas).values(
-                        empresa_id=empresa.id,
-                        estrutura_id=child_estrutura.id,
-                        nomepasta=nome_pasta_child,
-                        caminho_completo=child_path,
-                        nivel=nivel_novo,
-                        gerado='N'
-                    )
-                    session.execute(ins_stmt)
-
-                # Criar a pasta fisicamente (sem placeholders)
-                criar_pasta_se_nao_existir(child_path)
-
-                # Continuar criando as subpastas
-                criar_subpastas(session, empresa, estruturas_data, pastas_data, child_estrutura, child_path, nivel_novo, visitados.copy())
-
-def criar_estrutura_pastas():
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    empresas_estruturas = Table('WeBotPastasEmpresasEstruturas', meta, autoload_with=engine)
+                # Sem reconciliar, as linhas já confirmadas saem da própria consulta (gerado == 'S') e não há
+                # chave a guardar; na reconciliação, a ordem (nível, id) do checkpoint diz onde a anterior parou
+                retomada = execucao.chave_retomada(FASE_CRIAR_PASTAS) if execucao is not None and reconciliar else None
+                _criar_pastas_blocos(
+                    session, empresas_estruturas, plano, heranca, impressoes, estatisticas, reconciliar,
+                    verificar_acl, linhas_por_commit, execucao, retomada
+                )
+        print(f"Pastas: {estatisticas.relatorio()}")
+        print(f"Grupos: {resolvedor.relatorio()}")
+        print(f"Impressões: {impressoes.relatorio()}")
+        if heranca is not None:
+            print(f"Herança: {heranca.relatorio()}")
+        print(f"ACL: {estatisticas_acl.relatorio()}")
+        print(f"Armazenamento: {armazenamento.relatorio()}")
+        return True
+    except SQLAlchemyError as e:
+        #print(f"Erro ao criar estrutura de pastas: {e}")
+        session.rollback()
+        if execucao is not None:
+            execucao.falhar(e)
+        return False
+
+# Cria as pastas das empresas reservadas na fila, um lote por vez. As empresas com linhas a processar
+# (pendentes, ou todas na reconciliação) são enfileiradas; cada lote é concluído na fila depois do
+# último bloco confirmado. Em caso de erro o lote volta para a fila e o erro sobe.
+def _criar_pastas_fila(session, empresas_estruturas, plano, heranca, impressoes, estatisticas, reconciliar,
+                       verificar_acl, linhas_por_commit, empresas_por_reserva):
+    criar_tabela_fila(engine)
+    consulta = select(empresas_estruturas.c.empresa_id).distinct()
+    if not reconciliar:
+        consulta = consulta.where(empresas_estruturas.c.gerado == 'N')
+    with engine.connect() as conn:
+        enfileirar(engine, TIPO_FILA_PASTAS, conn.execute(consulta).scalars().all())
+
+    dono = identificar_trabalhador()
+    lotes = 0
+    while True:
+        token, empresa_ids = reservar(engine, TIPO_FILA_PASTAS, dono, empresas_por_reserva)
+        if not empresa_ids:
+            break
+        try:
+            with manter_reserva(engine, token):
+                _criar_pastas_blocos(
+                    session, empresas_estruturas, plano, heranca, impressoes, estatisticas, reconciliar,
+                    verificar_acl, linhas_por_commit, empresa_ids=empresa_ids
+                )
+                # Com a reserva expirada, as linhas já confirmadas ficam como estão (gerado = 'S')
+                # e o outro trabalhador encontra o lote sem pendências
+                concluir(session, token)
+                session.commit()
+            lotes += 1
+        except SQLAlchemyError:
+            session.rollback()
+            liberar(engine, token)
+            raise
+    print(f"Fila: {lotes} lotes de pastas concluídos por {dono}")
+
+# Função para registrar no plano as pastas, ACLs e marcações de um conjunto de linhas.
+# itens: [(caminho_final, nivel, estrutura_id, chave da linha)], onde a chave é {'id': ...}
+# para linhas já gravadas ou {empresa_id, estrutura_id, caminho_completo} para as planejadas.
+def _planejar_pastas_e_acls(session, escritor, itens, plano, heranca, impressoes, pastas_planejadas, verificar_acl):
+    itens = sorted(itens, key=lambda item: item[1])
+    if impressoes is not None:
+        impressoes.carregar(session, [caminho for caminho, _, _, _ in itens])
+
+    novas = set()
+    for caminho, nivel, _, _ in itens:
+        if caminho not in pastas_planejadas and not armazenamento.existe(caminho):
+            escritor.registrar('pasta', caminho=caminho, nivel=nivel)
+            novas.add(caminho)
+        pastas_planejadas.add(caminho)
+
+    for caminho, _, estrutura_id, _ in itens:
+        if heranca is not None and not heranca.decidir(estrutura_id):
+            continue
+        propagar = heranca is not None
+        # Pastas ainda inexistentes não têm ACL a conferir no disco
+        if ajustar_permissoes(plano, caminho, estrutura_id, impressoes, verificar_acl and caminho not in novas,
+                              propagar=propagar, simular=True):
+            escritor.registrar(
+                'acl', caminho=caminho, estrutura_id=estrutura_id, propagar=propagar,
+                regras=[list(regra) for regra in plano.get(estrutura_id, ())]
+            )
+
+    for _, _, _, chave in itens:
+        escritor.registrar('gerado', **chave)
+
+# Gera o plano (JSONL) da execução sem alterar o banco nem o disco: linhas a inserir,
+# empresas a marcar, pastas a criar, ACLs a gravar e linhas a marcar como geradas.
+def planejar_execucao(caminho_plano, empresas_data, modelos, reconciliar=False, verificar_acl=False, indice=None,
+                      tamanho_lote_empresas=200):
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    empresas = esquema.empresas
+    # Sem a tabela de impressões (nunca criada), todas as ACLs seriam gravadas
+    impressoes = RegistroImpressoes() if inspect(engine).has_table(impressoes_acl.name) else None
+    pastas_planejadas = set()
+
+    with Session() as session, EscritorPlano(
+        caminho_plano, SCRIPT_PLANO, base_path=base_path, backend=armazenamento.nome,
+        reconciliar=reconciliar, heranca=indice is not None
+    ) as escritor:
+        plano = carregar_plano_permissoes(session, esquema)
+        heranca = planejar_heranca(indice, plano) if indice is not None else None
+
+        # Etapa 1: empresas pendentes (preencher_tabela_empresas_estruturas)
+        pendentes = [
+            (empresa.id, empresa.nomepasta)
+            for empresa in session.execute(select(empresas.c.id, empresas.c.nomepasta).where(empresas.c.gerado == 'N'))
+        ]
+        for lote_empresas in em_blocos(pendentes, tamanho_lote_empresas):
+            chaves_existentes = carregar_chaves_existentes(
+                session, empresas_estruturas, [empresa_id for empresa_id, _ in lote_empresas]
+            )
+            novas = []
+            for linha in linhas_lote_empresas(lote_empresas, modelos, base_path):
+                chave = (linha['empresa_id'], linha['estrutura_id'], linha['caminho_completo'])
+                if chave not in chaves_existentes:
+                    chaves_existentes.add(chave)
+                    novas.append(linha)
+                    escritor.registrar('linha', **{coluna: valor for coluna, valor in linha.items() if coluna != 'gerado'})
+            for empresa_id, _ in lote_empresas:
+                escritor.registrar('empresa', empresa_id=empresa_id)
+
+            _planejar_pastas_e_acls(session, escritor, [
+                (linha['caminho_completo'], linha['nivel'], linha['estrutura_id'], {
+                    'empresa_id': linha['empresa_id'], 'estrutura_id': linha['estrutura_id'],
+                    'caminho_completo': linha['caminho_completo'],
+                })
+                for linha in novas
+            ], plano, heranca, impressoes, pastas_planejadas, verificar_acl)
+
+        # Etapa 2: linhas já gravadas e pendentes (criar_estrutura_pastas)
+        for bloco in planejar_estrutura_pastas(session, empresas_estruturas, reconciliar):
+            _planejar_pastas_e_acls(session, escritor, [
+                (linha.caminho_final, linha.nivel, linha.estrutura_id, {'id': linha.id}) for linha in bloco
+            ], plano, heranca, impressoes, pastas_planejadas, verificar_acl)
+
+    print(f"Plano: {escritor.relatorio()}")
+    if heranca is not None:
+        print(f"Herança: {heranca.relatorio()}")
+
+# Aplica um plano gerado com --plan exatamente como foi registrado, na ordem do arquivo
+def aplicar_plano(caminho_plano):
+    cabecalho, resumo = validar_plano(caminho_plano, SCRIPT_PLANO, base_path=base_path, backend=armazenamento.nome)
+    print(f"Aplicando plano de {cabecalho['criado_em']}: {resumo['contagens']}")
+
+    esquema = obter_esquema(engine)
+    empresas_estruturas = esquema.empresas_estruturas
+    empresas = esquema.empresas
+    criar_tabela_impressoes(engine)
+    impressoes = RegistroImpressoes()
+    estatisticas = EstatisticasGravacao()
+    estatisticas_pastas = EstatisticasPastas()
 
     try:
         with Session() as session:
-            # Buscar registros onde gerado == 'N' (sem filtrar por empresa específica)
-            estruturas_data = session.execute(
-                select(empresas_estruturas)
-                .where(empresas_estruturas.c.gerado == 'N')
-                .order_by(empresas_estruturas.c.nivel)
-            ).fetchall()
-            #print(f"Estruturas a serem processadas: {len(estruturas_data)} registros")
-
-            for estrutura in estruturas_data:
-                caminho = estrutura.caminho_completo
-                nomepasta = estrutura.nomepasta
-
-                # Obter todos os registros acima na hierarquia para substituir os placeholders
-                caminho_final = caminho
-                parent_ids = []
-                parent_nomes = {}
-
-                estrutura_atual_id = estrutura.id
-                empresa_id = estrutura.empresa_id
-
-                # Montar o dicionário de substituições
-                substituicoes = {}
-
-                # Obter registros da hierarquia
-                query = select(empresas_estruturas).where(
-                    and_(
-                        empresas_estruturas.c.empresa_id == empresa_id,
-                        empresas_estruturas.c.id <= estrutura_atual_id  # Pressupõe que IDs aumentam na hierarquia
+            for tipo, entradas in sequencias_plano(caminho_plano):
+                if tipo == 'linha':
+                    linhas = [
+                        {coluna: valor for coluna, valor in entrada.items() if coluna != 'tipo'} | {'gerado': 'N'}
+                        for entrada in entradas
+                    ]
+                    chaves_existentes = carregar_chaves_existentes(
+                        session, empresas_estruturas, {linha['empresa_id'] for linha in linhas}, estatisticas
                     )
-                ).order_by(empresas_estruturas.c.nivel)
-                hierarquia = session.execute(query).fetchall()
-
-                for h in hierarquia:
-                    if 'AutoPastaWebot - ANO' in h.caminho_completo:
-                        substituicoes['AutoPastaWebot - ANO'] = h.nomepasta
-                    if 'AutoPastaWebot - MÊS' in h.caminho_completo:
-                        substituicoes['AutoPastaWebot - MÊS'] = h.nomepasta
-
-                # Substituir os placeholders
-                caminho_final = substituir_placeholders(caminho, substituicoes)
-
-                # Criar a pasta se não existir
-                criar_pasta_se_nao_existir(caminho_final)
-
-                # Ajustar permissões
-                ajustar_permissoes(engine, caminho_final, estrutura.estrutura_id)
-                garantir_heranca(caminho_final)
-
-                # Atualizar status 'gerado' para 'S'
-                stmt = update(empresas_estruturas).where(empresas_estruturas.c.id == estrutura.id).values(gerado='S')
-                session.execute(stmt)
-
-            session.commit()
+                    inserir_linhas_ausentes(session, empresas_estruturas, linhas, chaves_existentes, estatisticas)
+                elif tipo == 'empresa':
+                    session.execute(
+                        update(empresas).where(empresas.c.id.in_([entrada['empresa_id'] for entrada in entradas])).values(gerado='S')
+                    )
+                elif tipo == 'pasta':
+                    materializar_pastas(
+                        ((entrada['caminho'], entrada['nivel']) for entrada in entradas), armazenamento,
+                        estatisticas=estatisticas_pastas
+                    )
+                elif tipo == 'acl':
+                    impressoes.carregar(session, [entrada['caminho'] for entrada in entradas])
+                    for entrada in entradas:
+                        regras = {entrada['estrutura_id']: tuple(tuple(regra) for regra in entrada['regras'])}
+                        ajustar_permissoes(regras, entrada['caminho'], entrada['estrutura_id'], impressoes, propagar=entrada['propagar'])
+                elif tipo == 'gerado':
+                    ids = [entrada['id'] for entrada in entradas if 'id' in entrada]
+                    if ids:
+                        session.execute(update(empresas_estruturas).where(empresas_estruturas.c.id.in_(ids)).values(gerado='S'))
+                    chaves = [
+                        {'b_empresa': entrada['empresa_id'], 'b_estrutura': entrada['estrutura_id'], 'b_caminho': entrada['caminho_completo']}
+                        for entrada in entradas if 'id' not in entrada
+                    ]
+                    if chaves:
+                        session.execute(
+                            update(empresas_estruturas)
+                            .where(and_(
+                                empresas_estruturas.c.empresa_id == bindparam('b_empresa'),
+                                empresas_estruturas.c.estrutura_id == bindparam('b_estrutura'),
+                                empresas_estruturas.c.caminho_completo == bindparam('b_caminho'),
+                            ))
+                            .values(gerado='S'),
+                            chaves
+                        )
+                else:
+                    raise ValueError(f"Tipo de alteração desconhecido no plano: {tipo}")
+
+                # Cada sequência é confirmada em sua própria transação; reaplicar o plano após uma
+                # interrupção pula as linhas já inseridas e as ACLs com impressão já gravada
+                impressoes.gravar(session)
+                impressoes.esquecer()
+                session.commit()
+        print(f"Hierarquia por empresa: {estatisticas.relatorio()}")
+        print(f"Pastas: {estatisticas_pastas.relatorio()}")
+        print(f"Impressões: {impressoes.relatorio()}")
+        print(f"ACL: {estatisticas_acl.relatorio()}")
+        print(f"Armazenamento: {armazenamento.relatorio()}")
     except SQLAlchemyError as e:
-        #print(f"Erro ao criar estrutura de pastas: {e}")
+        print(f"Erro ao aplicar o plano {caminho_plano}: {e}")
         session.rollback()
 
 # Chamada principal do script
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria a hierarquia automática de pastas por empresa.")
+    parser.add_argument('--workers', type=int, default=1, help="Processos usados para gerar as empresas pendentes")
+    parser.add_argument('--fila', action='store_true', help="Reserva lotes de empresas na fila compartilhada (execuções simultâneas)")
+    parser.add_argument('--reconciliar', action='store_true', help="Revisa as ACLs de todas as pastas, pulando as inalteradas")
+    parser.add_argument('--verificar-acl', action='store_true', help="Confere a ACL atual no disco antes de pular uma pasta inalterada")
+    parser.add_argument('--heranca', action='store_true', help="Grava ACL só onde a permissão difere da pasta pai; as demais herdam (OI|CI)")
+    parser.add_argument('--base-path', default=base_path, help="Pasta raiz da árvore (padrão: ARQUIVOS_BASE_PATH ou D:\\Arquivos)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help="Backend de armazenamento (padrão: ARQUIVOS_BACKEND, ntfs no Windows e posix nos demais)")
+    parser.add_argument('--plan', metavar='ARQUIVO', help="Só grava em ARQUIVO (JSONL) as alterações que a execução faria, com contagens e custo estimado")
+    parser.add_argument('--aplicar-plano', metavar='ARQUIVO', help="Aplica um plano gravado com --plan, exatamente como planejado")
+    parser.add_argument('--inventario', action='store_true', help="Varre a árvore uma vez no início e responde as verificações de existência em memória")
+    parser.add_argument('--inventario-arquivo', metavar='ARQUIVO', help="Salva o inventário em ARQUIVO e, nas próximas execuções, só relista as pastas alteradas (implica --inventario)")
+    parser.add_argument('--empresas-por-commit', type=int, default=200, help="Empresas geradas por transação (1 = uma transação por empresa)")
+    parser.add_argument('--linhas-por-commit', type=int, default=LINHAS_POR_COMMIT, help="Linhas de pastas confirmadas por transação na criação das pastas")
+    parser.add_argument('--virada', metavar='AAAA-MM..AAAA-MM', type=interpretar_periodos, help="Gera só as pastas de ANO/MÊS do período para as empresas já existentes (ex.: 2026-01..2026-12)")
+    args = parser.parse_args()
+    if args.virada and args.plan:
+        parser.error("--virada não pode ser combinada com --plan")
+
+    base_path = args.base_path
+    if args.backend:
+        armazenamento = criar_armazenamento(args.backend)
+        resolvedor = CacheResolvedor(armazenamento.resolvedor_padrao())
+    if args.inventario or args.inventario_arquivo:
+        armazenamento = preparar_inventario(armazenamento, base_path, args.inventario_arquivo)
+
+    if args.aplicar_plano:
+        aplicar_plano(args.aplicar_plano)
+        if args.inventario_arquivo:
+            armazenamento.salvar_inventario()
+        sys.exit(0)
+
     # Carregar os dados das tabelas
     estruturas_data, pastas_data, empresas_data, empresas_estruturas, permissoes_data, tipos_permissao_data, grupos_data = carregar_dados()
 
-    # Preencher a tabela de hierarquia de pastas por empresa
-    preencher_tabela_empresas_estruturas(empresas_data, estruturas_data, pastas_data)
+    # Índice em memória das estruturas, montado uma vez por execução
+    indice = IndiceEstruturas(estruturas_data, pastas_data)
+
+    # Expandir o modelo automático (ANO/MÊS inclusos) uma única vez
+    modelos = compilar_modelos(indice)
+
+    if args.plan:
+        planejar_execucao(
+            args.plan, empresas_data, modelos, reconciliar=args.reconciliar, verificar_acl=args.verificar_acl,
+            indice=indice if args.heranca else None
+        )
+        sys.exit(0)
+
+    # Checkpoint da execução; na fila, a própria fila registra o progresso de cada execução
+    # (só é retomada uma execução anterior com o mesmo modo e as mesmas opções)
+    execucao = None if args.fila else iniciar_execucao(engine, SCRIPT_PLANO, {
+        'reconciliar': args.reconciliar, 'virada': args.virada, 'fila': args.fila,
+        'base_path': base_path, 'backend': armazenamento.nome,
+    })
+
+    # Estruturas automáticas novas (API): só as linhas novas, abaixo das pastas pai já existentes.
+    # Se o índice foi recarregado, as empresas ainda não geradas também recebem as estruturas novas.
+    indice_atual = processar_fila_estruturas(indice)
+    if indice_atual is not indice:
+        indice = indice_atual
+        modelos = compilar_modelos(indice)
+
+    # Preencher a tabela de hierarquia de pastas por empresa (na virada, só as linhas dos novos períodos)
+    if args.virada:
+        virar_periodo(args.virada, indice)
+    elif args.fila:
+        preencher_tabela_empresas_estruturas_fila(modelos, tamanho_lote_empresas=args.empresas_por_commit)
+    elif not preencher_tabela_empresas_estruturas(
+        empresas_data, modelos, tamanho_lote_empresas=args.empresas_por_commit, workers=args.workers,
+        arquivo_inventario=args.inventario_arquivo, execucao=execucao
+    ):
+        print(f"Execução interrompida ({execucao.relatorio()}); rode novamente para retomar.")
+        sys.exit(1)
 
     # Criar a estrutura de pastas para a empresa 7472
     print("### Criação das Pastas ###")
-    criar_estrutura_pastas()
-
+    if not criar_estrutura_pastas(
+        reconciliar=args.reconciliar, verificar_acl=args.verificar_acl, indice=indice if args.heranca else None,
+        linhas_por_commit=args.linhas_por_commit, execucao=execucao, fila=args.fila,
+        empresas_por_reserva=args.empresas_por_commit
+    ):
+        if execucao is not None:
+            print(f"Execução interrompida ({execucao.relatorio()}); rode novamente para retomar.")
+        sys.exit(1)
+
+    if execucao is not None:
+        execucao.concluir()
+        print(f"Execução: {execucao.relatorio()}")
+    if args.inventario_arquivo:
+        armazenamento.salvar_inventario()
     print("Estrutura de pastas criada com sucesso.END")
@@ -1,35 +1,57 @@
 ﻿import os
-import win32security
-import ntsecuritycon as con
-from sqlalchemy import create_engine, Table, MetaData, select, update
+import argparse
+from sqlalchemy import create_engine, select, update, inspect
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 from pathlib import Path
+import sys
 
-# Caminho base onde as pastas serão criadas
-base_path = r'D:\Arquivos'
-
+# Permite importar os módulos compartilhados de src/
+sys.path.append(str(Path(__file__).parent.parent))
+from src.esquema import obter_esquema
+from materializar_pastas import materializar_pastas
+from resolvedor_principais import CacheResolvedor
+from construtor_acl import EstatisticasAcl, aplicar_dacl, conferir_dacl
+from armazenamento import BACKENDS, criar_armazenamento
+from inventario_pastas import preparar_inventario
+from impressoes_acl import RegistroImpressoes, criar_tabela_impressoes, impressao_permissoes, impressoes_acl
+from plano_permissoes import carregar_plano_permissoes
+from indice_estruturas import IndiceEstruturas
+from hierarquia_estruturas import (
+    criar_tabela_hierarquia, hierarquia_estruturas, hierarquia_sincronizada, nomes_caminhos, nomes_caminhos_memoria
+)
+from planejador_heranca import planejar_heranca
+from plano_execucao import EscritorPlano, sequencias_plano, validar_plano
 
 # Carrega o .env que está um nível acima de src/
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Caminho base onde as pastas serão criadas e backend de armazenamento (ntfs, posix ou memoria)
+base_path = os.getenv("ARQUIVOS_BASE_PATH", r'D:\Arquivos')
+armazenamento = criar_armazenamento(os.getenv("ARQUIVOS_BACKEND"))
+
 DATABASE_URI = os.getenv("DATABASE_URI")
 if not DATABASE_URI:
     raise ValueError("DATABASE_URI não definida nas variáveis de ambiente.")
 
 engine = create_engine(DATABASE_URI, echo=False)  # Desabilitar logging SQL
 
+# Resolução de grupos (SID) memorizada durante toda a execução
+resolvedor = CacheResolvedor(armazenamento.resolvedor_padrao())
+estatisticas_acl = EstatisticasAcl()
+
+# Nome do script gravado no cabeçalho dos planos (--plan)
+SCRIPT_PLANO = 'criar_pastas_estrutura_manual'
+
 # Função para carregar dados das tabelas
 def load_data(engine):
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    
-    estruturas = Table('WeBotPastasEstruturas', meta, autoload_with=engine)
-    pastas = Table('WeBotPastasPastas', meta, autoload_with=engine)
-    permissoes = Table('WeBotPastasPermissoes', meta, autoload_with=engine)
-    tipos_permissao = Table('WeBotPastastipos_permissao', meta, autoload_with=engine)
-    grupos = Table('WeBotPastasgrupos', meta, autoload_with=engine)
+    esquema = obter_esquema(engine)
+    estruturas = esquema.estruturas
+    pastas = esquema.pastas
+    permissoes = esquema.permissoes
+    tipos_permissao = esquema.tipos_permissao
+    grupos = esquema.grupos
     
     with engine.connect() as conn:
         estruturas_data = conn.execute(select(estruturas)).fetchall()
@@ -44,165 +66,201 @@ def load_data(engine):
 def clean_directory_name(name):
     return name.replace('\r', '').replace('\n', '').strip()
 
-# Função para encontrar o nome da pasta pelo ID
-def find_pasta_name(pastas_data, id):
-    for pasta in pastas_data:
-        if pasta.id == id:
-            return clean_directory_name(pasta.nomepasta)
-    return None
-
-# Função para construir o caminho completo de uma estrutura
-def build_path(estrutura, estruturas_data, pastas_data, base_path):
-    caminho_parts = []
-    while estrutura.pai_id is not None:
-        nome_pasta = find_pasta_name(pastas_data, estrutura.WeBotPastas_pasta_id)
-        caminho_parts.insert(0, nome_pasta)
-        estrutura = next(e for e in estruturas_data if e.id == estrutura.pai_id)
-    
-    nome_pasta = find_pasta_name(pastas_data, estrutura.WeBotPastas_pasta_id)
-    caminho_parts.insert(0, nome_pasta)
-    
-    caminho = os.path.join(base_path, *caminho_parts)
-    return caminho
-
-# Função para criar pastas se não existirem
-def create_folder_if_not_exists(path):
-    try:
-        os.makedirs(path, exist_ok=True)
-    except PermissionError as e:
-        print(f"Erro de permissão ao criar pasta {path}: {e}")
-    except OSError as e:
-        print(f"Erro ao criar pasta {path}: {e}")
-
-# Função para verificar se o grupo existe
-def group_exists(group_name):
-    try:
-        sid, domain, type = win32security.LookupAccountName(None, group_name)
-        print(f"Grupo '{group_name}' encontrado. SID: {sid}, Domain: {domain}, Type: {type}")
-        return True
-    except win32security.error as e:
-        if e.winerror == 1332:  # ERROR_NONE_MAPPED
-            print(f"Grupo '{group_name}' não encontrado.")
+# Função para construir o caminho completo de uma estrutura a partir dos nomes das pastas,
+# da raiz até ela (uma consulta à tabela de hierarquia para todas as estruturas)
+def build_path(nomes_pastas, base_path):
+    caminho_parts = [clean_directory_name(nome) for nome in nomes_pastas if nome is not None]
+    return os.path.join(base_path, *caminho_parts)
+
+# Função para ajustar permissões da pasta conforme o plano carregado de WeBotPastasPermissoes.
+# As permissões padrão são descartadas e a DACL final (grupos + herança) é gravada uma única vez;
+# com `impressoes`, pastas cujas permissões desejadas não mudaram são puladas.
+# Com simular=True nada é gravado; devolve True se a ACL seria gravada.
+def ajustar_permissoes(plano, caminho, estrutura_id, impressoes=None, verificar_acl=False, propagar=False, simular=False):
+    regras = []
+    regras_impressao = []
+    for group_name, mascara in plano.get(estrutura_id, ()):
+        sid = resolvedor.resolver(group_name)
+        regras_impressao.append((group_name, sid, mascara))
+        if sid is None:
+            print(f"Grupo não encontrado: {group_name}")
+            continue
+        regras.append((sid, mascara))
+
+    if impressoes is not None:
+        impressao = impressao_permissoes(regras_impressao, manter_existentes=False, propagar=propagar)
+        if impressoes.inalterada(caminho, impressao) and (
+            not verificar_acl or conferir_dacl(armazenamento, caminho, regras, manter_existentes=False, estatisticas=estatisticas_acl)
+        ):
+            impressoes.puladas += 1
+            print(f"Permissões inalteradas em {caminho}")
             return False
-        else:
-            raise
-
-# Função para ajustar permissões da pasta conforme tabela WeBotPastasPermissoes
-def ajustar_permissoes(engine, caminho, estrutura_id):
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    permissoes = Table('WeBotPastasPermissoes', meta, autoload_with=engine)
-    tipos_permissao = Table('WeBotPastastipos_permissao', meta, autoload_with=engine)
-    grupos = Table('WeBotPastasgrupos', meta, autoload_with=engine)
-    
-    try:
-        with engine.connect() as conn:
-            permissoes_data = conn.execute(select(permissoes).where(permissoes.c.estrutura_id == estrutura_id)).fetchall()
-            for permissao in permissoes_data:
-                grupo = conn.execute(select(grupos).where(grupos.c.id == permissao.grupo_id)).fetchone()
-                permissao_tipo = conn.execute(select(tipos_permissao).where(tipos_permissao.c.id == permissao.permissao_id)).fetchone()
-                
-                if grupo and permissao_tipo:
-                    group_name = grupo.nome.strip()  # Remove espaços extras
-                    print(f"Grupo encontrado: {group_name}")
-                    if group_exists(group_name):
-                        print(f"Grupo existe: {group_name}")
-                        set_permissions(caminho, group_name, [permissao_tipo.nome])
-                    else:
-                        print(f"Grupo não encontrado: {group_name}")
-    except SQLAlchemyError as e:
-        print(f"Erro ao ajustar permissões: {e}")
-
-# Função para definir permissões em uma pasta
-def set_permissions(folder_path, group_name, permissions):
-    print(f"Definindo permissões para {group_name} com {permissions} em {folder_path}")
-    # Mapear as permissões de texto para os valores apropriados de NT
-    permission_map = {
-        "ReadAndExecute": con.FILE_GENERIC_READ | con.FILE_GENERIC_EXECUTE,
-        "Modify": con.FILE_GENERIC_WRITE | con.FILE_GENERIC_READ | con.FILE_GENERIC_EXECUTE | con.DELETE,
-        "FullControl": con.FILE_ALL_ACCESS
-    }
-    
-    # Determinar permissões baseadas no texto
-    permission_value = 0
-    for perm in permissions:
-        permission_value |= permission_map.get(perm, 0)
-
-    # Obter o SID do grupo
-    try:
-        sid, domain, type = win32security.LookupAccountName(None, group_name)
-        print(f"SID obtido para {group_name}: {sid}")
-
-        # Obter a DACL atual da pasta
-        sd = win32security.GetFileSecurity(folder_path, win32security.DACL_SECURITY_INFORMATION)
-        dacl = sd.GetSecurityDescriptorDacl()
-
-        # Criar nova DACL
-        new_dacl = win32security.ACL()
-        
-        # Copiar ACEs da DACL existente para a nova DACL, exceto a do grupo alvo
-        for i in range(dacl.GetAceCount()):
-            ace = dacl.GetAce(i)
-            if ace[2] != sid:
-                new_dacl.AddAccessAllowedAce(win32security.ACL_REVISION, ace[1], ace[2])
-
-        # Adicionar nova regra
-        new_dacl.AddAccessAllowedAce(win32security.ACL_REVISION, permission_value, sid)
-        sd.SetSecurityDescriptorDacl(1, new_dacl, 0)
-        win32security.SetFileSecurity(folder_path, win32security.DACL_SECURITY_INFORMATION, sd)
-        print(f'Permissões definidas para {group_name} com {permissions} em {folder_path}')
-    except Exception as e:
-        print(f"Erro ao definir permissões: {e}")
-
-# Função para garantir a herança de permissões
-def ensure_inheritance(path):
-    try:
-        sd = win32security.GetFileSecurity(path, win32security.DACL_SECURITY_INFORMATION)
-        dacl = sd.GetSecurityDescriptorDacl()
-
-        new_dacl = win32security.ACL()
-        for i in range(dacl.GetAceCount()):
-            ace = dacl.GetAce(i)
-            new_dacl.AddAccessAllowedAceEx(win32security.ACL_REVISION, con.OBJECT_INHERIT_ACE | con.CONTAINER_INHERIT_ACE, ace[1], ace[2])
-        
-        sd.SetSecurityDescriptorDacl(1, new_dacl, 0)
-        win32security.SetFileSecurity(path, win32security.DACL_SECURITY_INFORMATION, sd)
-        print(f"Herança de permissões garantida para {path}")
-    except Exception as e:
-        print(f"Erro ao garantir herança de permissões: {e}")
+
+    if simular:
+        return True
+    if aplicar_dacl(armazenamento, caminho, regras, manter_existentes=False, estatisticas=estatisticas_acl, propagar=propagar):
+        print(f"Permissões definidas e herança garantida para {caminho}")
+        if impressoes is not None:
+            impressoes.registrar(caminho, impressao)
+
+# Função para listar as estruturas manuais a processar com o caminho de cada uma
+def listar_pendentes(estruturas_data, caminhos, reconciliar=False):
+    return [
+        (estrutura, build_path(caminhos.get(estrutura.id, ()), base_path))
+        for estrutura in estruturas_data
+        if estrutura.auto == 'N' and (reconciliar or estrutura.gerado == 'N')
+    ]
 
 # Função para criar a hierarquia básica de pastas e marcar como gerado
-def criar_hierarquia_basica(engine):
+# (com reconciliar=True revisa também as já geradas, pulando as ACLs inalteradas;
+# com heranca=True só as pastas cuja permissão difere da pasta pai recebem ACL explícita)
+def criar_hierarquia_basica(engine, reconciliar=False, verificar_acl=False, heranca=False):
     estruturas_data, pastas_data, permissoes_data, tipos_permissao_data, grupos_data = load_data(engine)
-    meta = MetaData()
-    meta.reflect(bind=engine)
-    estruturas = Table('WeBotPastasEstruturas', meta, autoload_with=engine)
-    
+    esquema = obter_esquema(engine)
+    estruturas = esquema.estruturas
+    criar_tabela_impressoes(engine)
+    criar_tabela_hierarquia(engine, estruturas)
+    impressoes = RegistroImpressoes()
+
+    # Permissões de todas as estruturas, carregadas uma única vez
     with engine.connect() as conn:
-        for estrutura in estruturas_data:
-            if estrutura.auto == 'N' and estrutura.gerado == 'N':
-                caminho_completo = build_path(estrutura, estruturas_data, pastas_data, base_path)
-                create_folder_if_not_exists(caminho_completo)
-                
-                # Limpar permissões padrão
-                try:
-                    sd = win32security.GetFileSecurity(caminho_completo, win32security.DACL_SECURITY_INFORMATION)
-                    dacl = sd.GetSecurityDescriptorDacl()
-                    new_dacl = win32security.ACL()
-                    sd.SetSecurityDescriptorDacl(1, new_dacl, 0)
-                    win32security.SetFileSecurity(caminho_completo, win32security.DACL_SECURITY_INFORMATION, sd)
-                    print(f'Permissões padrão removidas para {caminho_completo}')
-                except Exception as e:
-                    print(f"Erro ao limpar permissões padrão: {e}")
-
-                ajustar_permissoes(engine, caminho_completo, estrutura.id)
-                ensure_inheritance(caminho_completo)  # Garantir herança de permissões
-                
-                # Atualizar a coluna gerado para 'S'
-                stmt = update(estruturas).where(estruturas.c.id == estrutura.id).values(gerado='S')
-                result = conn.execute(stmt)
-                conn.commit()
-
-# Executar a criação da hierarquia básica
-criar_hierarquia_basica(engine)
-print("Permissões ajustadas com sucesso.")
+        plano = carregar_plano_permissoes(conn, esquema)
+    planejamento = planejar_heranca(IndiceEstruturas(estruturas_data, pastas_data), plano) if heranca else None
+
+    with engine.connect() as conn:
+        caminhos = nomes_caminhos(conn, esquema)
+    pendentes = listar_pendentes(estruturas_data, caminhos, reconciliar)
+
+    # Criar as pastas em paralelo, nível a nível (profundidade do caminho)
+    estatisticas = materializar_pastas(((caminho, caminho.count(os.sep)) for _, caminho in pendentes), armazenamento)
+    print(f"Pastas: {estatisticas.relatorio()}")
+
+    with engine.connect() as conn:
+        # Últimas impressões aplicadas, para pular as pastas sem mudança
+        impressoes.carregar(conn, [caminho for _, caminho in pendentes])
+
+        for estrutura, caminho_completo in pendentes:
+            if planejamento is None:
+                ajustar_permissoes(plano, caminho_completo, estrutura.id, impressoes, verificar_acl)
+            elif planejamento.decidir(estrutura.id):
+                ajustar_permissoes(plano, caminho_completo, estrutura.id, impressoes, verificar_acl, propagar=True)
+
+            # Atualizar a coluna gerado para 'S'
+            stmt = update(estruturas).where(estruturas.c.id == estrutura.id).values(gerado='S')
+            result = conn.execute(stmt)
+            impressoes.gravar(conn)
+            conn.commit()
+
+    print(f"Impressões: {impressoes.relatorio()}")
+    if planejamento is not None:
+        print(f"Herança: {planejamento.relatorio()}")
+
+# Função para gravar o plano (JSONL) da execução sem alterar o banco nem o disco
+def planejar_hierarquia_basica(engine, caminho_plano, reconciliar=False, verificar_acl=False, heranca=False):
+    estruturas_data, pastas_data, permissoes_data, tipos_permissao_data, grupos_data = load_data(engine)
+    esquema = obter_esquema(engine)
+    # Sem a tabela de impressões (nunca criada), todas as ACLs seriam gravadas
+    impressoes = RegistroImpressoes() if inspect(engine).has_table(impressoes_acl.name) else None
+
+    with engine.connect() as conn, EscritorPlano(
+        caminho_plano, SCRIPT_PLANO, base_path=base_path, backend=armazenamento.nome,
+        reconciliar=reconciliar, heranca=heranca
+    ) as escritor:
+        plano = carregar_plano_permissoes(conn, esquema)
+        planejamento = planejar_heranca(IndiceEstruturas(estruturas_data, pastas_data), plano) if heranca else None
+        # Sem criar a tabela de hierarquia (o plano não grava nada), os caminhos são montados em memória
+        if inspect(engine).has_table(hierarquia_estruturas.name) and hierarquia_sincronizada(conn, esquema.estruturas):
+            caminhos = nomes_caminhos(conn, esquema)
+        else:
+            caminhos = nomes_caminhos_memoria(estruturas_data, pastas_data)
+        pendentes = listar_pendentes(estruturas_data, caminhos, reconciliar)
+        if impressoes is not None:
+            impressoes.carregar(conn, [caminho for _, caminho in pendentes])
+
+        novas = set()
+        for _, caminho in sorted(pendentes, key=lambda pendente: pendente[1].count(os.sep)):
+            if caminho not in novas and not armazenamento.existe(caminho):
+                escritor.registrar('pasta', caminho=caminho, nivel=caminho.count(os.sep))
+                novas.add(caminho)
+
+        for estrutura, caminho in pendentes:
+            if planejamento is not None and not planejamento.decidir(estrutura.id):
+                continue
+            propagar = planejamento is not None
+            # Pastas ainda inexistentes não têm ACL a conferir no disco
+            if ajustar_permissoes(plano, caminho, estrutura.id, impressoes, verificar_acl and caminho not in novas,
+                                  propagar=propagar, simular=True):
+                escritor.registrar(
+                    'acl', caminho=caminho, estrutura_id=estrutura.id, propagar=propagar,
+                    regras=[list(regra) for regra in plano.get(estrutura.id, ())]
+                )
+
+        for estrutura, _ in pendentes:
+            escritor.registrar('gerado', id=estrutura.id)
+
+    print(f"Plano: {escritor.relatorio()}")
+    if planejamento is not None:
+        print(f"Herança: {planejamento.relatorio()}")
+
+# Função para aplicar um plano gravado com --plan exatamente como foi registrado
+def aplicar_plano(engine, caminho_plano):
+    cabecalho, resumo = validar_plano(caminho_plano, SCRIPT_PLANO, base_path=base_path, backend=armazenamento.nome)
+    print(f"Aplicando plano de {cabecalho['criado_em']}: {resumo['contagens']}")
+    esquema = obter_esquema(engine)
+    estruturas = esquema.estruturas
+    criar_tabela_impressoes(engine)
+    criar_tabela_hierarquia(engine, estruturas)
+    impressoes = RegistroImpressoes()
+
+    with engine.connect() as conn:
+        for tipo, entradas in sequencias_plano(caminho_plano):
+            if tipo == 'pasta':
+                estatisticas = materializar_pastas(((entrada['caminho'], entrada['nivel']) for entrada in entradas), armazenamento)
+                print(f"Pastas: {estatisticas.relatorio()}")
+            elif tipo == 'acl':
+                for entrada in entradas:
+                    regras = {entrada['estrutura_id']: tuple(tuple(regra) for regra in entrada['regras'])}
+                    ajustar_permissoes(regras, entrada['caminho'], entrada['estrutura_id'], impressoes, propagar=entrada['propagar'])
+            elif tipo == 'gerado':
+                conn.execute(update(estruturas).where(estruturas.c.id.in_([entrada['id'] for entrada in entradas])).values(gerado='S'))
+            else:
+                raise ValueError(f"Tipo de alteração desconhecido no plano: {tipo}")
+        impressoes.gravar(conn)
+        conn.commit()
+
+    print(f"Impressões: {impressoes.relatorio()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cria as pastas manuais (auto = 'N') e aplica as permissões.")
+    parser.add_argument('--reconciliar', action='store_true', help="Revisa as ACLs de todas as pastas, pulando as inalteradas")
+    parser.add_argument('--verificar-acl', action='store_true', help="Confere a ACL atual no disco antes de pular uma pasta inalterada")
+    parser.add_argument('--heranca', action='store_true', help="Grava ACL só onde a permissão difere da pasta pai; as demais herdam (OI|CI)")
+    parser.add_argument('--base-path', default=base_path, help="Pasta raiz da árvore (padrão: ARQUIVOS_BASE_PATH ou D:\\Arquivos)")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help="Backend de armazenamento (padrão: ARQUIVOS_BACKEND, ntfs no Windows e posix nos demais)")
+    parser.add_argument('--plan', metavar='ARQUIVO', help="Só grava em ARQUIVO (JSONL) as alterações que a execução faria, com contagens e custo estimado")
+    parser.add_argument('--aplicar-plano', metavar='ARQUIVO', help="Aplica um plano gravado com --plan, exatamente como planejado")
+    parser.add_argument('--inventario', action='store_true', help="Varre a árvore uma vez no início e responde as verificações de existência em memória")
+    parser.add_argument('--inventario-arquivo', metavar='ARQUIVO', help="Salva o inventário em ARQUIVO e, nas próximas execuções, só relista as pastas alteradas (implica --inventario)")
+    args = parser.parse_args()
+
+    base_path = args.base_path
+    if args.backend:
+        armazenamento = criar_armazenamento(args.backend)
+        resolvedor = CacheResolvedor(armazenamento.resolvedor_padrao())
+    if args.inventario or args.inventario_arquivo:
+        armazenamento = preparar_inventario(armazenamento, base_path, args.inventario_arquivo)
+
+    if args.plan:
+        planejar_hierarquia_basica(engine, args.plan, reconciliar=args.reconciliar, verificar_acl=args.verificar_acl, heranca=args.heranca)
+        sys.exit(0)
+    if args.aplicar_plano:
+        aplicar_plano(engine, args.aplicar_plano)
+    else:
+        # Executar a criação da hierarquia básica
+        criar_hierarquia_basica(engine, reconciliar=args.reconciliar, verificar_acl=args.verificar_acl, heranca=args.heranca)
+    print(f"Grupos: {resolvedor.relatorio()}")
+    print(f"ACL: {estatisticas_acl.relatorio()}")
+    print(f"Armazenamento: {armazenamento.relatorio()}")
+    if args.inventario_arquivo:
+        armazenamento.salvar_inventario()
+    print("Permissões ajustadas com sucesso.")
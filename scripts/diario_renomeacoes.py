@@ -0,0 +1,107 @@
+import json
+import os
+from datetime import datetime, timezone
+
+# Resultados de uma renomeação que precisam ser gravados no banco
+RESULTADOS_CONFIRMAVEIS = ('renomeada', 'marcada')
+
+
+class DiarioRenomeacoes:
+    """
+    Diário (JSONL, só acrescenta linhas) das renomeações de uma execução.
+
+    Cada renomeação é gravada como planejada antes de ir ao disco e como concluída
+    depois; quando o bloco é confirmado no banco, grava-se 'confirmado'. Se a execução
+    for interrompida, o diário diz o que foi feito no disco e ainda não está no banco.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+        self._seq = 0
+
+    # Começa um diário novo; o anterior só é descartado se terminou (ver pendencias_diario)
+    def iniciar(self, script):
+        self._arquivo = open(self.caminho, 'w', encoding='utf-8')
+        self._gravar({
+            'tipo_entrada': 'inicio', 'script': script, 'pid': os.getpid(),
+            'criado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        })
+        self.sincronizar()
+        return self
+
+    # Continua um diário interrompido (recuperação)
+    def continuar(self):
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+        # Uma linha cortada pela interrupção não pode emendar na próxima entrada
+        if self._arquivo.tell() > 0:
+            with open(self.caminho, 'rb') as arquivo:
+                arquivo.seek(-1, os.SEEK_END)
+                if arquivo.read(1) != b'\n':
+                    self._arquivo.write('\n')
+        return self
+
+    def _gravar(self, entrada):
+        self._arquivo.write(json.dumps(entrada, ensure_ascii=False))
+        self._arquivo.write('\n')
+
+    # Garante que o que foi gravado está no disco antes do próximo passo irreversível
+    def sincronizar(self):
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+
+    def planejar(self, bloco, item):
+        self._seq += 1
+        self._gravar(dict(item, tipo_entrada='planejada', seq=self._seq, bloco=bloco))
+        return self._seq
+
+    def concluir(self, seq, resultado):
+        self._gravar({'tipo_entrada': 'concluida', 'seq': seq, 'resultado': resultado})
+
+    def confirmar(self, bloco):
+        self._gravar({'tipo_entrada': 'confirmado', 'bloco': bloco})
+        self.sincronizar()
+
+    def desfazer(self, seq):
+        self._gravar({'tipo_entrada': 'desfeita', 'seq': seq})
+        self.sincronizar()
+
+    def encerrar(self):
+        self._gravar({'tipo_entrada': 'fim'})
+        self.sincronizar()
+        self._arquivo.close()
+
+
+# Função para ler um diário e devolver as renomeações planejadas em blocos que não chegaram a ser
+# confirmados (cada uma com 'resultado', None se não foi concluída), em ordem.
+# Devolve None se não há diário ou se a execução que o gravou terminou.
+def pendencias_diario(caminho):
+    if not caminho or not os.path.exists(caminho):
+        return None
+    planejadas = {}
+    confirmados = set()
+    encerrado = False
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            try:
+                entrada = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha cortada por uma interrupção; continuar() grava as entradas seguintes
+                # a partir da próxima linha, então a leitura segue adiante
+                continue
+            tipo = entrada['tipo_entrada']
+            if tipo == 'planejada':
+                planejadas[entrada['seq']] = dict(entrada, resultado=None)
+            elif tipo == 'concluida':
+                planejadas[entrada['seq']]['resultado'] = entrada['resultado']
+            elif tipo == 'desfeita':
+                planejadas.pop(entrada['seq'], None)
+            elif tipo == 'confirmado':
+                confirmados.add(entrada['bloco'])
+            elif tipo == 'fim':
+                encerrado = True
+    if encerrado:
+        return None
+    return [item for seq, item in sorted(planejadas.items()) if item['bloco'] not in confirmados]
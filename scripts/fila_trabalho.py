@@ -0,0 +1,214 @@
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, UniqueConstraint, and_, case, insert, or_, select, update
+)
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+# Tempo padrão de uma reserva antes de ser considerada abandonada
+DURACAO_RESERVA = timedelta(minutes=15)
+# Reservas de um item (falhas ou reservas expiradas) antes de ele ser marcado como falho ('F')
+MAX_TENTATIVAS = 5
+
+# Tipo dos itens de replicação de uma nova estrutura automática (chave = id da estrutura),
+# enfileirados pela API e processados pela geração automática
+TIPO_FILA_ESTRUTURA = 'estrutura'
+
+# Dialetos que suportam SELECT ... FOR UPDATE SKIP LOCKED
+DIALETOS_SKIP_LOCKED = ('mysql', 'mariadb', 'postgresql')
+
+metadata_fila = MetaData()
+
+# Fila de trabalho compartilhada entre execuções/máquinas.
+# estado: 'P' (pendente), 'R' (reservado), 'C' (concluído), 'F' (falhou MAX_TENTATIVAS vezes;
+# fica fora das reservas até ser reaberto manualmente com estado = 'P' e tentativas = 0)
+fila_trabalho = Table(
+    'WeBotPastasFilaTrabalho', metadata_fila,
+    Column('id', Integer, primary_key=True),
+    Column('tipo', String(30), nullable=False),
+    Column('chave', Integer, nullable=False),
+    Column('estado', String(1), nullable=False, server_default='P'),
+    Column('dono', String(100)),
+    Column('token', String(36), index=True),
+    Column('expira_em', DateTime),
+    Column('tentativas', Integer, nullable=False, server_default='0'),
+    UniqueConstraint('tipo', 'chave', name='uq_fila_tipo_chave')
+)
+
+
+# Função para criar a tabela da fila, se ainda não existir
+def criar_tabela_fila(engine):
+    metadata_fila.create_all(engine, tables=[fila_trabalho], checkfirst=True)
+
+
+# Identificação do processo que reserva os itens (máquina:pid)
+def identificar_trabalhador():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Função para enfileirar chaves; itens concluídos voltam a ficar pendentes
+def enfileirar(engine, tipo, chaves):
+    chaves = set(chaves)
+    if not chaves:
+        return 0
+
+    with engine.begin() as conn:
+        existentes = {
+            linha.chave: linha.estado
+            for linha in conn.execute(
+                select(fila_trabalho.c.chave, fila_trabalho.c.estado)
+                .where(and_(fila_trabalho.c.tipo == tipo, fila_trabalho.c.chave.in_(chaves)))
+            )
+        }
+
+        reabrir = [chave for chave, estado in existentes.items() if estado == 'C']
+        if reabrir:
+            conn.execute(
+                update(fila_trabalho)
+                .where(and_(fila_trabalho.c.tipo == tipo, fila_trabalho.c.chave.in_(reabrir), fila_trabalho.c.estado == 'C'))
+                .values(estado='P', dono=None, token=None, expira_em=None, tentativas=0)
+            )
+
+    novas = [{'tipo': tipo, 'chave': chave, 'estado': 'P', 'tentativas': 0} for chave in sorted(chaves - existentes.keys())]
+    if novas:
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(fila_trabalho).values(novas))
+        except IntegrityError:
+            # Outra execução enfileirou parte das chaves ao mesmo tempo: insere uma a uma
+            for nova in novas:
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(fila_trabalho).values(nova))
+                except IntegrityError:
+                    pass
+    return len(novas) + len(reabrir)
+
+
+# Função para enfileirar uma chave na transação de quem originou o trabalho (ex.: a API, junto
+# com o registro criado); um item já concluído da mesma chave volta a ficar pendente
+def enfileirar_na_transacao(conn, tipo, chave):
+    estado = conn.execute(
+        select(fila_trabalho.c.estado).where(and_(fila_trabalho.c.tipo == tipo, fila_trabalho.c.chave == chave))
+    ).scalar()
+    if estado is None:
+        conn.execute(insert(fila_trabalho).values(tipo=tipo, chave=chave, estado='P', tentativas=0))
+    elif estado == 'C':
+        conn.execute(
+            update(fila_trabalho)
+            .where(and_(fila_trabalho.c.tipo == tipo, fila_trabalho.c.chave == chave, fila_trabalho.c.estado == 'C'))
+            .values(estado='P', dono=None, token=None, expira_em=None, tentativas=0)
+        )
+
+
+# Função para reservar até `quantidade` itens pendentes (ou com reserva expirada)
+def reservar(engine, tipo, dono, quantidade, duracao=DURACAO_RESERVA, max_tentativas=MAX_TENTATIVAS):
+    """
+    Reserva itens da fila em uma transação própria e devolve ``(token, chaves)``.
+
+    Onde há suporte, a seleção usa ``FOR UPDATE SKIP LOCKED``; nos demais bancos
+    (ex.: SQLite) o UPDATE condicional garante que cada item tenha um só dono.
+    Itens cuja reserva expirou depois de ``max_tentativas`` reservas (ex.: o processo
+    cai sempre no mesmo item) são marcados como falhos em vez de reservados de novo.
+    """
+    token = str(uuid.uuid4())
+    agora = _agora()
+    expirado = and_(fila_trabalho.c.estado == 'R', fila_trabalho.c.expira_em < agora)
+    disponivel = and_(
+        fila_trabalho.c.tipo == tipo,
+        fila_trabalho.c.tentativas < max_tentativas,
+        or_(fila_trabalho.c.estado == 'P', expirado)
+    )
+
+    with engine.begin() as conn:
+        conn.execute(
+            update(fila_trabalho)
+            .where(and_(fila_trabalho.c.tipo == tipo, expirado, fila_trabalho.c.tentativas >= max_tentativas))
+            .values(estado='F', token=None, expira_em=None)
+        )
+        candidatos = select(fila_trabalho.c.id).where(disponivel).order_by(fila_trabalho.c.id).limit(quantidade)
+        if engine.dialect.name in DIALETOS_SKIP_LOCKED:
+            candidatos = candidatos.with_for_update(skip_locked=True)
+        ids = [linha.id for linha in conn.execute(candidatos)]
+        if not ids:
+            return token, []
+
+        conn.execute(
+            update(fila_trabalho)
+            .where(and_(fila_trabalho.c.id.in_(ids), disponivel))
+            .values(
+                estado='R', dono=dono, token=token, expira_em=agora + duracao,
+                tentativas=fila_trabalho.c.tentativas + 1
+            )
+        )
+        chaves = [
+            linha.chave for linha in conn.execute(
+                select(fila_trabalho.c.chave).where(fila_trabalho.c.token == token).order_by(fila_trabalho.c.id)
+            )
+        ]
+    return token, chaves
+
+
+# Função para estender a reserva de um lote ainda em processamento
+def renovar(engine, token, duracao=DURACAO_RESERVA):
+    with engine.begin() as conn:
+        conn.execute(
+            update(fila_trabalho)
+            .where(and_(fila_trabalho.c.token == token, fila_trabalho.c.estado == 'R'))
+            .values(expira_em=_agora() + duracao)
+        )
+
+
+# Função para concluir um lote, na mesma transação que grava o resultado.
+# Devolve quantos itens ainda eram deste token (menos que o reservado = reserva perdida).
+def concluir(session, token):
+    return session.execute(
+        update(fila_trabalho)
+        .where(and_(fila_trabalho.c.token == token, fila_trabalho.c.estado == 'R'))
+        .values(estado='C', expira_em=None)
+    ).rowcount
+
+
+# Função para renovar a reserva em segundo plano, a cada terço da duração, enquanto o lote é
+# processado: um lote que demora mais que a reserva não é assumido por outro trabalhador no meio
+@contextmanager
+def manter_reserva(engine, token, duracao=DURACAO_RESERVA):
+    parar = threading.Event()
+
+    def renovar_periodicamente():
+        while not parar.wait(duracao.total_seconds() / 3):
+            try:
+                renovar(engine, token, duracao)
+            except SQLAlchemyError as e:
+                print(f"Erro ao renovar a reserva {token}: {e}")
+
+    renovacao = threading.Thread(target=renovar_periodicamente, daemon=True)
+    renovacao.start()
+    try:
+        yield
+    finally:
+        parar.set()
+        renovacao.join()
+
+
+# Função para devolver um lote à fila após uma falha; itens que já falharam `max_tentativas`
+# vezes são marcados como falhos ('F') e não voltam a ser reservados
+def liberar(engine, token, max_tentativas=MAX_TENTATIVAS):
+    with engine.begin() as conn:
+        conn.execute(
+            update(fila_trabalho)
+            .where(and_(fila_trabalho.c.token == token, fila_trabalho.c.estado == 'R'))
+            .values(
+                estado=case((fila_trabalho.c.tentativas >= max_tentativas, 'F'), else_='P'),
+                dono=None, token=None, expira_em=None
+            )
+        )
@@ -0,0 +1,121 @@
+import time
+from itertools import islice
+
+from sqlalchemy import and_, or_, select, insert
+
+# Quantidade de linhas por INSERT multi-linha
+TAMANHO_LOTE_INSERT = 1000
+# Quantidade de IDs por cláusula IN nas consultas de pré-carga
+TAMANHO_LOTE_IN = 500
+# Quantidade de linhas trazidas por vez nas leituras paginadas
+TAMANHO_LOTE_LEITURA = 1000
+
+
+class EstatisticasGravacao:
+    """Contadores da gravação em lote em WeBotPastasEmpresasEstruturas."""
+
+    def __init__(self):
+        self.linhas_inseridas = 0
+        self.linhas_existentes = 0
+        self.comandos = 0
+        self.segundos = 0.0
+
+    @property
+    def linhas_por_segundo(self):
+        return self.linhas_inseridas / self.segundos if self.segundos else 0.0
+
+    # Soma os contadores de outra gravação (ex.: um shard do pool). O tempo não é somado: com
+    # processos em paralelo, quem junta os resultados registra o tempo de parede.
+    def somar(self, outra):
+        self.linhas_inseridas += outra.linhas_inseridas
+        self.linhas_existentes += outra.linhas_existentes
+        self.comandos += outra.comandos
+
+    def relatorio(self):
+        return (
+            f"{self.linhas_inseridas} linhas inseridas ({self.linhas_existentes} já existiam) "
+            f"em {self.comandos} comandos, {self.segundos:.2f}s, "
+            f"{self.linhas_por_segundo:.0f} linhas/s"
+        )
+
+
+# Função para dividir uma sequência em blocos de tamanho fixo. Consome a entrada aos poucos:
+# com um gerador, só o bloco corrente fica em memória.
+def em_blocos(itens, tamanho):
+    iterador = iter(itens)
+    while True:
+        bloco = list(islice(iterador, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+# Condição "depois de `valores`" na ordem das colunas `chaves` (comparação linha a linha, portável)
+def depois_da_chave(chaves, valores):
+    condicao = chaves[-1] > valores[-1]
+    for coluna, valor in reversed(list(zip(chaves[:-1], valores[:-1]))):
+        condicao = or_(coluna > valor, and_(coluna == valor, condicao))
+    return condicao
+
+
+# Função para ler uma consulta grande em blocos por paginação de chave: cada bloco é uma leitura
+# curta (WHERE chave > última ORDER BY chave LIMIT tamanho) em uma conexão devolvida logo em seguida.
+# Nenhum cursor fica aberto enquanto o bloco é processado e confirmado, então a leitura não segura
+# conexão, snapshot nem bloqueios durante a execução inteira.
+# `chaves` são as colunas da ordenação (únicas em conjunto e presentes no SELECT); com `depois_de`,
+# a leitura começa após essa chave (retomada de checkpoint).
+def ler_por_chave(engine, consulta, chaves, tamanho=TAMANHO_LOTE_LEITURA, depois_de=None):
+    ultima = depois_de
+    while True:
+        pagina = consulta if ultima is None else consulta.where(depois_da_chave(chaves, ultima))
+        with engine.connect() as conn:
+            bloco = conn.execute(pagina.order_by(*chaves).limit(tamanho)).all()
+        if not bloco:
+            return
+        yield bloco
+        if len(bloco) < tamanho:
+            return
+        ultima = [bloco[-1]._mapping[coluna] for coluna in chaves]
+
+
+# Função para carregar as chaves (empresa_id, estrutura_id, caminho_completo) já gravadas.
+# Com `estrutura_ids`, só as linhas dessas estruturas (ex.: as subárvores de ANO/MÊS da virada).
+def carregar_chaves_existentes(session, empresas_estruturas, empresa_ids, estatisticas=None, estrutura_ids=None):
+    chaves = set()
+    for bloco in em_blocos(empresa_ids, TAMANHO_LOTE_IN):
+        consulta = select(
+            empresas_estruturas.c.empresa_id,
+            empresas_estruturas.c.estrutura_id,
+            empresas_estruturas.c.caminho_completo
+        ).where(empresas_estruturas.c.empresa_id.in_(bloco))
+        if estrutura_ids is not None:
+            consulta = consulta.where(empresas_estruturas.c.estrutura_id.in_(estrutura_ids))
+        resultado = session.execute(consulta)
+        chaves.update(tuple(linha) for linha in resultado)
+        if estatisticas is not None:
+            estatisticas.comandos += 1
+    return chaves
+
+
+# Função para gravar somente as linhas ausentes, com um INSERT multi-linha por bloco
+def inserir_linhas_ausentes(session, empresas_estruturas, linhas, chaves_existentes, estatisticas=None,
+                            tamanho_lote=TAMANHO_LOTE_INSERT):
+    estatisticas = estatisticas if estatisticas is not None else EstatisticasGravacao()
+    inicio = time.perf_counter()
+
+    novas = []
+    for linha in linhas:
+        chave = (linha['empresa_id'], linha['estrutura_id'], linha['caminho_completo'])
+        if chave in chaves_existentes:
+            estatisticas.linhas_existentes += 1
+            continue
+        chaves_existentes.add(chave)
+        novas.append(linha)
+
+    for bloco in em_blocos(novas, tamanho_lote):
+        session.execute(insert(empresas_estruturas).values(bloco))
+        estatisticas.comandos += 1
+        estatisticas.linhas_inseridas += len(bloco)
+
+    estatisticas.segundos += time.perf_counter() - inicio
+    return estatisticas
@@ -0,0 +1,160 @@
+from sqlalchemy import Column, Integer, MetaData, Table, and_, delete, exists, func, insert, literal, or_, select
+
+from gravacao_lote import TAMANHO_LOTE_INSERT, em_blocos
+
+metadata_hierarquia = MetaData()
+
+# Tabela de fechamento (closure table) de WeBotPastasEstruturas: um par por ancestral de cada
+# estrutura, incluindo ela mesma com profundidade 0. Subárvores, ancestrais e caminhos de um nó
+# saem de uma única consulta indexada, sem carregar a tabela inteira.
+hierarquia_estruturas = Table(
+    'WeBotPastasEstruturasHierarquia', metadata_hierarquia,
+    Column('ancestral_id', Integer, primary_key=True),
+    Column('descendente_id', Integer, primary_key=True, index=True),
+    Column('profundidade', Integer, nullable=False),
+)
+
+
+# Função para criar a tabela de hierarquia, se ainda não existir, e reconstruí-la se estiver
+# fora de sincronia com WeBotPastasEstruturas (tabela nova ou estruturas alteradas fora da API)
+def criar_tabela_hierarquia(engine, estruturas):
+    metadata_hierarquia.create_all(engine, tables=[hierarquia_estruturas], checkfirst=True)
+    with engine.begin() as conn:
+        if not hierarquia_sincronizada(conn, estruturas):
+            total = reconstruir_hierarquia(conn, estruturas)
+            print(f"Hierarquia de estruturas reconstruída: {total} pares ancestral/descendente")
+
+
+# Confere a tabela de hierarquia com WeBotPastasEstruturas: mesmas contagens de nós e de ligações
+# pai/filho e nenhuma estrutura sem o próprio par (id, id) ou sem o par (pai_id, id) de profundidade 1.
+# Só as contagens não bastam: um pai_id alterado fora da API mantém os totais e deixa a hierarquia errada.
+def hierarquia_sincronizada(conn, estruturas):
+    h = hierarquia_estruturas
+    nos, ligacoes = conn.execute(
+        select(func.count(), func.count(estruturas.c.pai_id)).select_from(estruturas)
+    ).one()
+    nos_hierarquia = conn.execute(select(func.count()).where(h.c.profundidade == 0)).scalar_one()
+    ligacoes_hierarquia = conn.execute(select(func.count()).where(h.c.profundidade == 1)).scalar_one()
+    if (nos, ligacoes) != (nos_hierarquia, ligacoes_hierarquia):
+        return False
+    ausentes = conn.execute(
+        select(func.count()).select_from(estruturas).where(or_(
+            ~exists().where(
+                h.c.ancestral_id == estruturas.c.id,
+                h.c.descendente_id == estruturas.c.id,
+                h.c.profundidade == 0,
+            ),
+            and_(
+                estruturas.c.pai_id.is_not(None),
+                ~exists().where(
+                    h.c.ancestral_id == estruturas.c.pai_id,
+                    h.c.descendente_id == estruturas.c.id,
+                    h.c.profundidade == 1,
+                )
+            )
+        ))
+    ).scalar_one()
+    return ausentes == 0
+
+
+# Função para calcular, a partir de {id: pai_id}, os ancestrais de cada estrutura:
+# {id: ((id, 0), (pai, 1), ..., (raiz, n))}
+def calcular_ancestrais(pais):
+    ancestrais = {}
+    for estrutura_id in pais:
+        # Sobe até um nó já calculado (ou a raiz) e desce preenchendo a cadeia
+        cadeia = []
+        atual = estrutura_id
+        while atual is not None and atual not in ancestrais and atual in pais:
+            if atual in cadeia:
+                print(f"Loop detectado na estrutura ID {atual}")
+                break
+            cadeia.append(atual)
+            atual = pais[atual]
+        acima = ancestrais.get(atual, ())
+        for no in reversed(cadeia):
+            acima = ((no, 0),) + tuple((ancestral, profundidade + 1) for ancestral, profundidade in acima)
+            ancestrais[no] = acima
+    return ancestrais
+
+
+# Função para recalcular a tabela inteira a partir de pai_id; devolve a quantidade de pares
+def reconstruir_hierarquia(conn, estruturas):
+    ancestrais = calcular_ancestrais(dict(conn.execute(select(estruturas.c.id, estruturas.c.pai_id)).all()))
+    conn.execute(delete(hierarquia_estruturas))
+    pares = (
+        {'ancestral_id': ancestral, 'descendente_id': descendente, 'profundidade': profundidade}
+        for descendente, lista in ancestrais.items()
+        for ancestral, profundidade in lista
+    )
+    total = 0
+    for bloco in em_blocos(pares, TAMANHO_LOTE_INSERT):
+        conn.execute(insert(hierarquia_estruturas), bloco)
+        total += len(bloco)
+    return total
+
+
+# Função para registrar uma estrutura nova (na mesma transação do INSERT em WeBotPastasEstruturas):
+# ela mesma com profundidade 0 e os ancestrais do pai, um nível mais fundo
+def inserir_na_hierarquia(conn, estrutura_id, pai_id=None):
+    h = hierarquia_estruturas
+    conn.execute(insert(h).values(ancestral_id=estrutura_id, descendente_id=estrutura_id, profundidade=0))
+    if pai_id is not None:
+        conn.execute(
+            insert(h).from_select(
+                ['ancestral_id', 'descendente_id', 'profundidade'],
+                select(h.c.ancestral_id, literal(estrutura_id), h.c.profundidade + 1)
+                .where(h.c.descendente_id == pai_id)
+            )
+        )
+
+
+# Consulta dos ancestrais (da raiz até o próprio nó) das estruturas informadas, com o nome da pasta
+def consulta_ancestrais(esquema, estrutura_ids=None):
+    h = hierarquia_estruturas
+    consulta = (
+        select(h.c.descendente_id, h.c.ancestral_id, h.c.profundidade, esquema.pastas.c.nomepasta)
+        .select_from(
+            h.join(esquema.estruturas, esquema.estruturas.c.id == h.c.ancestral_id)
+            .outerjoin(esquema.pastas, esquema.pastas.c.id == esquema.estruturas.c.WeBotPastas_pasta_id)
+        )
+        .order_by(h.c.descendente_id, h.c.profundidade.desc())
+    )
+    if estrutura_ids is not None:
+        consulta = consulta.where(h.c.descendente_id.in_(estrutura_ids))
+    return consulta
+
+
+# Consulta da subárvore de uma estrutura (ela própria e os descendentes), com pai e nome da pasta
+def consulta_subarvore(esquema, estrutura_id):
+    h = hierarquia_estruturas
+    estruturas = esquema.estruturas
+    return (
+        select(estruturas.c.id, estruturas.c.pai_id, esquema.pastas.c.nomepasta)
+        .select_from(
+            h.join(estruturas, estruturas.c.id == h.c.descendente_id)
+            .join(esquema.pastas, estruturas.c.WeBotPastas_pasta_id == esquema.pastas.c.id)
+        )
+        .where(h.c.ancestral_id == estrutura_id)
+        .order_by(h.c.profundidade, estruturas.c.id)
+    )
+
+
+# Função para montar {estrutura_id: [nomes das pastas, da raiz até a estrutura]} em uma consulta
+def nomes_caminhos(conn, esquema, estrutura_ids=None):
+    caminhos = {}
+    for linha in conn.execute(consulta_ancestrais(esquema, estrutura_ids)):
+        caminhos.setdefault(linha.descendente_id, []).append(linha.nomepasta)
+    return caminhos
+
+
+# Função para montar o mesmo mapa de nomes_caminhos em memória, a partir das tabelas já carregadas
+# (usada quando a tabela de hierarquia não pode ser criada, como no --plan)
+def nomes_caminhos_memoria(estruturas_data, pastas_data):
+    nomes = {pasta.id: pasta.nomepasta for pasta in pastas_data}
+    pastas = {estrutura.id: estrutura.WeBotPastas_pasta_id for estrutura in estruturas_data}
+    ancestrais = calcular_ancestrais({estrutura.id: estrutura.pai_id for estrutura in estruturas_data})
+    return {
+        estrutura_id: [nomes.get(pastas[ancestral]) for ancestral, _ in reversed(lista)]
+        for estrutura_id, lista in ancestrais.items()
+    }
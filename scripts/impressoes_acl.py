@@ -0,0 +1,120 @@
+import hashlib
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Text, delete, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from gravacao_lote import em_blocos, TAMANHO_LOTE_IN
+
+metadata_impressoes = MetaData()
+
+# Bancos com upsert nativo (INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE)
+UPSERT_POR_DIALETO = {
+    'mysql': mysql.insert,
+    'mariadb': mysql.insert,
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Última permissão aplicada em cada pasta (hash do caminho -> hash das regras)
+impressoes_acl = Table(
+    'WeBotPastasAclImpressoes', metadata_impressoes,
+    Column('chave_caminho', String(64), primary_key=True),
+    Column('caminho', Text, nullable=False),
+    Column('impressao', String(64), nullable=False),
+    Column('atualizado_em', DateTime),
+)
+
+
+# Função para criar a tabela de impressões, se ainda não existir
+def criar_tabela_impressoes(engine):
+    metadata_impressoes.create_all(engine, tables=[impressoes_acl], checkfirst=True)
+
+
+# Upsert de um bloco de impressões no dialeto da conexão; nos demais bancos, delete + insert
+def _gravar_bloco(conn, linhas):
+    dialeto = (conn.get_bind() if hasattr(conn, 'get_bind') else conn).dialect.name
+    upsert = UPSERT_POR_DIALETO.get(dialeto)
+    if upsert is None:
+        conn.execute(delete(impressoes_acl).where(impressoes_acl.c.chave_caminho.in_([linha['chave_caminho'] for linha in linhas])))
+        conn.execute(insert(impressoes_acl).values(linhas))
+        return
+    comando = upsert(impressoes_acl).values(linhas)
+    if dialeto in ('mysql', 'mariadb'):
+        comando = comando.on_duplicate_key_update(
+            impressao=comando.inserted.impressao, caminho=comando.inserted.caminho,
+            atualizado_em=comando.inserted.atualizado_em,
+        )
+    else:
+        comando = comando.on_conflict_do_update(
+            index_elements=[impressoes_acl.c.chave_caminho],
+            set_={'impressao': comando.excluded.impressao, 'caminho': comando.excluded.caminho,
+                  'atualizado_em': comando.excluded.atualizado_em},
+        )
+    conn.execute(comando)
+
+
+def _chave_caminho(caminho):
+    return hashlib.sha256(caminho.encode('utf-8')).hexdigest()
+
+
+# Função para calcular a impressão digital das permissões desejadas de uma pasta.
+# regras: [(nome_grupo, sid ou None, mascara)] na ordem do plano.
+def impressao_permissoes(regras, manter_existentes=True, propagar=False):
+    partes = [f"manter={int(bool(manter_existentes))}"]
+    if propagar:
+        partes.append("propagar=1")
+    for nome_grupo, sid, mascara in regras:
+        partes.append(f"{nome_grupo}|{'' if sid is None else sid}|{mascara}")
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+class RegistroImpressoes:
+    """
+    Impressões persistidas em WeBotPastasAclImpressoes.
+
+    Pastas cuja impressão não mudou desde a última execução são puladas; as novas
+    impressões ficam em memória até ``gravar``.
+    """
+
+    def __init__(self):
+        self._conhecidas = {}
+        self._pendentes = {}
+        self.puladas = 0
+        self.aplicadas = 0
+
+    # Pré-carrega as impressões de um conjunto de caminhos (uma consulta por bloco)
+    def carregar(self, conn, caminhos):
+        chaves = {_chave_caminho(caminho) for caminho in caminhos} - self._conhecidas.keys()
+        for bloco in em_blocos(chaves, TAMANHO_LOTE_IN):
+            for linha in conn.execute(
+                select(impressoes_acl.c.chave_caminho, impressoes_acl.c.impressao)
+                .where(impressoes_acl.c.chave_caminho.in_(bloco))
+            ):
+                self._conhecidas[linha.chave_caminho] = linha.impressao
+
+    def inalterada(self, caminho, impressao):
+        return self._conhecidas.get(_chave_caminho(caminho)) == impressao
+
+    def registrar(self, caminho, impressao):
+        chave = _chave_caminho(caminho)
+        self._conhecidas[chave] = impressao
+        self._pendentes[chave] = (caminho, impressao)
+        self.aplicadas += 1
+
+    # Grava as impressões novas/alteradas (um upsert por bloco)
+    def gravar(self, conn):
+        agora = datetime.now(timezone.utc).replace(tzinfo=None)
+        for bloco in em_blocos(self._pendentes.items(), TAMANHO_LOTE_IN):
+            _gravar_bloco(conn, [
+                {'chave_caminho': chave, 'caminho': caminho, 'impressao': impressao, 'atualizado_em': agora}
+                for chave, (caminho, impressao) in bloco
+            ])
+        self._pendentes.clear()
+
+    # Esquece as impressões já consultadas (processamento em blocos, sem a memória crescer com a tabela)
+    def esquecer(self):
+        self._conhecidas.clear()
+
+    def relatorio(self):
+        return f"{self.aplicadas} pastas com ACL aplicada, {self.puladas} inalteradas puladas"
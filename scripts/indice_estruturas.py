@@ -0,0 +1,99 @@
+import os
+
+# Pasta que representa a raiz de cada empresa na estrutura automática
+ID_PASTA_EMPRESA = 102
+# Placeholders de período (AutoPastaWebot - ANO / AutoPastaWebot - MÊS)
+ID_PASTA_ANO = 114
+ID_PASTA_MES = 115
+
+NOME_PASTA_EMPRESAS = 'AutoPastaWebot - Empresas'
+
+
+# Função para limpar o nome dos diretórios
+def limpar_nome_diretorio(nome):
+    if nome is not None:
+        return nome.replace('\r', '').replace('\n', '').strip()
+    else:
+        return ''
+
+
+class IndiceEstruturas:
+    """
+    Índice em memória de WeBotPastasEstruturas e WeBotPastasPastas.
+
+    Montado uma única vez por execução, substitui as varreduras lineares de
+    estruturas_data/pastas_data por consultas a dicionários.
+    """
+
+    def __init__(self, estruturas_data, pastas_data):
+        self.nomes_pastas = {pasta.id: limpar_nome_diretorio(pasta.nomepasta) for pasta in pastas_data}
+        self.estruturas = {}
+        self.filhos = {}
+        for estrutura in estruturas_data:
+            self.estruturas[estrutura.id] = estrutura
+            self.filhos.setdefault(estrutura.pai_id, []).append(estrutura)
+
+        self._partes = {}
+        self._relativos = {}
+
+    # Nome (já limpo) da pasta pelo ID, ou None se não existir
+    def nome_pasta(self, id_pasta):
+        return self.nomes_pastas.get(id_pasta)
+
+    # Filhos diretos de uma estrutura, na ordem original da tabela
+    def filhos_de(self, estrutura_id):
+        return self.filhos.get(estrutura_id, [])
+
+    # Estruturas automáticas que representam a pasta raiz de cada empresa
+    def raizes_empresa(self):
+        return [
+            estrutura for estrutura in self.estruturas.values()
+            if estrutura.auto == 'S' and estrutura.WeBotPastas_pasta_id == ID_PASTA_EMPRESA
+        ]
+
+    # Partes do caminho dos ancestrais até a estrutura (sem a pasta 'AutoPastaWebot - Empresas')
+    def partes_caminho(self, estrutura_id):
+        if estrutura_id in self._partes:
+            return self._partes[estrutura_id]
+
+        # Sobe a hierarquia até um nó já calculado ou até a raiz
+        cadeia = []
+        visitados = set()
+        atual = self.estruturas.get(estrutura_id)
+        while atual is not None and atual.id not in self._partes:
+            if atual.id in visitados:
+                raise ValueError(f"Loop detectado na estrutura ID {atual.id}")
+            visitados.add(atual.id)
+            cadeia.append(atual)
+            atual = self.estruturas.get(atual.pai_id) if atual.pai_id is not None else None
+
+        partes = self._partes[atual.id] if atual is not None else ()
+        for estrutura in reversed(cadeia):
+            nome_pasta = self.nome_pasta(estrutura.WeBotPastas_pasta_id)
+            if nome_pasta and nome_pasta != NOME_PASTA_EMPRESAS:
+                partes = partes + (nome_pasta,)
+            self._partes[estrutura.id] = partes
+        return self._partes.get(estrutura_id, ())
+
+    # Partes do caminho relativo antes e depois da posição do nome da empresa
+    def divisao_empresa(self, estrutura_id):
+        if estrutura_id not in self._relativos:
+            partes = list(self.partes_caminho(estrutura_id))
+            if 'Empresas' not in partes:
+                partes.insert(0, 'Empresas')
+            if 'Arquivo Digital' not in partes:
+                partes.insert(0, 'Arquivo Digital')
+            posicao_empresa = partes.index('Empresas') + 1
+            self._relativos[estrutura_id] = (tuple(partes[:posicao_empresa]), tuple(partes[posicao_empresa:]))
+        return self._relativos[estrutura_id]
+
+    # Caminho relativo ao base_path, com 'Arquivo Digital'/'Empresas' e o nome da empresa
+    def caminho_relativo(self, estrutura_id, empresa_nome=None):
+        antes, depois = self.divisao_empresa(estrutura_id)
+        if empresa_nome:
+            return antes + (empresa_nome,) + depois
+        return antes + depois
+
+    # Caminho absoluto de uma estrutura
+    def construir_caminho(self, estrutura_id, base_path, empresa_nome=None):
+        return os.path.join(base_path, *self.caminho_relativo(estrutura_id, empresa_nome))
@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from armazenamento import Armazenamento
+
+# Quantidade padrão de threads listando pastas em paralelo
+TRABALHADORES_INVENTARIO = 16
+
+
+class InventarioPastas:
+    """
+    Árvore (trie) das pastas existentes sob uma raiz, montada com uma única varredura.
+
+    Os nomes são normalizados com ``os.path.normcase`` (no Windows a existência
+    não diferencia maiúsculas). Guarda também o mtime de cada pasta, usado para
+    atualizar o inventário só onde algo mudou. As consultas e alterações passam por
+    um lock, porque o inventário é usado pelas threads que criam e renomeiam pastas.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = os.path.normpath(raiz)
+        self._raiz_normalizada = os.path.normcase(self.raiz)
+        self._arvore = {}
+        self.mtimes = {}
+        self.total = 0
+        self._lock = threading.RLock()
+
+    # Partes do caminho relativas à raiz, ou None se o caminho estiver fora dela
+    def partes(self, caminho):
+        caminho = os.path.normcase(os.path.normpath(caminho))
+        if caminho == self._raiz_normalizada:
+            return ()
+        prefixo = self._raiz_normalizada.rstrip(os.sep) + os.sep
+        if not caminho.startswith(prefixo):
+            return None
+        return tuple(caminho[len(prefixo):].split(os.sep))
+
+    def _no(self, partes):
+        no = self._arvore
+        for parte in partes:
+            no = no.get(parte)
+            if no is None:
+                return None
+        return no
+
+    def _contar_nos(self, no):
+        return sum(1 + self._contar_nos(filho) for filho in no.values())
+
+    # True/False para caminhos sob a raiz; None para caminhos fora do inventário
+    def contem(self, caminho):
+        partes = self.partes(caminho)
+        if partes is None:
+            return None
+        with self._lock:
+            return self._no(partes) is not None
+
+    def filhos(self, partes):
+        with self._lock:
+            no = self._no(partes)
+            return list(no) if no is not None else []
+
+    def adicionar_partes(self, partes, mtime=None):
+        with self._lock:
+            no = self._arvore
+            for parte in partes:
+                if parte not in no:
+                    no[parte] = {}
+                    self.total += 1
+                no = no[parte]
+            if mtime is not None:
+                self.mtimes[partes] = mtime
+
+    def adicionar(self, caminho):
+        partes = self.partes(caminho)
+        if partes:
+            self.adicionar_partes(partes)
+
+    def atualizar_mtime(self, caminho, mtime):
+        partes = self.partes(caminho)
+        with self._lock:
+            if partes is not None and self._no(partes) is not None:
+                self.mtimes[partes] = mtime
+
+    # Move a subárvore inteira (uma operação, como o rename no disco)
+    def mover(self, origem, destino):
+        with self._lock:
+            self._mover(self.partes(origem), self.partes(destino), destino)
+
+    def _mover(self, partes_origem, partes_destino, destino):
+        if not partes_origem:
+            self.adicionar(destino)
+            return
+        pai = self._no(partes_origem[:-1])
+        no = pai.pop(partes_origem[-1], None) if pai is not None else None
+        if no is None:
+            self.adicionar(destino)
+            return
+        # Os mtimes da subárvore movida deixam de valer; ela será relistada na próxima varredura
+        pendentes = [(partes_origem, no)]
+        while pendentes:
+            partes, atual = pendentes.pop()
+            self.mtimes.pop(partes, None)
+            pendentes.extend((partes + (nome,), filho) for nome, filho in atual.items())
+        if partes_destino is None:
+            self.total -= 1 + self._contar_nos(no)
+            return
+        self.adicionar_partes(partes_destino[:-1])
+        self._no(partes_destino[:-1])[partes_destino[-1]] = no
+
+    # Grava o inventário (caminhos relativos e mtimes) para ser atualizado na próxima execução
+    def salvar(self, arquivo):
+        pastas = []
+        with self._lock:
+            pendentes = [((), self._arvore)]
+            while pendentes:
+                partes, no = pendentes.pop()
+                for nome, filho in no.items():
+                    partes_filho = partes + (nome,)
+                    pastas.append([os.sep.join(partes_filho), self.mtimes.get(partes_filho)])
+                    pendentes.append((partes_filho, filho))
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            json.dump({'raiz': self.raiz, 'mtime_raiz': self.mtimes.get(()), 'pastas': pastas}, saida)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        with open(arquivo, encoding='utf-8') as entrada:
+            dados = json.load(entrada)
+        inventario = cls(dados['raiz'])
+        if dados.get('mtime_raiz') is not None:
+            inventario.mtimes[()] = dados['mtime_raiz']
+        for caminho_relativo, mtime in dados['pastas']:
+            inventario.adicionar_partes(tuple(caminho_relativo.split(os.sep)), mtime)
+        return inventario
+
+
+# Função para listar as subpastas de uma pasta; reaproveita o inventário anterior se o mtime não mudou.
+# Devolve ([(nome, mtime)], reaproveitada).
+def _subpastas(armazenamento, caminho, partes, mtime, anterior):
+    if anterior is not None and mtime is not None and anterior.mtimes.get(partes) == mtime:
+        return [(nome, armazenamento.mtime(os.path.join(caminho, nome))) for nome in anterior.filhos(partes)], True
+    return [(entrada.nome, entrada.mtime) for entrada in armazenamento.listar(caminho) if entrada.e_pasta], False
+
+
+# Função para varrer a raiz uma única vez, nível a nível, com as pastas de cada nível listadas em paralelo
+# (na prática, uma thread por pasta de empresa). Com `anterior`, só as pastas alteradas são listadas.
+def varrer_inventario(armazenamento, raiz, trabalhadores=TRABALHADORES_INVENTARIO, anterior=None):
+    inventario = InventarioPastas(raiz)
+    inventario.listadas = inventario.reaproveitadas = 0
+    if not armazenamento.existe(inventario.raiz):
+        return inventario
+    if anterior is not None and os.path.normcase(anterior.raiz) != os.path.normcase(inventario.raiz):
+        anterior = None
+
+    inicio = time.perf_counter()
+    mtime_raiz = armazenamento.mtime(inventario.raiz)
+    inventario.mtimes[()] = mtime_raiz
+    fronteira = [(inventario.raiz, (), mtime_raiz)]
+    with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+        while fronteira:
+            resultados = executor.map(
+                lambda item: _subpastas(armazenamento, item[0], item[1], item[2], anterior), fronteira
+            )
+            proxima = []
+            for (caminho, partes, _), (subpastas, reaproveitada) in zip(fronteira, resultados):
+                if reaproveitada:
+                    inventario.reaproveitadas += 1
+                else:
+                    inventario.listadas += 1
+                for nome, mtime in subpastas:
+                    partes_filha = partes + (os.path.normcase(nome),)
+                    inventario.adicionar_partes(partes_filha, mtime)
+                    proxima.append((os.path.join(caminho, nome), partes_filha, mtime))
+            fronteira = proxima
+    inventario.segundos = time.perf_counter() - inicio
+    return inventario
+
+
+class ArmazenamentoInventariado(Armazenamento):
+    """
+    Backend que responde ``existe`` pelo inventário em memória e o mantém atualizado.
+
+    Criações e renomeações continuam indo ao backend real; caminhos fora da raiz
+    inventariada são consultados normalmente.
+    """
+
+    def __init__(self, armazenamento, inventario, arquivo=None):
+        self.armazenamento = armazenamento
+        self.inventario = inventario
+        self.arquivo = arquivo
+        self.nome = armazenamento.nome
+        # Contadores compartilhados com o backend real
+        self.operacoes = armazenamento.operacoes
+        self._lock_contagem = armazenamento._lock_contagem
+
+    def existe(self, caminho):
+        contem = self.inventario.contem(caminho)
+        if contem is None:
+            return self.armazenamento.existe(caminho)
+        self._contar('existe_inventario')
+        return contem
+
+    def criar_pasta(self, caminho):
+        if self.inventario.contem(caminho):
+            self._contar('existe_inventario')
+            return False
+        criada = self.armazenamento.criar_pasta(caminho)
+        self.inventario.adicionar(caminho)
+        self._atualizar_mtimes(caminho, os.path.dirname(caminho))
+        return criada
+
+    def renomear(self, origem, destino):
+        self.armazenamento.renomear(origem, destino)
+        self.inventario.mover(origem, destino)
+        self._atualizar_mtimes(os.path.dirname(origem), os.path.dirname(destino))
+
+    # As próprias alterações não devem obrigar a relistar as pastas na próxima execução
+    def _atualizar_mtimes(self, *caminhos):
+        if self.arquivo is None:
+            return
+        for caminho in set(caminhos):
+            if self.inventario.contem(caminho):
+                self.inventario.atualizar_mtime(caminho, self.armazenamento.mtime(caminho))
+
+    # Grava o inventário atualizado para a próxima execução
+    def salvar_inventario(self):
+        if self.arquivo is not None:
+            self.inventario.salvar(self.arquivo)
+
+    def listar(self, caminho):
+        return self.armazenamento.listar(caminho)
+
+    def mtime(self, caminho):
+        return self.armazenamento.mtime(caminho)
+
+    def ler_acl(self, caminho):
+        return self.armazenamento.ler_acl(caminho)
+
+    def gravar_acl(self, caminho, aces, propagar=False):
+        return self.armazenamento.gravar_acl(caminho, aces, propagar)
+
+    def resolvedor_padrao(self):
+        return self.armazenamento.resolvedor_padrao()
+
+
+# Função para inventariar a raiz (atualizando o inventário salvo em `arquivo`, se houver)
+# e devolver o backend que consulta o inventário
+def preparar_inventario(armazenamento, raiz, arquivo=None, trabalhadores=TRABALHADORES_INVENTARIO):
+    anterior = InventarioPastas.carregar(arquivo) if arquivo and os.path.exists(arquivo) else None
+    inventario = varrer_inventario(armazenamento, raiz, trabalhadores, anterior)
+    if arquivo:
+        # Salvo já no início para que os processos do pool possam carregá-lo
+        inventario.salvar(arquivo)
+    print(
+        f"Inventário: {inventario.total} pastas em {raiz} "
+        f"({inventario.listadas} listadas, {inventario.reaproveitadas} inalteradas desde o último inventário)"
+    )
+    return ArmazenamentoInventariado(armazenamento, inventario, arquivo)
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+# Quantidade padrão de threads criando pastas em paralelo
+TRABALHADORES_PASTAS = 8
+
+
+class EstatisticasPastas:
+    """Resultado da materialização: contadores, falhas e vazão."""
+
+    def __init__(self):
+        self.criadas = 0
+        self.existentes = 0
+        self.falhas = []
+        self.segundos = 0.0
+
+    @property
+    def total(self):
+        return self.criadas + self.existentes + len(self.falhas)
+
+    @property
+    def pastas_por_segundo(self):
+        return self.total / self.segundos if self.segundos else 0.0
+
+    # Soma os contadores de outra execução; o tempo fica com quem junta os resultados (tempo de parede)
+    def somar(self, outra):
+        self.criadas += outra.criadas
+        self.existentes += outra.existentes
+        self.falhas.extend(outra.falhas)
+
+    def relatorio(self):
+        return (
+            f"{self.criadas} pastas criadas, {self.existentes} já existiam, "
+            f"{len(self.falhas)} falhas em {self.segundos:.2f}s "
+            f"({self.pastas_por_segundo:.0f} pastas/s)"
+        )
+
+
+# Função para criar uma pasta no backend de armazenamento; devolve (caminho, criada, erro)
+def _criar_pasta(armazenamento, caminho):
+    try:
+        return caminho, armazenamento.criar_pasta(caminho), None
+    except OSError as e:
+        return caminho, False, e
+
+
+# Função para agrupar os caminhos planejados por nível, sem repetições
+def agrupar_por_nivel(planejadas):
+    niveis = {}
+    vistos = set()
+    for caminho, nivel in planejadas:
+        if caminho in vistos:
+            continue
+        vistos.add(caminho)
+        niveis.setdefault(nivel, []).append(caminho)
+    return [niveis[nivel] for nivel in sorted(niveis)]
+
+
+# Função para criar as pastas planejadas, nível a nível, com um pool de threads
+def materializar_pastas(planejadas, armazenamento, trabalhadores=TRABALHADORES_PASTAS, estatisticas=None):
+    """
+    Cria as pastas de ``planejadas`` (pares ``(caminho, nivel)``) em ``armazenamento``.
+
+    Cada nível só começa depois que o anterior terminou, garantindo que os pais
+    existam. Falhas são acumuladas em ``estatisticas.falhas`` sem interromper o lote.
+    """
+    estatisticas = estatisticas if estatisticas is not None else EstatisticasPastas()
+    falhas_anteriores = len(estatisticas.falhas)
+    inicio = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+        for caminhos in agrupar_por_nivel(planejadas):
+            for caminho, criada, erro in executor.map(_criar_pasta, repeat(armazenamento), caminhos):
+                if erro is not None:
+                    estatisticas.falhas.append((caminho, erro))
+                elif criada:
+                    estatisticas.criadas += 1
+                else:
+                    estatisticas.existentes += 1
+
+    estatisticas.segundos += time.perf_counter() - inicio
+    for caminho, erro in estatisticas.falhas[falhas_anteriores:]:
+        print(f"Erro ao criar pasta {caminho}: {erro}")
+    return estatisticas
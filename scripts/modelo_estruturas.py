@@ -0,0 +1,148 @@
+import os
+from collections import namedtuple
+
+from indice_estruturas import ID_PASTA_ANO, ID_PASTA_MES
+
+# Anos gerados para o placeholder 'AutoPastaWebot - ANO'
+ANOS = ['2025']  # Ajuste conforme necessário
+# Meses gerados para o placeholder 'AutoPastaWebot - MÊS'
+MESES = [f'{i:02d}' for i in range(1, 13)]
+
+PLACEHOLDER_ANO = 'AutoPastaWebot - ANO'
+PLACEHOLDER_MES = 'AutoPastaWebot - MÊS'
+
+# Pasta do modelo: caminho relativo à raiz da empresa (já sem placeholders)
+ItemModelo = namedtuple('ItemModelo', ['estrutura_id', 'nomepasta', 'caminho_relativo', 'nivel'])
+
+# Linha gerada para uma empresa, pronta para WeBotPastasEmpresasEstruturas
+LinhaEmpresa = namedtuple('LinhaEmpresa', ['estrutura_id', 'nomepasta', 'caminho_completo', 'nivel'])
+
+
+class ModeloEmpresa:
+    """
+    Subárvore automática (auto='S') de uma raiz de empresa, expandida uma única vez.
+
+    Cada empresa é gerada substituindo apenas o prefixo do caminho.
+    """
+
+    def __init__(self, raiz, antes, depois, itens):
+        self.raiz = raiz
+        self.antes = antes
+        self.depois = depois
+        self.itens = itens
+
+    # Caminho da pasta raiz da empresa
+    def caminho_raiz(self, base_path, empresa_nome):
+        return os.path.join(base_path, *self.antes, empresa_nome, *self.depois)
+
+    # Linhas da empresa (raiz + itens do modelo), na ordem da hierarquia
+    def aplicar(self, base_path, empresa_nome):
+        caminho_raiz = self.caminho_raiz(base_path, empresa_nome)
+        linhas = [LinhaEmpresa(self.raiz.id, empresa_nome, caminho_raiz, 1)]
+        for item in self.itens:
+            linhas.append(LinhaEmpresa(
+                item.estrutura_id,
+                item.nomepasta,
+                os.path.join(caminho_raiz, item.caminho_relativo),
+                item.nivel
+            ))
+        return linhas
+
+
+# Função para expandir os filhos de uma estrutura do modelo
+def _expandir_filhos(indice, estrutura_pai, partes_pai, nivel_atual, anos, itens, visitados, meses=MESES):
+    # Verificar se já visitamos esta estrutura para evitar loops
+    if estrutura_pai.id in visitados:
+        print(f"Loop detectado na estrutura ID {estrutura_pai.id}")
+        return
+    visitados = visitados | {estrutura_pai.id}
+
+    for child_estrutura in indice.filhos_de(estrutura_pai.id):
+        id_pasta_child = child_estrutura.WeBotPastas_pasta_id
+        nome_pasta_child = indice.nome_pasta(id_pasta_child)
+
+        # Garantir que o nome da pasta não seja None antes de continuar
+        if not nome_pasta_child:
+            print(f"Nome da pasta não encontrado para o ID {id_pasta_child}. Pulando esta estrutura.")
+            continue
+
+        # ANO e MÊS nunca são criados com o placeholder, e sim com os valores reais
+        if id_pasta_child == ID_PASTA_ANO:
+            nomes_reais = [nome_pasta_child.replace(PLACEHOLDER_ANO, ano) for ano in anos]
+        elif id_pasta_child == ID_PASTA_MES:
+            nomes_reais = [nome_pasta_child.replace(PLACEHOLDER_MES, mes) for mes in meses]
+        else:
+            nomes_reais = [nome_pasta_child]
+
+        nivel_novo = nivel_atual + 1
+        for nome_real in nomes_reais:
+            partes = partes_pai + (nome_real,)
+            itens.append(ItemModelo(child_estrutura.id, nome_pasta_child, os.path.join(*partes), nivel_novo))
+            _expandir_filhos(indice, child_estrutura, partes, nivel_novo, anos, itens, visitados, meses)
+
+
+# Função para compilar o modelo de cada raiz de empresa
+def compilar_modelos(indice, anos=None):
+    anos = ANOS if anos is None else anos
+    modelos = []
+    for raiz in indice.raizes_empresa():
+        antes, depois = indice.divisao_empresa(raiz.id)
+        itens = []
+        _expandir_filhos(indice, raiz, (), 1, anos, itens, frozenset())
+        modelos.append(ModeloEmpresa(raiz, antes, depois, itens))
+    return modelos
+
+
+# Função para interpretar um intervalo de períodos 'AAAA-MM..AAAA-MM' (ou um único 'AAAA-MM').
+# Devolve {ano: [meses]} em ordem, ex.: {'2026': ['01', ..., '12']}
+def interpretar_periodos(texto):
+    inicio, separador, fim = texto.partition('..')
+    try:
+        ano_inicio, mes_inicio = (int(parte) for parte in inicio.strip().split('-'))
+        ano_fim, mes_fim = (int(parte) for parte in (fim if separador else inicio).strip().split('-'))
+    except ValueError:
+        raise ValueError(f"Período inválido: {texto!r} (use AAAA-MM..AAAA-MM)")
+    if not (1 <= mes_inicio <= 12 and 1 <= mes_fim <= 12) or (ano_inicio, mes_inicio) > (ano_fim, mes_fim):
+        raise ValueError(f"Período inválido: {texto!r} (use AAAA-MM..AAAA-MM)")
+
+    periodos = {}
+    ano, mes = ano_inicio, mes_inicio
+    while (ano, mes) <= (ano_fim, mes_fim):
+        periodos.setdefault(f'{ano:04d}', []).append(f'{mes:02d}')
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return periodos
+
+
+# Função para expandir a subárvore de uma estrutura (ela própria e os descendentes), com caminhos
+# e níveis relativos à pasta pai; ANO e MÊS são expandidos com os valores reais
+def expandir_subarvore(indice, estrutura, anos=None, meses=MESES):
+    anos = ANOS if anos is None else anos
+    nome_pasta = indice.nome_pasta(estrutura.WeBotPastas_pasta_id)
+    if not nome_pasta:
+        return []
+
+    if estrutura.WeBotPastas_pasta_id == ID_PASTA_ANO:
+        nomes_reais = [nome_pasta.replace(PLACEHOLDER_ANO, ano) for ano in anos]
+    elif estrutura.WeBotPastas_pasta_id == ID_PASTA_MES:
+        nomes_reais = [nome_pasta.replace(PLACEHOLDER_MES, mes) for mes in meses]
+    else:
+        nomes_reais = [nome_pasta]
+
+    itens = []
+    for nome_real in nomes_reais:
+        itens.append(ItemModelo(estrutura.id, nome_pasta, nome_real, 1))
+        _expandir_filhos(indice, estrutura, (nome_real,), 1, anos, itens, frozenset(), meses)
+    return itens
+
+
+# Função para expandir a subárvore de cada estrutura ANO automática só com os períodos informados.
+# Devolve {id da estrutura pai do ANO: [ItemModelo]}, com caminhos e níveis relativos à pasta pai.
+def expandir_periodos(indice, periodos):
+    subarvores = {}
+    for estrutura in indice.estruturas.values():
+        if estrutura.auto != 'S' or estrutura.WeBotPastas_pasta_id != ID_PASTA_ANO:
+            continue
+        itens = subarvores.setdefault(estrutura.pai_id, [])
+        for ano, meses in periodos.items():
+            itens.extend(expandir_subarvore(indice, estrutura, [ano], meses))
+    return subarvores
@@ -0,0 +1,80 @@
+class PlanoHeranca:
+    """
+    Indica, por estrutura, se a pasta precisa de ACL explícita ou se pode herdar do pai.
+
+    A permissão efetiva de uma estrutura automática é a do pai com as regras do nó
+    aplicadas por cima (mesma semântica de ``calcular_dacl``); estruturas manuais
+    partem do zero. Só os nós de fronteira — raízes, passagens entre estruturas
+    manuais e automáticas (geradas por scripts diferentes) ou nós cuja permissão
+    efetiva difere da do pai — recebem gravação; os demais contam com OI|CI do ancestral.
+    """
+
+    def __init__(self, efetivas, fronteiras):
+        self.efetivas = efetivas
+        self.fronteiras = fronteiras
+        self.gravacoes = 0
+        self.evitadas = 0
+
+    def precisa_gravar(self, estrutura_id):
+        # Estruturas fora do índice são tratadas como fronteira (comportamento antigo)
+        return estrutura_id not in self.efetivas or estrutura_id in self.fronteiras
+
+    # Contabiliza a decisão para uma pasta e devolve se a ACL deve ser gravada
+    def decidir(self, estrutura_id):
+        if self.precisa_gravar(estrutura_id):
+            self.gravacoes += 1
+            return True
+        self.evitadas += 1
+        return False
+
+    def relatorio(self):
+        total = self.gravacoes + self.evitadas
+        return (
+            f"{self.gravacoes} de {total} pastas com ACL explícita, "
+            f"{self.evitadas} gravações evitadas por herança ({len(self.fronteiras)} estruturas de fronteira)"
+        )
+
+
+# Função para aplicar as regras de um nó sobre a permissão efetiva do pai
+def _aplicar_regras(efetiva_pai, regras):
+    efetiva = dict(efetiva_pai)
+    for nome_grupo, mascara in regras:
+        efetiva[nome_grupo] = mascara
+    return efetiva
+
+
+# Função para percorrer a árvore de WeBotPastasEstruturas e marcar os nós de fronteira
+def planejar_heranca(indice, plano):
+    efetivas = {}
+    fronteiras = set()
+
+    # Percorre a partir das raízes (pai ausente do índice) para que o pai seja calculado antes
+    pendentes = [
+        estrutura for estrutura in indice.estruturas.values()
+        if estrutura.pai_id is None or estrutura.pai_id not in indice.estruturas
+    ]
+    for raiz in pendentes:
+        fronteiras.add(raiz.id)
+    visitados = set()
+    while pendentes:
+        estrutura = pendentes.pop()
+        if estrutura.id in visitados:
+            print(f"Loop detectado na estrutura ID {estrutura.id}")
+            continue
+        visitados.add(estrutura.id)
+
+        regras = plano.get(estrutura.id, ())
+        efetiva_pai = efetivas.get(estrutura.pai_id, {})
+        if estrutura.auto == 'S':
+            efetiva = _aplicar_regras(efetiva_pai, regras)
+        else:
+            # Pastas manuais têm as permissões padrão descartadas
+            efetiva = _aplicar_regras({}, regras)
+        efetivas[estrutura.id] = efetiva
+
+        pai = indice.estruturas.get(estrutura.pai_id)
+        if pai is not None and (pai.auto != estrutura.auto or efetiva != efetiva_pai):
+            fronteiras.add(estrutura.id)
+        pendentes.extend(indice.filhos_de(estrutura.id))
+
+    return PlanoHeranca(efetivas, fronteiras)
@@ -0,0 +1,117 @@
+import json
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import groupby
+from types import MappingProxyType
+
+from gravacao_lote import em_blocos
+
+VERSAO_PLANO = 2
+
+# Custo estimado por operação (segundos) no servidor de arquivos / MySQL de produção
+CUSTOS_ESTIMADOS = MappingProxyType({
+    'linha': 0.0005,     # linha inserida em WeBotPastasEmpresasEstruturas (insert em lote)
+    'empresa': 0.001,    # empresa marcada como gerada
+    'pasta': 0.005,      # mkdir no compartilhamento
+    'acl': 0.02,         # leitura + gravação de DACL
+    'gerado': 0.001,     # UPDATE gerado = 'S'
+    'renomear': 0.05,    # rename de uma subárvore no compartilhamento + UPDATEs por prefixo
+    'marcar': 0.002,     # destino já existia: só os UPDATEs
+})
+
+# Tamanho máximo de cada sequência de entradas aplicada de uma vez
+TAMANHO_SEQUENCIA = 1000
+
+
+class EscritorPlano:
+    """
+    Grava o plano de uma execução em JSONL, uma alteração por linha.
+
+    A primeira linha é o cabeçalho (script, parâmetros) e a última o resumo com as
+    contagens e o custo estimado; um plano sem resumo está incompleto e não é aplicado.
+    """
+
+    def __init__(self, caminho, script, **parametros):
+        self.caminho = caminho
+        self.script = script
+        self.contagens = Counter()
+        self._arquivo = open(caminho, 'w', encoding='utf-8')
+        self._gravar({
+            'tipo': 'cabecalho', 'versao': VERSAO_PLANO, 'script': script,
+            'criado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'parametros': parametros,
+        })
+
+    def _gravar(self, entrada):
+        self._arquivo.write(json.dumps(entrada, ensure_ascii=False))
+        self._arquivo.write('\n')
+
+    def registrar(self, tipo, **dados):
+        self.contagens[tipo] += 1
+        self._gravar(dict(tipo=tipo, **dados))
+
+    @property
+    def custo_estimado(self):
+        return sum(CUSTOS_ESTIMADOS.get(tipo, 0.0) * quantidade for tipo, quantidade in self.contagens.items())
+
+    def fechar(self):
+        self._gravar({
+            'tipo': 'resumo', 'contagens': dict(self.contagens),
+            'custo_estimado_segundos': round(self.custo_estimado, 1),
+        })
+        self._arquivo.close()
+
+    def descartar(self):
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        if tipo_excecao is None:
+            self.fechar()
+        else:
+            self.descartar()
+        return False
+
+    def relatorio(self):
+        detalhes = ', '.join(f"{quantidade} {tipo}" for tipo, quantidade in sorted(self.contagens.items()))
+        return f"{detalhes or 'nenhuma alteração'}; custo estimado {self.custo_estimado:.0f}s ({self.caminho})"
+
+
+# Função para validar um plano antes de aplicá-lo; devolve (cabecalho, resumo).
+# `atuais` são os parâmetros da execução que vai aplicar o plano (ex.: base_path, backend): um plano
+# gerado com outros valores (ou sem registrá-los) aponta para outra árvore e não é aplicado.
+def validar_plano(caminho, script, **atuais):
+    cabecalho = resumo = None
+    with open(caminho, encoding='utf-8') as arquivo:
+        for numero, linha in enumerate(arquivo, start=1):
+            entrada = json.loads(linha)
+            if numero == 1:
+                cabecalho = entrada
+            resumo = entrada
+
+    if cabecalho is None or cabecalho.get('tipo') != 'cabecalho' or cabecalho.get('versao') != VERSAO_PLANO:
+        raise ValueError(f"{caminho} não é um plano válido (versão {VERSAO_PLANO})")
+    if cabecalho['script'] != script:
+        raise ValueError(f"{caminho} foi gerado por {cabecalho['script']}, não por {script}")
+    if resumo.get('tipo') != 'resumo':
+        raise ValueError(f"{caminho} está incompleto (sem resumo); gere o plano novamente")
+    parametros = cabecalho.get('parametros', {})
+    for nome, valor in atuais.items():
+        if parametros.get(nome) != valor:
+            raise ValueError(
+                f"{caminho} foi gerado com {nome}={parametros.get(nome)!r}, mas a execução atual usa {valor!r}; "
+                f"gere o plano novamente"
+            )
+    return cabecalho, resumo
+
+
+# Função para ler as alterações do plano em sequências do mesmo tipo, na ordem gravada
+def sequencias_plano(caminho, tamanho=TAMANHO_SEQUENCIA):
+    with open(caminho, encoding='utf-8') as arquivo:
+        entradas = (json.loads(linha) for linha in arquivo)
+        alteracoes = (entrada for entrada in entradas if entrada['tipo'] not in ('cabecalho', 'resumo'))
+        for tipo, grupo in groupby(alteracoes, key=lambda entrada: entrada['tipo']):
+            for bloco in em_blocos(grupo, tamanho):
+                yield tipo, bloco
@@ -0,0 +1,52 @@
+from types import MappingProxyType
+
+from sqlalchemy import select
+
+# Máscaras NT (mesmos valores de ntsecuritycon), sem depender do pywin32
+FILE_GENERIC_READ = 0x120089
+FILE_GENERIC_WRITE = 0x120116
+FILE_GENERIC_EXECUTE = 0x1200A0
+DELETE = 0x10000
+FILE_ALL_ACCESS = 0x1F01FF
+
+# Mapear as permissões de texto para os valores apropriados de NT
+MASCARAS_PERMISSAO = MappingProxyType({
+    "ReadAndExecute": FILE_GENERIC_READ | FILE_GENERIC_EXECUTE,
+    "Modify": FILE_GENERIC_WRITE | FILE_GENERIC_READ | FILE_GENERIC_EXECUTE | DELETE,
+    "FullControl": FILE_ALL_ACCESS
+})
+
+
+# Função para converter o nome do tipo de permissão na máscara NT (0 se desconhecido)
+def mascara_permissao(nome_permissao):
+    return MASCARAS_PERMISSAO.get(nome_permissao, 0)
+
+
+# Função para carregar o plano de permissões: estrutura_id -> ((nome_grupo, mascara), ...)
+def carregar_plano_permissoes(conn, esquema):
+    """
+    Lê WeBotPastasPermissoes com grupos e tipos em uma única consulta.
+
+    O plano é imutável e compartilhado por todas as pastas geradas a partir da
+    mesma estrutura; a ordem das linhas de permissão é preservada.
+    """
+    permissoes = esquema.permissoes
+    grupos = esquema.grupos
+    tipos_permissao = esquema.tipos_permissao
+
+    consulta = (
+        select(permissoes.c.estrutura_id, grupos.c.nome.label('grupo'), tipos_permissao.c.nome.label('tipo'))
+        .select_from(
+            permissoes
+            .join(grupos, grupos.c.id == permissoes.c.grupo_id)
+            .join(tipos_permissao, tipos_permissao.c.id == permissoes.c.permissao_id)
+        )
+        .order_by(permissoes.c.estrutura_id, permissoes.c.id)
+    )
+
+    plano = {}
+    for linha in conn.execute(consulta):
+        if linha.grupo is None:
+            continue
+        plano.setdefault(linha.estrutura_id, []).append((linha.grupo.strip(), mascara_permissao(linha.tipo)))
+    return MappingProxyType({estrutura_id: tuple(regras) for estrutura_id, regras in plano.items()})
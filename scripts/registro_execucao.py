@@ -0,0 +1,208 @@
+import json
+import os
+import socket
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, and_, insert, inspect, select, text, update
+
+from fila_trabalho import DURACAO_RESERVA, identificar_trabalhador
+
+# Tempo sem atualização após o qual uma execução em andamento em outra máquina é considerada
+# abandonada (na mesma máquina, vale o processo dono estar vivo ou não)
+TEMPO_ABANDONO = DURACAO_RESERVA
+
+metadata_execucoes = MetaData()
+
+# Execuções longas dos scripts de geração, com a fase em andamento e o seu ponto de retomada.
+# estado: 'A' (em andamento), 'F' (falhou), 'C' (concluída)
+# parametros: modo e opções da execução (JSON); só uma execução com os mesmos parâmetros é retomada
+execucoes = Table(
+    'WeBotPastasExecucoes', metadata_execucoes,
+    Column('id', Integer, primary_key=True),
+    Column('script', String(60), nullable=False, index=True),
+    Column('estado', String(1), nullable=False, server_default='A'),
+    Column('dono', String(100)),
+    Column('fase', String(60)),
+    Column('ultima_chave', String(100)),
+    Column('processados', Integer, nullable=False, server_default='0'),
+    Column('iniciado_em', DateTime),
+    Column('atualizado_em', DateTime),
+    Column('erro', Text),
+    Column('parametros', Text),
+)
+
+# Ponto de retomada de cada fase de uma execução: o checkpoint de uma fase não é sobrescrito
+# quando outra fase avança (ex.: a reconciliação continua de onde parou depois do preenchimento)
+execucoes_fases = Table(
+    'WeBotPastasExecucoesFases', metadata_execucoes,
+    Column('execucao_id', Integer, primary_key=True),
+    Column('fase', String(60), primary_key=True),
+    Column('ultima_chave', String(100)),
+    Column('processados', Integer, nullable=False, server_default='0'),
+    Column('atualizado_em', DateTime),
+)
+
+
+# Função para criar as tabelas de execuções, se ainda não existirem (e a coluna parametros,
+# ausente nas tabelas criadas antes dela)
+def criar_tabela_execucoes(engine):
+    metadata_execucoes.create_all(engine, tables=[execucoes, execucoes_fases], checkfirst=True)
+    if 'parametros' not in {coluna['name'] for coluna in inspect(engine).get_columns(execucoes.name)}:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {execucoes.name} ADD COLUMN parametros TEXT"))
+
+
+def _agora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Verifica se um processo desta máquina ainda está rodando
+def _processo_vivo(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) encerraria o processo no Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        processo = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not processo:
+            return False
+        codigo = ctypes.c_ulong()
+        try:
+            kernel32.GetExitCodeProcess(processo, ctypes.byref(codigo))
+        finally:
+            kernel32.CloseHandle(processo)
+        return codigo.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Verifica se uma execução em andamento ainda tem dono: na mesma máquina, o processo dono
+# continua vivo; em outra máquina, a execução foi atualizada há menos de TEMPO_ABANDONO
+def execucao_ativa(linha, agora=None):
+    if linha.estado != 'A':
+        return False
+    maquina, _, pid = (linha.dono or '').rpartition(':')
+    if maquina == socket.gethostname() and pid.isdigit():
+        return _processo_vivo(int(pid))
+    agora = agora or _agora()
+    return linha.atualizado_em is not None and agora - linha.atualizado_em < TEMPO_ABANDONO
+
+
+class RegistroExecucao:
+    """
+    Checkpoint de uma execução em WeBotPastasExecucoes.
+
+    Cada bloco confirmado grava, na mesma transação, a última chave processada
+    da sua fase; uma execução interrompida ou com falha retoma cada fase do seu ponto.
+    """
+
+    def __init__(self, engine, linha, fases, retomada):
+        self.engine = engine
+        self.id = linha.id
+        self.fase = linha.fase
+        self.chaves = {fase: chave for fase, (chave, _) in fases.items()}
+        self.processados_fases = {fase: processados for fase, (_, processados) in fases.items()}
+        self.processados = self.processados_fases.get(self.fase, 0)
+        self.retomada = retomada
+        self.blocos = 0
+
+    # Chave a partir da qual a fase deve continuar (None se a fase começa do início)
+    def chave_retomada(self, fase):
+        return self.chaves.get(fase)
+
+    # Registra um bloco confirmado; deve ser chamado na transação que grava o bloco
+    def avancar(self, conn, fase, chave, quantidade):
+        self.fase = fase
+        self.chaves[fase] = chave
+        self.processados = self.processados_fases.get(fase, 0) + quantidade
+        self.processados_fases[fase] = self.processados
+        self.blocos += 1
+        agora = _agora()
+        valores = {'ultima_chave': json.dumps(chave), 'processados': self.processados, 'atualizado_em': agora}
+        conn.execute(update(execucoes).where(execucoes.c.id == self.id).values(fase=fase, **valores))
+        if not conn.execute(
+            update(execucoes_fases)
+            .where(and_(execucoes_fases.c.execucao_id == self.id, execucoes_fases.c.fase == fase))
+            .values(**valores)
+        ).rowcount:
+            conn.execute(insert(execucoes_fases).values(execucao_id=self.id, fase=fase, **valores))
+
+    def _encerrar(self, estado, erro=None):
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(execucoes).where(execucoes.c.id == self.id)
+                .values(estado=estado, erro=erro, atualizado_em=_agora())
+            )
+
+    def concluir(self):
+        self._encerrar('C')
+
+    def falhar(self, erro):
+        self._encerrar('F', str(erro))
+
+    def relatorio(self):
+        origem = "retomada" if self.retomada else "nova"
+        return (
+            f"execução {self.id} ({origem}), {self.blocos} blocos confirmados, "
+            f"{self.processados} itens na fase {self.fase or '-'}"
+        )
+
+
+# Pontos de retomada de uma execução: {fase: (chave, processados)}
+def _fases_execucao(conn, linha):
+    return {
+        fase.fase: (json.loads(fase.ultima_chave) if fase.ultima_chave else None, fase.processados)
+        for fase in conn.execute(select(execucoes_fases).where(execucoes_fases.c.execucao_id == linha.id))
+    }
+
+
+# Função para iniciar a execução de um script, retomando a última que não foi concluída com os mesmos
+# `parametros` (modo e opções, ex.: reconciliar, virada, base_path): o checkpoint de uma execução normal
+# não serve para uma reconciliação, e vice-versa. Execuções gravadas sem parâmetros não são retomadas.
+# Uma execução em andamento com dono ativo não é retomada (seria processada duas vezes);
+# a reserva da execução retomada é condicional, então duas execuções não assumem a mesma.
+def iniciar_execucao(engine, script, parametros=None):
+    criar_tabela_execucoes(engine)
+    agora = _agora()
+    dono = identificar_trabalhador()
+    texto_parametros = json.dumps(parametros or {}, sort_keys=True, ensure_ascii=False)
+    with engine.begin() as conn:
+        anterior = conn.execute(
+            select(execucoes)
+            .where(and_(
+                execucoes.c.script == script,
+                execucoes.c.estado.in_(('A', 'F')),
+                execucoes.c.parametros == texto_parametros,
+            ))
+            .order_by(execucoes.c.id.desc())
+            .limit(1)
+        ).first()
+        if anterior is not None and execucao_ativa(anterior, agora):
+            print(f"Execução {anterior.id} em andamento ({anterior.dono}); iniciando uma nova execução.")
+        elif anterior is not None and conn.execute(
+            update(execucoes)
+            .where(and_(
+                execucoes.c.id == anterior.id,
+                execucoes.c.estado == anterior.estado,
+                execucoes.c.atualizado_em == anterior.atualizado_em,
+            ))
+            .values(estado='A', dono=dono, erro=None, atualizado_em=agora)
+        ).rowcount:
+            print(
+                f"Retomando a execução {anterior.id} ({anterior.dono}, iniciada em {anterior.iniciado_em:%Y-%m-%d %H:%M}): "
+                f"fase {anterior.fase or '-'}, {anterior.processados} itens já confirmados"
+            )
+            return RegistroExecucao(engine, anterior, _fases_execucao(conn, anterior), retomada=True)
+
+        id_execucao = conn.execute(
+            insert(execucoes).values(
+                script=script, estado='A', dono=dono, processados=0,
+                iniciado_em=agora, atualizado_em=agora, parametros=texto_parametros
+            )
+        ).inserted_primary_key[0]
+        linha = conn.execute(select(execucoes).where(execucoes.c.id == id_execucao)).one()
+    return RegistroExecucao(engine, linha, {}, retomada=False)
@@ -1,9 +1,39 @@
 import os
 import logging
-from sqlalchemy import create_engine, text
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain, groupby
+from sqlalchemy import String, create_engine, func, literal, or_, select, text, update
+from sqlalchemy.sql import column, table
 from dotenv import load_dotenv
 from pathlib import Path
 
+from armazenamento import BACKENDS, criar_armazenamento
+from inventario_pastas import preparar_inventario
+from plano_execucao import EscritorPlano, sequencias_plano, validar_plano
+from gravacao_lote import TAMANHO_LOTE_IN, em_blocos, ler_por_chave
+from diario_renomeacoes import RESULTADOS_CONFIRMAVEIS, DiarioRenomeacoes, pendencias_diario
+
+# Nome do script gravado no cabeçalho dos planos (--plan)
+SCRIPT_PLANO = 'renomear_pastas'
+
+# Diário das renomeações (--diario), usado para retomar ou desfazer uma execução interrompida
+DIARIO_PADRAO = str(Path(__file__).parent.parent / 'renomear_pastas.diario.jsonl')
+# Threads renomeando empresas em paralelo e empresas confirmadas por transação
+TRABALHADORES_RENOMEACAO = 8
+EMPRESAS_POR_COMMIT = 200
+
+# Colunas de WeBotPastasEmpresasEstruturas usadas nos UPDATEs por prefixo
+tabela_empresas_estruturas = table(
+    'WeBotPastasEmpresasEstruturas',
+    column('id'),
+    column('empresa_id'),
+    column('caminho_completo', String),
+    column('old_path', String),
+    column('razao_social_atualizar', String),
+)
+
 
 # Conexão com banco de execuções
 def conectar_banco_execucoes():
@@ -16,83 +46,370 @@ def conectar_banco_execucoes():
         raise ValueError("DATABASE_URI não definida nas variáveis de ambiente.")
     return create_engine(DATABASE_URI)
 
-def renomear_pastas():
-    engine = conectar_banco_execucoes()
-    with engine.begin() as conn:
-        registros = conn.execute(text("""
-            SELECT id,
-                   empresa_id,
-                   old_path,
-                   caminho_completo
-              FROM WeBotPastasEmpresasEstruturas
-             WHERE razao_social_atualizar = 'S'
-        """))
-        for r in registros:
-            struct_id    = r.id
-            empresa_id   = r.empresa_id
-            old_path     = r.old_path
-            new_path     = r.caminho_completo
-
-            if not old_path:
-                logging.warning(f"[Estrutura {struct_id}] old_path vazio; pulando.")
-                continue
+# Pasta raiz da árvore, registrada nos planos (depois de carregado o .env)
+def _base_path(base_path=None):
+    return base_path or os.getenv("ARQUIVOS_BASE_PATH", r'D:\Arquivos')
 
-            if not os.path.exists(old_path):
-                logging.warning(f"[Estrutura {struct_id}] pasta não encontrada: {old_path}")
-                continue
+# Verifica se o caminho é o próprio prefixo ou está dentro dele
+def _sob(caminho, prefixo):
+    return caminho == prefixo or caminho.startswith(prefixo.rstrip(os.sep) + os.sep)
 
-            parent_dir = os.path.dirname(new_path)
-            if not os.path.exists(parent_dir):
-                try:
-                    os.makedirs(parent_dir, exist_ok=True)
-                    logging.info(f"[Estrutura {struct_id}] criado diretório pai: {parent_dir}")
-                except Exception as e:
-                    logging.error(f"[Estrutura {struct_id}] falha ao criar {parent_dir}: {e}")
-                    continue
-
-            if os.path.exists(new_path):
-                logging.info(f"[Estrutura {struct_id}] destino já existe: {new_path}")
-                _marcar_como_atualizado(conn, struct_id, empresa_id)
-                continue
+# Condição SQL equivalente a _sob para uma coluna de caminho
+def _coluna_sob(coluna, prefixo):
+    return or_(coluna == prefixo, coluna.startswith(prefixo.rstrip(os.sep) + os.sep, autoescape=True))
+
+# Desfaz, em ordem inversa, as renomeações já planejadas: devolve onde o caminho está hoje no disco
+# (None se ele foi movido por uma delas). Sem renomeações planejadas, devolve o próprio caminho.
+def _caminho_atual(caminho, renomeacoes):
+    for origem, destino in reversed(renomeacoes):
+        if _sob(caminho, destino):
+            caminho = origem + caminho[len(destino):]
+        elif _sob(caminho, origem):
+            return None
+    return caminho
+
+def _existe(armazenamento, caminho, renomeacoes):
+    atual = _caminho_atual(caminho, renomeacoes)
+    return atual is not None and armazenamento.existe(atual)
 
-            # renomeia de verdade
-            try:
-                os.rename(old_path, new_path)
-                logging.info(f"[Estrutura {struct_id}] renomeado: '{old_path}' → '{new_path}'")
-            except Exception as e:
-                logging.error(f"[Estrutura {struct_id}] erro ao renomear: {e}")
+# Reduz as linhas marcadas de uma empresa às renomeações de topo. Uma linha cujo caminho novo já
+# decorre da renomeação de um ancestral (mesmo prefixo trocado) vai junto com ele; as demais viram
+# renomeações próprias, com a origem no lugar onde a pasta estará depois das anteriores.
+# Devolve [(linha, old_path, origem, destino)] em ordem de profundidade.
+def _renomeacoes_de_topo(linhas):
+    renomeacoes = []
+    for r in sorted(linhas, key=lambda linha: (linha.old_path.count(os.sep), linha.old_path)):
+        origem = r.old_path
+        sob_ancestral = False
+        for _, old_path, _, destino in reversed(renomeacoes):
+            if _sob(r.old_path, old_path):
+                origem = destino + r.old_path[len(old_path):]
+                sob_ancestral = True
+                break
+        if sob_ancestral and origem == r.caminho_completo:
+            continue
+        renomeacoes.append((r, r.old_path, origem, r.caminho_completo))
+    return renomeacoes
+
+# Lê as linhas marcadas (em páginas curtas por (empresa_id, id)) e devolve, por empresa, as renomeações
+# de topo como itens {id, empresa_id, old_path, origem, destino, tipo, criar_pai}; tipo None = decidido
+# na execução. Uma empresa dividida entre duas páginas só é devolvida depois de lida por inteiro.
+def _empresas_marcadas(engine, contagem):
+    t = tabela_empresas_estruturas
+    registros = ler_por_chave(
+        engine,
+        select(t.c.id, t.c.empresa_id, t.c.old_path, t.c.caminho_completo).where(t.c.razao_social_atualizar == 'S'),
+        [t.c.empresa_id, t.c.id]
+    )
+    for empresa_id, grupo in groupby(chain.from_iterable(registros), key=lambda r: r.empresa_id):
+        linhas = []
+        for r in grupo:
+            contagem['linhas'] += 1
+            if not r.old_path:
+                logging.warning(f"[Estrutura {r.id}] old_path vazio; pulando.")
                 continue
+            linhas.append(r)
+        itens = [
+            {'id': r.id, 'empresa_id': empresa_id, 'old_path': old_path, 'origem': origem,
+             'destino': destino, 'tipo': None, 'criar_pai': None}
+            for r, old_path, origem, destino in _renomeacoes_de_topo(linhas)
+        ]
+        contagem['renomeacoes'] += len(itens)
+        if itens:
+            yield empresa_id, itens
+
+# Decide o que fazer com uma renomeação olhando o disco (considerando as já planejadas):
+# 'renomear', 'marcar' (nome inalterado ou destino já existe) ou None (origem não encontrada)
+def _decidir(armazenamento, item, planejadas=()):
+    if item['origem'] == item['destino']:
+        return 'marcar'
+    if not _existe(armazenamento, item['origem'], planejadas):
+        logging.warning(f"[Estrutura {item['id']}] pasta não encontrada: {item['origem']}")
+        return None
+    if _existe(armazenamento, item['destino'], planejadas):
+        logging.info(f"[Estrutura {item['id']}] destino já existe: {item['destino']}")
+        return 'marcar'
+    return 'renomear'
+
+# Com caminho_plano, nada é renomeado nem gravado: as renomeações que seriam feitas
+# (considerando as já planejadas, como pastas movidas junto com o pai) vão para o plano JSONL.
+# As linhas marcadas são reduzidas, por empresa, às renomeações de topo: um rename no disco move a
+# subárvore inteira e o banco é atualizado com um UPDATE por prefixo, não por pasta.
+def renomear_pastas(armazenamento=None, caminho_plano=None, caminho_diario=None,
+                    trabalhadores=TRABALHADORES_RENOMEACAO, empresas_por_commit=EMPRESAS_POR_COMMIT, base_path=None):
+    engine = conectar_banco_execucoes()
+    # Backend de armazenamento (ntfs, posix ou memoria), configurável por ARQUIVOS_BACKEND
+    if armazenamento is None:
+        armazenamento = criar_armazenamento(os.getenv("ARQUIVOS_BACKEND"))
+    caminho_diario = caminho_diario or DIARIO_PADRAO
+    contagem = Counter()
 
-            # atualiza banco nas duas tabelas
-            _marcar_como_atualizado(conn, struct_id, empresa_id)
+    if caminho_plano is None:
+        recuperar_diario(engine, armazenamento, caminho_diario)
+        estatisticas = executar_renomeacoes(
+            engine, armazenamento, _empresas_marcadas(engine, contagem),
+            caminho_diario, trabalhadores, empresas_por_commit
+        )
+        logging.info(f"{contagem['linhas']} linhas marcadas reduzidas a {contagem['renomeacoes']} renomeações de topo.")
+        print(f"Renomeações: {_relatorio(estatisticas)}")
+        return estatisticas
 
-def _marcar_como_atualizado(conn, struct_id, empresa_id):
-    # atualiza tabela de estruturas
+    if pendencias_diario(caminho_diario):
+        logging.warning(f"Há renomeações não confirmadas no diário {caminho_diario}; o plano não as considera.")
+    with EscritorPlano(caminho_plano, SCRIPT_PLANO, base_path=_base_path(base_path), backend=armazenamento.nome) as escritor:
+        for empresa_id, itens in _empresas_marcadas(engine, contagem):
+            # No plano, as renomeações da empresa ainda não aconteceram no disco
+            planejadas = []
+            for item in itens:
+                tipo = _decidir(armazenamento, item, planejadas)
+                if tipo == 'renomear':
+                    criar_pai = not _existe(armazenamento, os.path.dirname(item['destino']), planejadas)
+                    escritor.registrar('renomear', **_dados_plano(item), criar_pai=criar_pai)
+                    planejadas.append((item['origem'], item['destino']))
+                elif tipo == 'marcar':
+                    escritor.registrar('marcar', **_dados_plano(item))
+    logging.info(f"{contagem['linhas']} linhas marcadas reduzidas a {contagem['renomeacoes']} renomeações de topo.")
+    print(f"Plano: {escritor.relatorio()}")
+
+def _dados_plano(item):
+    return {chave: item[chave] for chave in ('id', 'empresa_id', 'old_path', 'origem', 'destino')}
+
+def _relatorio(estatisticas):
+    detalhes = ', '.join(f"{quantidade} {resultado}" for resultado, quantidade in sorted(estatisticas.items()))
+    return detalhes or 'nenhuma alteração'
+
+# Renomeia uma pasta (criando o pai, se preciso); devolve False em caso de erro
+def _renomear(armazenamento, struct_id, origem, destino, criar_pai=None):
+    parent_dir = os.path.dirname(destino)
+    if criar_pai is None:
+        criar_pai = not armazenamento.existe(parent_dir)
+    if criar_pai:
+        try:
+            armazenamento.criar_pasta(parent_dir)
+            logging.info(f"[Estrutura {struct_id}] criado diretório pai: {parent_dir}")
+        except Exception as e:
+            logging.error(f"[Estrutura {struct_id}] falha ao criar {parent_dir}: {e}")
+            return False
     try:
-        conn.execute(text("""
-            UPDATE WeBotPastasEmpresasEstruturas
-               SET old_path = NULL,
-                   razao_social_atualizar = 'N'
-             WHERE id = :struct_id
-        """), {"struct_id": struct_id})
-        logging.info(f"[Estrutura {struct_id}] marcado como atualizado em Estruturas.")
+        armazenamento.renomear(origem, destino)
+        logging.info(f"[Estrutura {struct_id}] renomeado: '{origem}' → '{destino}'")
     except Exception as e:
-        logging.error(f"[Estrutura {struct_id}] falha ao atualizar Estruturas: {e}")
+        logging.error(f"[Estrutura {struct_id}] erro ao renomear: {e}")
+        return False
+    return True
+
+# Executa, em uma thread do pool, as renomeações de uma empresa na ordem (pai antes das aninhadas).
+# Devolve um resultado por item: 'renomeada', 'marcada', 'ausente' ou 'erro'.
+def _executar_empresa(armazenamento, itens):
+    resultados = []
+    for item in itens:
+        try:
+            tipo = item['tipo'] or _decidir(armazenamento, item)
+        except Exception as e:
+            logging.error(f"[Estrutura {item['id']}] erro ao verificar {item['origem']}: {e}")
+            tipo = 'erro'
+        if tipo == 'renomear':
+            ok = _renomear(armazenamento, item['id'], item['origem'], item['destino'], item['criar_pai'])
+            resultados.append('renomeada' if ok else 'erro')
+        elif tipo == 'marcar':
+            resultados.append('marcada')
+        else:
+            resultados.append(tipo or 'ausente')
+    return resultados
 
+# Grava no banco as renomeações concluídas (na ordem em que foram feitas) e marca as empresas
+def _confirmar_no_banco(conn, itens):
+    empresas = set()
+    for item in itens:
+        _atualizar_subarvore(conn, item['empresa_id'], item['old_path'], item['origem'], item['destino'])
+        empresas.add(item['empresa_id'])
+    for empresa_id in sorted(empresas):
+        _marcar_empresa(conn, empresa_id)
+
+# Executa as renomeações em blocos de empresas. Cada bloco é gravado no diário antes de ir ao disco,
+# as empresas do bloco são renomeadas em paralelo (não compartilham pastas) e o bloco é confirmado
+# no banco em uma transação própria, seguida de 'confirmado' no diário.
+def executar_renomeacoes(engine, armazenamento, empresas, caminho_diario,
+                         trabalhadores=TRABALHADORES_RENOMEACAO, empresas_por_commit=EMPRESAS_POR_COMMIT):
+    estatisticas = Counter()
+    diario = DiarioRenomeacoes(caminho_diario).iniciar(SCRIPT_PLANO)
+    with ThreadPoolExecutor(max_workers=max(1, trabalhadores)) as executor:
+        for numero, bloco in enumerate(em_blocos(empresas, max(1, empresas_por_commit)), start=1):
+            seqs = {empresa_id: [diario.planejar(numero, item) for item in itens] for empresa_id, itens in bloco}
+            diario.sincronizar()
+
+            futuros = {executor.submit(_executar_empresa, armazenamento, itens): (empresa_id, itens) for empresa_id, itens in bloco}
+            concluidas = []
+            for futuro in as_completed(futuros):
+                empresa_id, itens = futuros[futuro]
+                for seq, item, resultado in zip(seqs[empresa_id], itens, futuro.result()):
+                    diario.concluir(seq, resultado)
+                    estatisticas[resultado] += 1
+                    if resultado in RESULTADOS_CONFIRMAVEIS:
+                        concluidas.append(item)
+            diario.sincronizar()
+
+            with engine.begin() as conn:
+                _confirmar_no_banco(conn, concluidas)
+            diario.confirmar(numero)
+            logging.info(f"Bloco {numero}: {len(bloco)} empresas, {len(concluidas)} renomeações confirmadas.")
+    diario.encerrar()
+    return estatisticas
+
+# Blocos do diário já gravados no banco: a execução pode ter parado entre o commit do bloco e o
+# 'confirmado' no diário. O bloco é uma transação só, então basta que nenhuma das linhas renomeadas
+# continue marcada (razao_social_atualizar = 'S') para ele estar no banco.
+def _blocos_no_banco(engine, itens):
+    t = tabela_empresas_estruturas
+    por_bloco = defaultdict(list)
+    for item in itens:
+        por_bloco[item['bloco']].append(item['id'])
+    marcadas = set()
+    with engine.connect() as conn:
+        for ids in em_blocos(sorted({id_ for ids in por_bloco.values() for id_ in ids}), TAMANHO_LOTE_IN):
+            marcadas.update(conn.execute(
+                select(t.c.id).where(t.c.id.in_(ids), t.c.razao_social_atualizar == 'S')
+            ).scalars())
+    return {bloco for bloco, ids in por_bloco.items() if marcadas.isdisjoint(ids)}
+
+# Recupera uma execução interrompida a partir do diário: as renomeações feitas no disco e não
+# confirmadas são gravadas no banco (padrão) ou, com desfazer=True, desfeitas no disco. Os blocos
+# que já chegaram ao banco não são desfeitos (o disco voltaria sem o banco): só são confirmados.
+def recuperar_diario(engine, armazenamento, caminho_diario, desfazer=False):
+    pendentes = pendencias_diario(caminho_diario)
+    if pendentes is None:
+        return
+    for item in pendentes:
+        # Interrompida entre o rename e a gravação no diário: o disco diz se foi feita
+        if item['resultado'] is None and item['origem'] != item['destino'] \
+                and not armazenamento.existe(item['origem']) and armazenamento.existe(item['destino']):
+            item['resultado'] = 'renomeada'
+    feitas = [item for item in pendentes if item['resultado'] in RESULTADOS_CONFIRMAVEIS]
+
+    diario = DiarioRenomeacoes(caminho_diario).continuar()
+    if desfazer:
+        no_banco = _blocos_no_banco(engine, feitas)
+        for bloco in sorted(no_banco):
+            diario.confirmar(bloco)
+        desfeitas = 0
+        for item in reversed(feitas):
+            if item['resultado'] != 'renomeada' or item['bloco'] in no_banco:
+                continue
+            if armazenamento.existe(item['destino']) and not armazenamento.existe(item['origem']):
+                armazenamento.renomear(item['destino'], item['origem'])
+                logging.info(f"[Estrutura {item['id']}] desfeito: '{item['destino']}' → '{item['origem']}'")
+                desfeitas += 1
+            diario.desfazer(item['seq'])
+        if no_banco:
+            print(f"Diário {caminho_diario}: {len(no_banco)} blocos já gravados no banco foram mantidos")
+        print(f"Diário {caminho_diario}: {desfeitas} renomeações não confirmadas desfeitas no disco")
+    else:
+        with engine.begin() as conn:
+            _confirmar_no_banco(conn, feitas)
+        for bloco in sorted({item['bloco'] for item in pendentes}):
+            diario.confirmar(bloco)
+        print(f"Diário {caminho_diario}: {len(feitas)} renomeações não confirmadas gravadas no banco")
+    diario.encerrar()
+
+# Aplica um plano gravado com --plan exatamente como foi registrado
+def aplicar_plano(caminho_plano, armazenamento=None, caminho_diario=None,
+                  trabalhadores=TRABALHADORES_RENOMEACAO, empresas_por_commit=EMPRESAS_POR_COMMIT, base_path=None):
+    engine = conectar_banco_execucoes()
+    if armazenamento is None:
+        armazenamento = criar_armazenamento(os.getenv("ARQUIVOS_BACKEND"))
+    cabecalho, resumo = validar_plano(
+        caminho_plano, SCRIPT_PLANO, base_path=_base_path(base_path), backend=armazenamento.nome
+    )
+    logging.info(f"Aplicando plano de {cabecalho['criado_em']}: {resumo['contagens']}")
+    caminho_diario = caminho_diario or DIARIO_PADRAO
+
+    def itens_plano():
+        for tipo, entradas in sequencias_plano(caminho_plano):
+            if tipo not in ('renomear', 'marcar'):
+                raise ValueError(f"Tipo de alteração desconhecido no plano: {tipo}")
+            for entrada in entradas:
+                yield dict(entrada, tipo=tipo, criar_pai=entrada.get('criar_pai', False))
+
+    recuperar_diario(engine, armazenamento, caminho_diario)
+    empresas = (
+        (empresa_id, list(itens))
+        for empresa_id, itens in groupby(itens_plano(), key=lambda item: item['empresa_id'])
+    )
+    estatisticas = executar_renomeacoes(engine, armazenamento, empresas, caminho_diario, trabalhadores, empresas_por_commit)
+    print(f"Renomeações: {_relatorio(estatisticas)}")
+    return estatisticas
+
+# Atualiza o banco para uma renomeação de topo, com dois UPDATEs por prefixo em vez de dois por pasta:
+# o caminho_completo das linhas ainda sob a origem troca de prefixo, e as linhas marcadas cujo caminho
+# novo corresponde à troca de prefixo do old_path são desmarcadas. Erros sobem para que o bloco não
+# seja confirmado no diário.
+def _atualizar_subarvore(conn, empresa_id, old_path, origem, destino):
+    ee = tabela_empresas_estruturas
+    if origem != destino:
+        resultado = conn.execute(
+            update(ee)
+            .where(ee.c.empresa_id == empresa_id, _coluna_sob(ee.c.caminho_completo, origem))
+            .values(caminho_completo=literal(destino, String) + func.substr(ee.c.caminho_completo, len(origem) + 1))
+        )
+        if resultado.rowcount:
+            logging.info(f"[Empresa {empresa_id}] {resultado.rowcount} caminhos movidos para {destino}")
+    resultado = conn.execute(
+        update(ee)
+        .where(
+            ee.c.empresa_id == empresa_id,
+            ee.c.razao_social_atualizar == 'S',
+            _coluna_sob(ee.c.old_path, old_path),
+            ee.c.caminho_completo == literal(destino, String) + func.substr(ee.c.old_path, len(old_path) + 1),
+        )
+        .values(old_path=None, razao_social_atualizar='N')
+    )
+    logging.info(f"[Empresa {empresa_id}] {resultado.rowcount} estruturas marcadas como atualizadas.")
+
+def _marcar_empresa(conn, empresa_id):
     # atualiza tabela principal de empresas
-    try:
-        conn.execute(text("""
-            UPDATE WeBotPastasEmpresas
-               SET razao_social_atualizar = 'N'
-             WHERE id = :empresa_id
-        """), {"empresa_id": empresa_id})
-        logging.info(f"[Empresa {empresa_id}] marcado como atualizado em Empresas.")
-    except Exception as e:
-        logging.error(f"[Empresa {empresa_id}] falha ao atualizar Empresas: {e}")
+    conn.execute(text("""
+        UPDATE WeBotPastasEmpresas
+           SET razao_social_atualizar = 'N'
+         WHERE id = :empresa_id
+    """), {"empresa_id": empresa_id})
+    logging.info(f"[Empresa {empresa_id}] marcado como atualizado em Empresas.")
 
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s %(levelname)s: %(message)s"
     )
-    renomear_pastas()
+    parser = argparse.ArgumentParser(description="Renomeia as pastas marcadas com razao_social_atualizar = 'S'.")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), help="Backend de armazenamento (padrão: ARQUIVOS_BACKEND, ntfs no Windows e posix nos demais)")
+    parser.add_argument('--plan', metavar='ARQUIVO', help="Só grava em ARQUIVO (JSONL) as renomeações que seriam feitas, com contagens e custo estimado")
+    parser.add_argument('--aplicar-plano', metavar='ARQUIVO', help="Aplica um plano gravado com --plan, exatamente como planejado")
+    parser.add_argument('--base-path', help="Pasta raiz da árvore, registrada nos planos e inventariada com --inventario (padrão: ARQUIVOS_BASE_PATH ou D:\\Arquivos)")
+    parser.add_argument('--inventario', action='store_true', help="Varre a árvore uma vez no início e responde as verificações de existência em memória")
+    parser.add_argument('--inventario-arquivo', metavar='ARQUIVO', help="Salva o inventário em ARQUIVO e, nas próximas execuções, só relista as pastas alteradas (implica --inventario)")
+    parser.add_argument('--diario', metavar='ARQUIVO', default=DIARIO_PADRAO, help="Diário das renomeações, usado para retomar ou desfazer uma execução interrompida")
+    parser.add_argument('--desfazer', action='store_true', help="Desfaz no disco as renomeações não confirmadas do diário (em vez de gravá-las no banco) e termina")
+    parser.add_argument('--trabalhadores', type=int, default=TRABALHADORES_RENOMEACAO, help="Threads renomeando empresas em paralelo")
+    parser.add_argument('--empresas-por-commit', type=int, default=EMPRESAS_POR_COMMIT, help="Empresas confirmadas no banco por transação")
+    args = parser.parse_args()
+
+    armazenamento = criar_armazenamento(args.backend) if args.backend else None
+    if args.inventario or args.inventario_arquivo:
+        load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
+        raiz = _base_path(args.base_path)
+        armazenamento = preparar_inventario(
+            armazenamento or criar_armazenamento(os.getenv("ARQUIVOS_BACKEND")), raiz, args.inventario_arquivo
+        )
+    if args.desfazer:
+        if args.plan or args.aplicar_plano:
+            parser.error("--desfazer não pode ser combinado com --plan ou --aplicar-plano")
+        recuperar_diario(
+            conectar_banco_execucoes(), armazenamento or criar_armazenamento(os.getenv("ARQUIVOS_BACKEND")),
+            args.diario, desfazer=True
+        )
+    elif args.aplicar_plano:
+        aplicar_plano(args.aplicar_plano, armazenamento, args.diario, args.trabalhadores, args.empresas_por_commit,
+                      args.base_path)
+    else:
+        renomear_pastas(armazenamento, args.plan, args.diario, args.trabalhadores, args.empresas_por_commit, args.base_path)
+    if args.inventario_arquivo:
+        armazenamento.salvar_inventario()
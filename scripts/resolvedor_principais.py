@@ -0,0 +1,116 @@
+import threading
+import time
+
+# Tempo de vida padrão dos SIDs em cache (grupos encontrados / não encontrados)
+TTL_PADRAO = 15 * 60
+TTL_NEGATIVO_PADRAO = 60
+
+# ERROR_NONE_MAPPED: o nome não corresponde a nenhuma conta/grupo
+ERRO_NOME_NAO_MAPEADO = 1332
+
+
+class ResolvedorPrincipais:
+    """Interface: converte o nome de um grupo no seu SID (ou None se não existir)."""
+
+    def resolver(self, nome):
+        raise NotImplementedError
+
+    def existe(self, nome):
+        return self.resolver(nome) is not None
+
+
+class ResolvedorWindows(ResolvedorPrincipais):
+    """Resolve nomes no controlador de domínio via LookupAccountName."""
+
+    def resolver(self, nome):
+        import win32security
+
+        try:
+            sid, dominio, tipo = win32security.LookupAccountName(None, nome)
+            return sid
+        except win32security.error as e:
+            if e.winerror == ERRO_NOME_NAO_MAPEADO:
+                return None
+            raise
+
+
+class ResolvedorPosix(ResolvedorPrincipais):
+    """Resolve grupos do sistema (grp, inclusive via sssd/winbind) no SID Unix S-1-22-2-<gid>."""
+
+    def resolver(self, nome):
+        import grp
+
+        try:
+            return f"S-1-22-2-{grp.getgrnam(nome).gr_gid}"
+        except KeyError:
+            return None
+
+
+class ResolvedorFalso(ResolvedorPrincipais):
+    """Resolvedor em memória para testes e benchmarks fora do Windows."""
+
+    def __init__(self, grupos=(), latencia=0.0, aceitar_qualquer=False):
+        self.sids = {}
+        for nome in grupos:
+            self.adicionar(nome)
+        self.latencia = latencia
+        self.aceitar_qualquer = aceitar_qualquer
+        self.consultas = 0
+        self._lock = threading.Lock()
+
+    def adicionar(self, nome):
+        return self.sids.setdefault(nome, f"S-1-5-21-0-0-0-{1000 + len(self.sids)}")
+
+    def resolver(self, nome):
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            self.consultas += 1
+            if self.aceitar_qualquer:
+                return self.adicionar(nome)
+            return self.sids.get(nome)
+
+
+class CacheResolvedor(ResolvedorPrincipais):
+    """
+    Memoriza as resoluções de outro resolvedor por um tempo limitado.
+
+    Grupos inexistentes também ficam em cache (``ttl_negativo``), evitando
+    repetir a consulta ao domínio para cada pasta.
+    """
+
+    def __init__(self, resolvedor, ttl=TTL_PADRAO, ttl_negativo=TTL_NEGATIVO_PADRAO, relogio=time.monotonic):
+        self.resolvedor = resolvedor
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.relogio = relogio
+        self.acertos = 0
+        self.falhas = 0
+        self.negativos = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def resolver(self, nome):
+        agora = self.relogio()
+        with self._lock:
+            entrada = self._cache.get(nome)
+            if entrada is not None and entrada[1] > agora:
+                self.acertos += 1
+                return entrada[0]
+            self.falhas += 1
+
+        sid = self.resolvedor.resolver(nome)
+        with self._lock:
+            if sid is None:
+                self.negativos += 1
+                self._cache[nome] = (None, agora + self.ttl_negativo)
+            else:
+                self._cache[nome] = (sid, agora + self.ttl)
+        return sid
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def relatorio(self):
+        return f"{self.acertos} acertos, {self.falhas} consultas ao resolvedor ({self.negativos} grupos inexistentes)"
@@ -1,10 +1,17 @@
 from fastapi import FastAPI, HTTPException
-from sqlalchemy import create_engine, MetaData, Table, select, update
+from sqlalchemy import create_engine, select
 from typing import List, Optional
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+import sys
+from esquema import obter_esquema
+
+# Permite importar a fila de trabalho compartilhada com os scripts de geração
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+from fila_trabalho import TIPO_FILA_ESTRUTURA, criar_tabela_fila, enfileirar_na_transacao
+from hierarquia_estruturas import consulta_ancestrais, consulta_subarvore, criar_tabela_hierarquia, inserir_na_hierarquia
 
 app = FastAPI()
 
@@ -19,19 +26,24 @@ if not DATABASE_URI:
 # Configuração da conexão com o banco de dados
 
 engine = create_engine(DATABASE_URI, echo=False)
-metadata = MetaData()
 
-# Reflete as tabelas existentes no banco de dados
-Estruturas = Table("WeBotPastasEstruturas", metadata, autoload_with=engine)
-Pastas = Table("WeBotPastasPastas", metadata, autoload_with=engine)
-Permissoes = Table("WeBotPastasPermissoes", metadata, autoload_with=engine)
+# Reflete as tabelas existentes no banco de dados (uma única vez, compartilhado com os scripts)
+esquema = obter_esquema(engine)
+Estruturas = esquema.estruturas
+Pastas = esquema.pastas
+Permissoes = esquema.permissoes
 
 # Novas tabelas para consulta
-Grupos = Table("WeBotPastasgrupos", metadata, autoload_with=engine)
-TiposPermissao = Table("WeBotPastastipos_permissao", metadata, autoload_with=engine)
+Grupos = esquema.grupos
+TiposPermissao = esquema.tipos_permissao
 
 # >>> Adicionando reflexão da tabela WeBotPastasEmpresas
-Empresas = Table("WeBotPastasEmpresas", metadata, autoload_with=engine)
+Empresas = esquema.empresas
+
+# Fila onde as estruturas automáticas novas aguardam a replicação para as empresas
+criar_tabela_fila(engine)
+# Hierarquia (closure table) das estruturas, mantida pelos endpoints de escrita
+criar_tabela_hierarquia(engine, Estruturas)
 
 # Modelos Pydantic existentes
 
@@ -63,17 +75,23 @@ class EstruturaPermissaoCreate(BaseModel):
 
 # Endpoints já implementados
 
+# Com raiz_id, só a subárvore da estrutura é carregada (uma consulta pela hierarquia)
 @app.get("/arvore", response_model=List[FolderNode])
-def get_arvore():
+def get_arvore(raiz_id: Optional[int] = None):
     with engine.connect() as conn:
-        stmt = select(
-            Estruturas.c.id,
-            Estruturas.c.pai_id,
-            Pastas.c.nomepasta
-        ).select_from(
-            Estruturas.join(Pastas, Estruturas.c.WeBotPastas_pasta_id == Pastas.c.id)
-        )
+        if raiz_id is not None:
+            stmt = consulta_subarvore(esquema, raiz_id)
+        else:
+            stmt = select(
+                Estruturas.c.id,
+                Estruturas.c.pai_id,
+                Pastas.c.nomepasta
+            ).select_from(
+                Estruturas.join(Pastas, Estruturas.c.WeBotPastas_pasta_id == Pastas.c.id)
+            )
         result = conn.execute(stmt).fetchall()
+    if raiz_id is not None and not result:
+        raise HTTPException(status_code=404, detail=f"Estrutura {raiz_id} não encontrada")
 
     nodes = {}
     for row in result:
@@ -95,6 +113,20 @@ def get_arvore():
                 tree.append(node)
     return tree
 
+# Modelo para um nível do caminho de uma estrutura
+class CaminhoItem(BaseModel):
+    id: int
+    nomepasta: Optional[str] = None
+
+# Caminho de uma estrutura, da raiz até ela, em uma consulta pela hierarquia
+@app.get("/estruturas/{estrutura_id}/caminho", response_model=List[CaminhoItem])
+def get_caminho_estrutura(estrutura_id: int):
+    with engine.connect() as conn:
+        result = conn.execute(consulta_ancestrais(esquema, [estrutura_id])).fetchall()
+    if not result:
+        raise HTTPException(status_code=404, detail=f"Estrutura {estrutura_id} não encontrada")
+    return [{"id": row.ancestral_id, "nomepasta": row.nomepasta} for row in result]
+
 @app.post("/estrutura-permissao", status_code=201)
 def create_estrutura_permissao(data: EstruturaPermissaoCreate):
     try:
@@ -109,6 +141,7 @@ def create_estrutura_permissao(data: EstruturaPermissaoCreate):
             )
             result = conn.execute(stmt_estruturas)
             estrutura_id = result.inserted_primary_key[0]
+            inserir_na_hierarquia(conn, estrutura_id, data.pai_id)
 
             # Inserir permissões associadas
             for mapping in data.permissoes:
@@ -120,10 +153,10 @@ def create_estrutura_permissao(data: EstruturaPermissaoCreate):
                     )
                     conn.execute(stmt_permissoes)
 
-            # >>> Atualizar a tabela WeBotPastasEmpresas se auto == 'S'
-            if data.auto == 'S':
-                stmt_update_empresas = update(Empresas).values(gerado='N')
-                conn.execute(stmt_update_empresas)
+            # >>> Estrutura automática replicada para as empresas existentes: enfileira só esta estrutura
+            # (a geração cria as linhas, pastas e ACLs abaixo das pastas pai de cada empresa)
+            if data.auto == 'S' and data.replicar_para_empresas:
+                enfileirar_na_transacao(conn, TIPO_FILA_ESTRUTURA, estrutura_id)
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao criar registros: {e}")
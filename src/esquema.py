@@ -0,0 +1,41 @@
+import threading
+
+from sqlalchemy import MetaData
+
+# Tabelas usadas pelos scripts e pela API (atributo -> nome no banco)
+TABELAS = {
+    'estruturas': 'WeBotPastasEstruturas',
+    'pastas': 'WeBotPastasPastas',
+    'empresas': 'WeBotPastasEmpresas',
+    'empresas_estruturas': 'WeBotPastasEmpresasEstruturas',
+    'permissoes': 'WeBotPastasPermissoes',
+    'tipos_permissao': 'WeBotPastastipos_permissao',
+    'grupos': 'WeBotPastasgrupos',
+}
+
+
+class Esquema:
+    """Tabelas refletidas uma única vez por banco e reutilizadas em todo o processo."""
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+        for atributo, nome in TABELAS.items():
+            setattr(self, atributo, metadata.tables[nome])
+
+
+_esquemas = {}
+_lock = threading.Lock()
+
+
+# Função para obter o esquema do banco, refletindo apenas na primeira chamada
+def obter_esquema(engine):
+    chave = engine.url.render_as_string(hide_password=False)
+    esquema = _esquemas.get(chave)
+    if esquema is None:
+        with _lock:
+            esquema = _esquemas.get(chave)
+            if esquema is None:
+                metadata = MetaData()
+                metadata.reflect(bind=engine, only=list(TABELAS.values()))
+                esquema = _esquemas[chave] = Esquema(metadata)
+    return esquema
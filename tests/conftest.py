@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os scripts importam uns aos outros pelo nome (são executados de dentro de scripts/)
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
@@ -0,0 +1,88 @@
+import errno
+import os
+
+import pytest
+
+from armazenamento import ArmazenamentoMemoria, ArmazenamentoPosix, criar_armazenamento
+from construtor_acl import HERANCA, INHERITED_ACE
+
+LEITURA = 0x1
+ESCRITA = 0x3
+
+
+def _suporta_xattr(pasta):
+    try:
+        os.setxattr(pasta, 'user.teste', b'1')
+    except OSError as e:
+        if e.errno in (errno.ENOTSUP, getattr(errno, 'EOPNOTSUPP', errno.ENOTSUP)):
+            return False
+        raise
+    return True
+
+
+@pytest.fixture(params=['memoria', 'posix'])
+def backend(request, tmp_path):
+    if request.param == 'memoria':
+        return ArmazenamentoMemoria(), os.path.join(os.sep, 'arquivos')
+    if not hasattr(os, 'setxattr') or not _suporta_xattr(tmp_path):
+        pytest.skip("Sistema de arquivos sem atributos estendidos")
+    raiz = str(tmp_path / 'arquivos')
+    return ArmazenamentoPosix(), raiz
+
+
+def test_criar_pasta_cria_os_pais_ausentes(backend):
+    armazenamento, raiz = backend
+    caminho = os.path.join(raiz, 'Empresa', 'Fiscal', '2026')
+
+    assert armazenamento.criar_pasta(caminho)
+    assert armazenamento.existe(caminho) and armazenamento.existe(os.path.join(raiz, 'Empresa'))
+    assert not armazenamento.criar_pasta(caminho)
+    assert [entrada.nome for entrada in armazenamento.listar(os.path.join(raiz, 'Empresa'))] == ['Fiscal']
+    assert armazenamento.operacoes['criar_pasta'] == 2
+
+
+def test_renomear_leva_a_subarvore(backend):
+    armazenamento, raiz = backend
+    armazenamento.criar_pasta(os.path.join(raiz, 'A', 'Fiscal', '2026'))
+
+    armazenamento.renomear(os.path.join(raiz, 'A'), os.path.join(raiz, 'B'))
+
+    assert not armazenamento.existe(os.path.join(raiz, 'A'))
+    assert armazenamento.existe(os.path.join(raiz, 'B', 'Fiscal', '2026'))
+    with pytest.raises(FileNotFoundError):
+        armazenamento.renomear(os.path.join(raiz, 'A'), os.path.join(raiz, 'C'))
+
+
+def test_subpastas_novas_herdam_a_acl_do_pai(backend):
+    armazenamento, raiz = backend
+    empresa = os.path.join(raiz, 'Empresa')
+    armazenamento.criar_pasta(empresa)
+    armazenamento.gravar_acl(empresa, [(HERANCA, ESCRITA, 'S-fiscal'), (0, LEITURA, 'S-so-aqui')])
+
+    armazenamento.criar_pasta(os.path.join(empresa, 'Fiscal', '2026'))
+
+    assert armazenamento.ler_acl(os.path.join(empresa, 'Fiscal', '2026')) == [(HERANCA | INHERITED_ACE, ESCRITA, 'S-fiscal')]
+
+
+def test_propagar_repassa_a_acl_as_subpastas_existentes():
+    armazenamento = ArmazenamentoMemoria()
+    empresa = os.path.join(os.sep, 'arquivos', 'Empresa')
+    fiscal = os.path.join(empresa, 'Fiscal')
+    protegida = os.path.join(empresa, 'Protegida')
+    for caminho in (os.path.join(fiscal, '2026'), protegida):
+        armazenamento.criar_pasta(caminho)
+    armazenamento.gravar_acl(fiscal, [(0, LEITURA, 'S-explicita')])
+    armazenamento.gravar_acl(protegida, [(HERANCA, LEITURA, 'S-protegida')], propagar=True)
+
+    armazenamento.gravar_acl(empresa, [(HERANCA, ESCRITA, 'S-fiscal')], propagar=True)
+
+    herdada = (HERANCA | INHERITED_ACE, ESCRITA, 'S-fiscal')
+    assert armazenamento.ler_acl(fiscal) == [(0, LEITURA, 'S-explicita'), herdada]
+    assert armazenamento.ler_acl(os.path.join(fiscal, '2026')) == [herdada]
+    # Pastas com ACL protegida não recebem a herança
+    assert armazenamento.ler_acl(protegida) == [(HERANCA, LEITURA, 'S-protegida')]
+
+
+def test_backend_desconhecido():
+    with pytest.raises(ValueError):
+        criar_armazenamento('nfs')
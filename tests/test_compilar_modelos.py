@@ -0,0 +1,119 @@
+import os
+from types import SimpleNamespace
+
+from indice_estruturas import IndiceEstruturas, limpar_nome_diretorio
+from modelo_estruturas import compilar_modelos
+
+BASE_PATH = os.path.join(os.sep, 'arquivos')
+EMPRESAS = ['Empresa A', ' Empresa B\r\n']
+
+PASTAS = {
+    1: 'Arquivo Digital', 2: 'Empresas', 102: 'AutoPastaWebot - Empresas', 4: 'Fiscal',
+    114: 'AutoPastaWebot - ANO', 115: 'AutoPastaWebot - MÊS', 7: 'Notas', 8: 'RH',
+}
+# id: (pai_id, id da pasta, auto)
+ESTRUTURAS = {
+    1: (None, 1, 'N'),
+    2: (1, 2, 'N'),
+    3: (2, 102, 'S'),
+    4: (3, 4, 'S'),
+    5: (4, 114, 'S'),
+    6: (5, 115, 'S'),
+    7: (6, 7, 'S'),
+    8: (3, 8, 'S'),
+    9: (8, 114, 'S'),
+    10: (3, 999, 'S'),  # pasta sem nome: pulada
+}
+
+
+def _dados():
+    estruturas_data = [
+        SimpleNamespace(id=id_, pai_id=pai_id, WeBotPastas_pasta_id=pasta_id, auto=auto)
+        for id_, (pai_id, pasta_id, auto) in ESTRUTURAS.items()
+    ]
+    pastas_data = [SimpleNamespace(id=id_, nomepasta=nome) for id_, nome in PASTAS.items()]
+    return estruturas_data, pastas_data
+
+
+# Geração original: recursão por empresa sobre as listas, com as buscas lineares e a
+# substituição de ANO/MÊS no caminho inteiro
+def _linhas_recursao_original(estruturas_data, pastas_data, empresa_nome, anos):
+    def encontrar_nome_pasta(id_pasta):
+        for pasta in pastas_data:
+            if pasta.id == id_pasta:
+                return limpar_nome_diretorio(pasta.nomepasta)
+        return None
+
+    def construir_caminho(estrutura):
+        partes_caminho = []
+        estrutura_atual = estrutura
+        while estrutura_atual and estrutura_atual.pai_id is not None:
+            nome_pasta = encontrar_nome_pasta(estrutura_atual.WeBotPastas_pasta_id)
+            if nome_pasta and nome_pasta != 'AutoPastaWebot - Empresas':
+                partes_caminho.insert(0, nome_pasta)
+            estrutura_atual = next((e for e in estruturas_data if e.id == estrutura_atual.pai_id), None)
+        if estrutura_atual:
+            nome_pasta = encontrar_nome_pasta(estrutura_atual.WeBotPastas_pasta_id)
+            if nome_pasta and nome_pasta != 'AutoPastaWebot - Empresas':
+                partes_caminho.insert(0, nome_pasta)
+        if 'Empresas' not in partes_caminho:
+            partes_caminho.insert(0, 'Empresas')
+        if 'Arquivo Digital' not in partes_caminho:
+            partes_caminho.insert(0, 'Arquivo Digital')
+        partes_caminho.insert(partes_caminho.index('Empresas') + 1, empresa_nome)
+        return os.path.join(BASE_PATH, *partes_caminho)
+
+    linhas = []
+
+    def inserir(estrutura_id, nomepasta, caminho, nivel):
+        if (estrutura_id, nomepasta, caminho, nivel) not in linhas:
+            linhas.append((estrutura_id, nomepasta, caminho, nivel))
+
+    def criar_subpastas(estrutura_pai, caminho_pai, nivel_atual, visitados):
+        if estrutura_pai.id in visitados:
+            return
+        visitados.add(estrutura_pai.id)
+        for child in estruturas_data:
+            if child.pai_id != estrutura_pai.id:
+                continue
+            nome = encontrar_nome_pasta(child.WeBotPastas_pasta_id)
+            if not nome:
+                continue
+            child_path = os.path.join(caminho_pai, nome)
+            if child.WeBotPastas_pasta_id == 114:
+                reais = [child_path.replace('AutoPastaWebot - ANO', ano) for ano in anos]
+            elif child.WeBotPastas_pasta_id == 115:
+                reais = [child_path.replace('AutoPastaWebot - MÊS', f'{mes:02d}') for mes in range(1, 13)]
+            else:
+                reais = [child_path]
+            for caminho in reais:
+                inserir(child.id, nome, caminho, nivel_atual + 1)
+                criar_subpastas(child, caminho, nivel_atual + 1, visitados.copy())
+
+    for estrutura in estruturas_data:
+        if estrutura.auto == 'S' and estrutura.WeBotPastas_pasta_id == 102:
+            caminho_pai = construir_caminho(estrutura)
+            inserir(estrutura.id, empresa_nome, caminho_pai, 1)
+            criar_subpastas(estrutura, caminho_pai, 1, set())
+    return linhas
+
+
+def test_modelo_compilado_gera_as_mesmas_linhas_da_recursao_original():
+    estruturas_data, pastas_data = _dados()
+    anos = ['2025', '2026']
+    modelos = compilar_modelos(IndiceEstruturas(estruturas_data, pastas_data), anos=anos)
+
+    for nomepasta in EMPRESAS:
+        empresa_nome = limpar_nome_diretorio(nomepasta)
+        compiladas = [
+            tuple(linha)
+            for modelo in modelos
+            for linha in modelo.aplicar(BASE_PATH, empresa_nome)
+        ]
+        assert compiladas == _linhas_recursao_original(estruturas_data, pastas_data, empresa_nome, anos)
+
+    # Raiz + Fiscal + 2 anos x (1 + 12 meses x 2) + RH + 2 anos
+    assert len(compiladas) == 1 + 1 + 2 * (1 + 12 * 2) + 1 + 2
+    assert os.path.join(BASE_PATH, 'Arquivo Digital', 'Empresas', 'Empresa B', 'Fiscal', '2026', '12', 'Notas') in {
+        caminho for _, _, caminho, _ in compiladas
+    }
@@ -0,0 +1,57 @@
+import os
+
+from armazenamento import ArmazenamentoMemoria
+from construtor_acl import HERANCA, EstatisticasAcl, aplicar_dacl, calcular_dacl, conferir_dacl, dacl_confere
+
+LEITURA = 0x1
+ESCRITA = 0x3
+PASTA = os.path.join(os.sep, 'arquivos', 'A')
+
+
+def test_cada_regra_substitui_as_entradas_do_mesmo_sid():
+    existentes = [(LEITURA, 'S-admin'), (LEITURA, 'S-fiscal'), (ESCRITA, 'S-rh')]
+
+    assert calcular_dacl(existentes, [('S-fiscal', ESCRITA), ('S-novo', LEITURA)]) == [
+        (LEITURA, 'S-admin'), (ESCRITA, 'S-rh'), (ESCRITA, 'S-fiscal'), (LEITURA, 'S-novo')
+    ]
+    assert calcular_dacl(existentes, [('S-fiscal', ESCRITA)], manter_existentes=False) == [(ESCRITA, 'S-fiscal')]
+
+
+def test_dacl_inalterada_e_reconhecida():
+    regras = [('S-fiscal', ESCRITA), ('S-rh', LEITURA)]
+    atuais = [(HERANCA, ESCRITA, 'S-fiscal'), (HERANCA, LEITURA, 'S-rh'), (HERANCA, LEITURA, 'S-admin')]
+
+    assert dacl_confere(atuais, regras)
+    # Entradas a mais só são aceitas mantendo as existentes
+    assert not dacl_confere(atuais, regras, manter_existentes=False)
+    assert dacl_confere(atuais[:2], regras, manter_existentes=False)
+    # Máscara diferente, herança ausente ou SID repetido exigem gravação
+    assert not dacl_confere([(HERANCA, LEITURA, 'S-fiscal'), atuais[1]], regras)
+    assert not dacl_confere([(0, ESCRITA, 'S-fiscal'), atuais[1]], regras)
+    assert not dacl_confere(atuais + [(HERANCA, LEITURA, 'S-rh')], regras)
+
+
+def test_aplicar_dacl_grava_uma_unica_vez():
+    armazenamento = ArmazenamentoMemoria()
+    armazenamento.criar_pasta(PASTA)
+    armazenamento.gravar_acl(PASTA, [(HERANCA, LEITURA, 'S-admin'), (HERANCA, LEITURA, 'S-fiscal')])
+    armazenamento.operacoes.clear()
+    estatisticas = EstatisticasAcl()
+    regras = [('S-fiscal', ESCRITA), ('S-rh', LEITURA), ('S-contabil', ESCRITA)]
+
+    assert aplicar_dacl(armazenamento, PASTA, regras, estatisticas=estatisticas)
+
+    assert armazenamento.operacoes == {'ler_acl': 1, 'gravar_acl': 1}
+    assert (estatisticas.leituras, estatisticas.escritas, estatisticas.falhas) == (1, 1, 0)
+    assert armazenamento.ler_acl(PASTA) == [
+        (HERANCA, LEITURA, 'S-admin'), (HERANCA, ESCRITA, 'S-fiscal'),
+        (HERANCA, LEITURA, 'S-rh'), (HERANCA, ESCRITA, 'S-contabil'),
+    ]
+    assert conferir_dacl(armazenamento, PASTA, regras)
+
+
+def test_falha_na_gravacao_e_contada():
+    estatisticas = EstatisticasAcl()
+
+    assert not aplicar_dacl(ArmazenamentoMemoria(), PASTA, [('S-fiscal', ESCRITA)], estatisticas=estatisticas)
+    assert estatisticas.falhas == 1 and estatisticas.escritas == 0
@@ -0,0 +1,50 @@
+from diario_renomeacoes import DiarioRenomeacoes, pendencias_diario
+
+
+def _item(linha_id, origem, destino):
+    return {'id': linha_id, 'empresa_id': 1, 'old_path': origem, 'origem': origem, 'destino': destino}
+
+
+def test_diario_encerrado_nao_tem_pendencias(tmp_path):
+    caminho = str(tmp_path / 'diario.jsonl')
+    diario = DiarioRenomeacoes(caminho).iniciar('teste')
+    seq = diario.planejar(1, _item(10, '/a', '/b'))
+    diario.concluir(seq, 'renomeada')
+    diario.confirmar(1)
+    diario.encerrar()
+
+    assert pendencias_diario(caminho) is None
+
+
+def test_pendencias_sao_os_blocos_nao_confirmados(tmp_path):
+    caminho = str(tmp_path / 'diario.jsonl')
+    diario = DiarioRenomeacoes(caminho).iniciar('teste')
+    seq1 = diario.planejar(1, _item(10, '/a', '/b'))
+    diario.concluir(seq1, 'renomeada')
+    diario.confirmar(1)
+    seq2 = diario.planejar(2, _item(20, '/c', '/d'))
+    diario.concluir(seq2, 'renomeada')
+    diario.planejar(2, _item(30, '/e', '/f'))
+    diario.sincronizar()
+
+    pendencias = pendencias_diario(caminho)
+    assert [(item['seq'], item['resultado']) for item in pendencias] == [(2, 'renomeada'), (3, None)]
+
+
+def test_linha_cortada_nao_esconde_entradas_seguintes(tmp_path):
+    caminho = str(tmp_path / 'diario.jsonl')
+    diario = DiarioRenomeacoes(caminho).iniciar('teste')
+    diario.planejar(1, _item(10, '/a', '/b'))
+    diario.sincronizar()
+    # Interrupção no meio da gravação de uma entrada
+    diario._arquivo.write('{"tipo_entrada": "conclu')
+    diario._arquivo.close()
+
+    assert [item['seq'] for item in pendencias_diario(caminho)] == [1]
+
+    # A recuperação desfaz a renomeação e encerra o diário
+    diario = DiarioRenomeacoes(caminho).continuar()
+    diario.desfazer(1)
+    assert pendencias_diario(caminho) == []
+    diario.encerrar()
+    assert pendencias_diario(caminho) is None
@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from fila_trabalho import (
+    MAX_TENTATIVAS, concluir, criar_tabela_fila, enfileirar, fila_trabalho, liberar, manter_reserva, reservar
+)
+
+TIPO = 'teste'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Banco em arquivo: a renovação em segundo plano usa outra conexão
+    engine = create_engine(f"sqlite:///{tmp_path / 'fila.sqlite'}")
+    criar_tabela_fila(engine)
+    yield engine
+    engine.dispose()
+
+
+def _estados(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(fila_trabalho.c.chave, fila_trabalho.c.estado)).all())
+
+
+def test_cada_item_tem_um_so_dono(engine):
+    enfileirar(engine, TIPO, [1, 2, 3])
+
+    _, primeiras = reservar(engine, TIPO, 'a', 2)
+    _, restantes = reservar(engine, TIPO, 'b', 2)
+
+    assert primeiras == [1, 2]
+    assert restantes == [3]
+    assert reservar(engine, TIPO, 'c', 2)[1] == []
+
+
+def test_concluir_e_reenfileirar(engine):
+    enfileirar(engine, TIPO, [1, 2])
+    token, chaves = reservar(engine, TIPO, 'a', 10)
+    with engine.begin() as conn:
+        assert concluir(conn, token) == len(chaves)
+    assert _estados(engine) == {1: 'C', 2: 'C'}
+
+    # Itens concluídos voltam a ficar pendentes, com as tentativas zeradas
+    assert enfileirar(engine, TIPO, [2, 3]) == 2
+    assert _estados(engine) == {1: 'C', 2: 'P', 3: 'P'}
+    with engine.connect() as conn:
+        assert conn.execute(select(fila_trabalho.c.tentativas).where(fila_trabalho.c.chave == 2)).scalar() == 0
+
+
+def test_reserva_expirada_e_assumida_por_outro(engine):
+    enfileirar(engine, TIPO, [1])
+    token, _ = reservar(engine, TIPO, 'a', 10, duracao=timedelta(seconds=-1))
+
+    outro, chaves = reservar(engine, TIPO, 'b', 10)
+    assert chaves == [1]
+
+    # O primeiro dono perdeu a reserva: concluir não altera nada
+    with engine.begin() as conn:
+        assert concluir(conn, token) == 0
+        assert concluir(conn, outro) == 1
+
+
+def test_reserva_renovada_durante_o_lote(engine):
+    enfileirar(engine, TIPO, [1])
+    duracao = timedelta(seconds=0.3)
+    token, _ = reservar(engine, TIPO, 'a', 10, duracao=duracao)
+
+    with manter_reserva(engine, token, duracao):
+        time.sleep(0.6)
+        assert reservar(engine, TIPO, 'b', 10)[1] == []
+
+    with engine.begin() as conn:
+        assert concluir(conn, token) == 1
+
+
+def test_liberar_devolve_o_lote_e_marca_falhas_apos_max_tentativas(engine):
+    enfileirar(engine, TIPO, [1])
+    for _ in range(MAX_TENTATIVAS - 1):
+        token, chaves = reservar(engine, TIPO, 'a', 10)
+        assert chaves == [1]
+        liberar(engine, token)
+        assert _estados(engine) == {1: 'P'}
+
+    token, _ = reservar(engine, TIPO, 'a', 10)
+    liberar(engine, token)
+    assert _estados(engine) == {1: 'F'}
+    assert reservar(engine, TIPO, 'a', 10)[1] == []
+
+
+def test_reserva_expirada_demais_vira_falha(engine):
+    enfileirar(engine, TIPO, [1])
+    for _ in range(MAX_TENTATIVAS):
+        assert reservar(engine, TIPO, 'a', 10, duracao=timedelta(seconds=-1))[1] == [1]
+
+    assert reservar(engine, TIPO, 'a', 10)[1] == []
+    assert _estados(engine) == {1: 'F'}
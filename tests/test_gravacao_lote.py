@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select
+
+from gravacao_lote import em_blocos, ler_por_chave
+
+
+def test_em_blocos_consome_a_entrada_aos_poucos():
+    lidos = []
+
+    def gerador():
+        for numero in range(7):
+            lidos.append(numero)
+            yield numero
+
+    blocos = em_blocos(gerador(), 3)
+    assert next(blocos) == [0, 1, 2]
+    assert lidos == [0, 1, 2]
+    assert list(blocos) == [[3, 4, 5], [6]]
+
+
+def test_em_blocos_de_lista_vazia():
+    assert list(em_blocos([], 3)) == []
+
+
+def test_ler_por_chave_pagina_pela_chave_composta():
+    metadata = MetaData()
+    linhas = Table('linhas', metadata, Column('id', Integer, primary_key=True), Column('nivel', Integer))
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(linhas), [{'id': i, 'nivel': 2 - i % 3} for i in range(1, 11)])
+    consulta = select(linhas.c.id, linhas.c.nivel)
+    chaves = [linhas.c.nivel, linhas.c.id]
+    ordem = sorted((2 - i % 3, i) for i in range(1, 11))
+
+    blocos = list(ler_por_chave(engine, consulta, chaves, tamanho=3))
+    assert [len(bloco) for bloco in blocos] == [3, 3, 3, 1]
+    assert [(linha.nivel, linha.id) for bloco in blocos for linha in bloco] == ordem
+
+    # Retomada: só as linhas depois da chave informada
+    retomada = ler_por_chave(engine, consulta, chaves, tamanho=3, depois_de=list(ordem[4]))
+    assert [(linha.nivel, linha.id) for bloco in retomada for linha in bloco] == ordem[5:]
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select, update
+
+from hierarquia_estruturas import criar_tabela_hierarquia, hierarquia_estruturas, hierarquia_sincronizada
+
+metadata = MetaData()
+estruturas = Table(
+    'WeBotPastasEstruturas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('pai_id', Integer),
+)
+
+
+def _banco():
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        # 1 → 2 → 3 e 1 → 4
+        conn.execute(insert(estruturas), [
+            {'id': 1, 'pai_id': None}, {'id': 2, 'pai_id': 1}, {'id': 3, 'pai_id': 2}, {'id': 4, 'pai_id': 1},
+        ])
+    criar_tabela_hierarquia(engine, estruturas)
+    return engine
+
+
+def _ancestrais(conn, estrutura_id):
+    h = hierarquia_estruturas
+    return conn.execute(
+        select(h.c.ancestral_id).where(h.c.descendente_id == estrutura_id).order_by(h.c.profundidade)
+    ).scalars().all()
+
+
+def test_hierarquia_reconstruida_ao_criar():
+    engine = _banco()
+    with engine.connect() as conn:
+        assert hierarquia_sincronizada(conn, estruturas)
+        assert _ancestrais(conn, 3) == [3, 2, 1]
+
+
+def test_pai_alterado_fora_da_api_e_detectado():
+    engine = _banco()
+    with engine.begin() as conn:
+        # Mesmas contagens de nós e ligações, mas 3 passa a ser filho de 4
+        conn.execute(update(estruturas).where(estruturas.c.id == 3).values(pai_id=4))
+        assert not hierarquia_sincronizada(conn, estruturas)
+
+    criar_tabela_hierarquia(engine, estruturas)
+    with engine.connect() as conn:
+        assert hierarquia_sincronizada(conn, estruturas)
+        assert _ancestrais(conn, 3) == [3, 4, 1]
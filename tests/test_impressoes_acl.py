@@ -0,0 +1,67 @@
+from sqlalchemy import create_engine, func, select
+
+from impressoes_acl import RegistroImpressoes, criar_tabela_impressoes, impressao_permissoes, impressoes_acl
+
+REGRAS = [('G-Fiscal', 'S-1', 0x3), ('G-RH', None, 0x1)]
+
+
+def _gravadas(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(impressoes_acl.c.caminho, impressoes_acl.c.impressao)).all())
+
+
+def _gravar(engine, impressoes, caminhos, impressao):
+    with engine.begin() as conn:
+        impressoes.carregar(conn, caminhos)
+        for caminho in caminhos:
+            if impressoes.inalterada(caminho, impressao):
+                impressoes.puladas += 1
+            else:
+                impressoes.registrar(caminho, impressao)
+        impressoes.gravar(conn)
+
+
+def test_impressao_depende_das_regras_e_das_opcoes():
+    base = impressao_permissoes(REGRAS)
+    assert impressao_permissoes(list(REGRAS)) == base
+    assert impressao_permissoes(REGRAS[::-1]) != base
+    assert impressao_permissoes(REGRAS, manter_existentes=False) != base
+    assert impressao_permissoes(REGRAS, propagar=True) != base
+
+
+def test_impressao_inalterada_pula_a_gravacao_e_alterada_regrava():
+    engine = create_engine('sqlite://')
+    criar_tabela_impressoes(engine)
+    antiga = impressao_permissoes(REGRAS)
+    _gravar(engine, RegistroImpressoes(), ['/a', '/b'], antiga)
+
+    # Nova execução com o mesmo plano: nada a gravar
+    impressoes = RegistroImpressoes()
+    _gravar(engine, impressoes, ['/a', '/b'], antiga)
+    assert (impressoes.aplicadas, impressoes.puladas) == (0, 2)
+
+    # Plano alterado: as duas impressões são regravadas, sem linhas duplicadas
+    nova = impressao_permissoes(REGRAS[:1])
+    impressoes = RegistroImpressoes()
+    _gravar(engine, impressoes, ['/a', '/b'], nova)
+    assert (impressoes.aplicadas, impressoes.puladas) == (2, 0)
+    assert _gravadas(engine) == {'/a': nova, '/b': nova}
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(impressoes_acl)).scalar() == 2
+
+
+def test_esquecer_descarta_as_impressoes_consultadas():
+    engine = create_engine('sqlite://')
+    criar_tabela_impressoes(engine)
+    impressao = impressao_permissoes(REGRAS)
+    impressoes = RegistroImpressoes()
+    _gravar(engine, impressoes, ['/a'], impressao)
+    assert impressoes.inalterada('/a', impressao)
+
+    impressoes.esquecer()
+    assert not impressoes.inalterada('/a', impressao)
+
+    # Voltam com a próxima carga, lidas do banco
+    with engine.connect() as conn:
+        impressoes.carregar(conn, ['/a'])
+    assert impressoes.inalterada('/a', impressao)
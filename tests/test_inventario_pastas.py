@@ -0,0 +1,63 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from armazenamento import ArmazenamentoMemoria
+from inventario_pastas import InventarioPastas, preparar_inventario
+
+RAIZ = os.path.join(os.sep, 'arquivos')
+
+
+def _caminho(*partes):
+    return os.path.join(RAIZ, *partes)
+
+
+@pytest.fixture
+def troca_frequente_de_thread():
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(intervalo)
+
+
+def _pastas(inventario):
+    pastas = []
+    pendentes = [((), inventario._arvore)]
+    while pendentes:
+        partes, no = pendentes.pop()
+        for nome, filho in no.items():
+            pastas.append(partes + (nome,))
+            pendentes.append((partes + (nome,), filho))
+    return pastas
+
+
+def test_insercoes_simultaneas_contam_cada_pasta_uma_vez(troca_frequente_de_thread):
+    inventario = InventarioPastas(RAIZ)
+    caminhos = [(f'Empresa{empresa}', 'Fiscal', str(ano)) for empresa in range(20) for ano in range(50)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(inventario.adicionar_partes, caminhos * 4))
+
+    assert inventario.total == len(_pastas(inventario)) == 20 * (2 + 50)
+
+
+def test_criacoes_e_renomeacoes_simultaneas_mantem_o_inventario(troca_frequente_de_thread):
+    memoria = ArmazenamentoMemoria()
+    memoria.criar_pasta(RAIZ)
+    armazenamento = preparar_inventario(memoria, RAIZ)
+
+    def empresa(numero):
+        for ano in range(30):
+            armazenamento.criar_pasta(_caminho(f'A{numero}'))
+            armazenamento.criar_pasta(_caminho(f'A{numero}', str(ano)))
+        armazenamento.renomear(_caminho(f'A{numero}'), _caminho(f'B{numero}'))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(empresa, range(16)))
+
+    inventario = armazenamento.inventario
+    assert inventario.total == len(_pastas(inventario)) == 16 * 31
+    assert all(inventario.contem(_caminho(f'B{numero}', '29')) for numero in range(16))
+    assert not any(inventario.contem(_caminho(f'A{numero}')) for numero in range(16))
@@ -0,0 +1,77 @@
+import os
+
+from armazenamento import ArmazenamentoMemoria
+from materializar_pastas import EstatisticasPastas, agrupar_por_nivel, materializar_pastas
+
+RAIZ = os.path.join(os.sep, 'arquivos')
+
+
+class MemoriaConferida(ArmazenamentoMemoria):
+    """Registra as pastas criadas antes do pai planejado existir."""
+
+    def __init__(self, planejadas, **opcoes):
+        super().__init__(**opcoes)
+        self.planejadas = set(planejadas)
+        self.sem_pai = []
+
+    def criar_pasta(self, caminho):
+        pai = os.path.dirname(caminho)
+        if pai in self.planejadas and not self.existe(pai):
+            self.sem_pai.append(caminho)
+        return super().criar_pasta(caminho)
+
+
+def _planejadas():
+    planejadas = [(RAIZ, 0)]
+    for empresa in range(6):
+        base = os.path.join(RAIZ, f'Empresa{empresa}')
+        planejadas.append((base, 1))
+        for setor in ('Fiscal', 'RH'):
+            planejadas.append((os.path.join(base, setor), 2))
+            planejadas.extend((os.path.join(base, setor, str(ano)), 3) for ano in (2025, 2026))
+    # Fora de ordem e com repetições, como vêm de vários blocos
+    return planejadas[::-1] + planejadas[:5]
+
+
+def test_agrupar_por_nivel_sem_repeticoes():
+    assert agrupar_por_nivel([('b', 2), ('a', 1), ('c', 2), ('b', 2)]) == [['a'], ['b', 'c']]
+
+
+def test_pais_criados_antes_dos_filhos_com_varias_threads():
+    planejadas = _planejadas()
+    armazenamento = MemoriaConferida([caminho for caminho, _ in planejadas], latencia=0.001)
+
+    estatisticas = materializar_pastas(planejadas, armazenamento, trabalhadores=8)
+
+    assert armazenamento.sem_pai == []
+    assert (estatisticas.criadas, estatisticas.existentes, estatisticas.falhas) == (1 + 6 * 7, 0, [])
+    assert all(armazenamento.existe(caminho) for caminho, _ in planejadas)
+
+
+def test_reexecucao_nao_cria_nada_e_acumula_nas_estatisticas():
+    planejadas = _planejadas()
+    armazenamento = ArmazenamentoMemoria()
+    estatisticas = EstatisticasPastas()
+
+    materializar_pastas(planejadas, armazenamento, trabalhadores=8, estatisticas=estatisticas)
+    materializar_pastas(planejadas, armazenamento, trabalhadores=8, estatisticas=estatisticas)
+
+    assert (estatisticas.criadas, estatisticas.existentes, len(estatisticas.falhas)) == (43, 43, 0)
+    assert armazenamento.operacoes['criar_pasta'] == 2 * 43
+
+
+class MemoriaSemPermissao(ArmazenamentoMemoria):
+    def criar_pasta(self, caminho):
+        if os.path.basename(caminho) == 'Negada':
+            raise PermissionError(caminho)
+        return super().criar_pasta(caminho)
+
+
+def test_falha_nao_interrompe_o_lote():
+    estatisticas = materializar_pastas(
+        [(os.path.join(RAIZ, 'A'), 1), (os.path.join(RAIZ, 'Negada'), 1), (os.path.join(RAIZ, 'A', 'B'), 2)],
+        MemoriaSemPermissao(),
+    )
+
+    assert estatisticas.criadas == 2
+    assert [caminho for caminho, _ in estatisticas.falhas] == [os.path.join(RAIZ, 'Negada')]
@@ -0,0 +1,21 @@
+import pytest
+
+from modelo_estruturas import interpretar_periodos
+
+
+def test_um_unico_mes():
+    assert interpretar_periodos('2026-03') == {'2026': ['03']}
+
+
+def test_intervalo_dentro_do_ano():
+    assert interpretar_periodos('2026-01..2026-12') == {'2026': [f'{mes:02d}' for mes in range(1, 13)]}
+
+
+def test_intervalo_atravessando_a_virada():
+    assert interpretar_periodos(' 2025-11 .. 2026-02 ') == {'2025': ['11', '12'], '2026': ['01', '02']}
+
+
+@pytest.mark.parametrize('texto', ['2026', '2026-13', '2026-00..2026-02', '2026-05..2026-01', 'abc', '2026-01..'])
+def test_periodos_invalidos(texto):
+    with pytest.raises(ValueError, match='Período inválido'):
+        interpretar_periodos(texto)
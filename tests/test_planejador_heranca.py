@@ -0,0 +1,75 @@
+import os
+from types import SimpleNamespace
+
+from armazenamento import ArmazenamentoMemoria
+from construtor_acl import INHERITED_ACE, aplicar_dacl
+from indice_estruturas import IndiceEstruturas
+from planejador_heranca import planejar_heranca
+
+LEITURA = 0x1
+ESCRITA = 0x3
+RAIZ = os.path.join(os.sep, 'arquivos')
+
+# id: (pai_id, auto, nome da pasta)
+ESTRUTURAS = {
+    1: (None, 'S', 'Empresa'),
+    2: (1, 'S', 'Fiscal'),
+    3: (2, 'S', 'Notas'),
+    4: (2, 'S', 'Folha'),
+    5: (4, 'S', '2026'),
+    6: (1, 'N', 'Manual'),
+}
+PLANO = {
+    1: [('G-Todos', LEITURA)],
+    3: [('G-Todos', LEITURA)],
+    4: [('G-RH', ESCRITA)],
+    6: [('G-Todos', LEITURA)],
+}
+
+
+def _indice():
+    return IndiceEstruturas(
+        [SimpleNamespace(id=id_, pai_id=pai_id, auto=auto, WeBotPastas_pasta_id=id_)
+         for id_, (pai_id, auto, _) in ESTRUTURAS.items()],
+        [SimpleNamespace(id=id_, nomepasta=nome) for id_, (_, _, nome) in ESTRUTURAS.items()],
+    )
+
+
+def _caminho(estrutura_id):
+    partes = []
+    while estrutura_id is not None:
+        pai_id, _, nome = ESTRUTURAS[estrutura_id]
+        partes.append(nome)
+        estrutura_id = pai_id
+    return os.path.join(RAIZ, *reversed(partes))
+
+
+def test_fronteiras_so_onde_a_permissao_efetiva_muda():
+    heranca = planejar_heranca(_indice(), PLANO)
+
+    # Raiz, regra nova (4) e passagem de automática para manual (6); 3 repete a regra herdada
+    assert heranca.fronteiras == {1, 4, 6}
+    assert heranca.efetivas[5] == {'G-Todos': LEITURA, 'G-RH': ESCRITA}
+    assert heranca.efetivas[6] == {'G-Todos': LEITURA}
+    assert heranca.precisa_gravar(99)
+
+
+def test_pastas_fora_da_fronteira_ficam_so_com_entradas_herdadas():
+    heranca = planejar_heranca(_indice(), PLANO)
+    armazenamento = ArmazenamentoMemoria()
+    for estrutura_id in ESTRUTURAS:
+        armazenamento.criar_pasta(_caminho(estrutura_id))
+
+    for estrutura_id in ESTRUTURAS:
+        if heranca.decidir(estrutura_id):
+            regras = [(grupo, mascara) for grupo, mascara in PLANO.get(estrutura_id, ())]
+            aplicar_dacl(armazenamento, _caminho(estrutura_id), regras,
+                         manter_existentes=ESTRUTURAS[estrutura_id][1] == 'S', propagar=True)
+
+    assert (heranca.gravacoes, heranca.evitadas) == (3, 3)
+    for estrutura_id in (2, 3, 5):
+        aces = armazenamento.ler_acl(_caminho(estrutura_id))
+        assert aces and all(flags & INHERITED_ACE for flags, _, _ in aces)
+        assert {sid: mascara for _, mascara, sid in aces} == heranca.efetivas[estrutura_id]
+    for estrutura_id in heranca.fronteiras:
+        assert not any(flags & INHERITED_ACE for flags, _, _ in armazenamento.ler_acl(_caminho(estrutura_id)))
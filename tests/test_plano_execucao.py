@@ -0,0 +1,40 @@
+import pytest
+
+from plano_execucao import EscritorPlano, validar_plano
+
+
+def _plano(tmp_path, **parametros):
+    caminho = str(tmp_path / 'plano.jsonl')
+    with EscritorPlano(caminho, 'teste', **parametros) as escritor:
+        escritor.registrar('pasta', caminho='/raiz/a', nivel=2)
+    return caminho
+
+
+def test_plano_aplicado_com_os_mesmos_parametros(tmp_path):
+    caminho = _plano(tmp_path, base_path='/raiz', backend='posix')
+    cabecalho, resumo = validar_plano(caminho, 'teste', base_path='/raiz', backend='posix')
+    assert resumo['contagens'] == {'pasta': 1}
+
+
+@pytest.mark.parametrize('atuais', [
+    {'base_path': '/outra', 'backend': 'posix'},
+    {'base_path': '/raiz', 'backend': 'memoria'},
+])
+def test_plano_de_outra_arvore_e_recusado(tmp_path, atuais):
+    caminho = _plano(tmp_path, base_path='/raiz', backend='posix')
+    with pytest.raises(ValueError, match='gere o plano novamente'):
+        validar_plano(caminho, 'teste', **atuais)
+
+
+def test_plano_sem_o_parametro_e_recusado(tmp_path):
+    caminho = _plano(tmp_path, backend='posix')
+    with pytest.raises(ValueError, match='base_path'):
+        validar_plano(caminho, 'teste', base_path='/raiz', backend='posix')
+
+
+def test_plano_incompleto_e_recusado(tmp_path):
+    caminho = str(tmp_path / 'plano.jsonl')
+    escritor = EscritorPlano(caminho, 'teste', base_path='/raiz')
+    escritor.descartar()
+    with pytest.raises(ValueError, match='incompleto'):
+        validar_plano(caminho, 'teste', base_path='/raiz')
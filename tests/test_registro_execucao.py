@@ -0,0 +1,103 @@
+import socket
+import subprocess
+import sys
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text, update
+
+from registro_execucao import TEMPO_ABANDONO, _agora, execucoes, iniciar_execucao
+
+SCRIPT = 'teste'
+FASE_PREENCHER = 'preencher'
+FASE_CRIAR = 'criar'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'execucoes.sqlite'}")
+    yield engine
+    engine.dispose()
+
+
+def _alterar(engine, execucao, **valores):
+    with engine.begin() as conn:
+        conn.execute(update(execucoes).where(execucoes.c.id == execucao.id).values(**valores))
+
+
+def _pid_encerrado():
+    processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+    processo.wait()
+    return processo.pid
+
+
+def test_cada_fase_retoma_do_proprio_checkpoint(engine):
+    execucao = iniciar_execucao(engine, SCRIPT)
+    with engine.begin() as conn:
+        execucao.avancar(conn, FASE_CRIAR, [2, 50], 10)
+        execucao.avancar(conn, FASE_PREENCHER, 7, 3)
+    execucao.falhar('interrompida')
+
+    retomada = iniciar_execucao(engine, SCRIPT)
+    assert retomada.retomada and retomada.id == execucao.id
+    assert retomada.chave_retomada(FASE_CRIAR) == [2, 50]
+    assert retomada.chave_retomada(FASE_PREENCHER) == 7
+
+    with engine.begin() as conn:
+        retomada.avancar(conn, FASE_CRIAR, [3, 10], 5)
+    assert retomada.processados == 15
+    assert retomada.chave_retomada(FASE_PREENCHER) == 7
+
+
+def test_execucao_com_dono_vivo_nao_e_retomada(engine):
+    # O dono é este processo, ainda rodando
+    execucao = iniciar_execucao(engine, SCRIPT)
+
+    outra = iniciar_execucao(engine, SCRIPT)
+    assert not outra.retomada and outra.id != execucao.id
+
+
+def test_execucao_com_dono_encerrado_e_retomada(engine):
+    execucao = iniciar_execucao(engine, SCRIPT)
+    _alterar(engine, execucao, dono=f"{socket.gethostname()}:{_pid_encerrado()}")
+
+    retomada = iniciar_execucao(engine, SCRIPT)
+    assert retomada.retomada and retomada.id == execucao.id
+
+
+def test_execucao_de_outra_maquina_depende_da_ultima_atualizacao(engine):
+    execucao = iniciar_execucao(engine, SCRIPT)
+    _alterar(engine, execucao, dono='outra-maquina:123', atualizado_em=_agora())
+    assert not iniciar_execucao(engine, SCRIPT).retomada
+
+    execucao = iniciar_execucao(engine, SCRIPT)
+    _alterar(engine, execucao, dono='outra-maquina:123', atualizado_em=_agora() - TEMPO_ABANDONO - timedelta(minutes=1))
+    retomada = iniciar_execucao(engine, SCRIPT)
+    assert retomada.retomada and retomada.id == execucao.id
+
+
+def test_so_retoma_execucao_com_os_mesmos_parametros(engine):
+    reconciliacao = iniciar_execucao(engine, SCRIPT, {'reconciliar': True, 'base_path': '/a'})
+    reconciliacao.falhar('interrompida')
+
+    assert not iniciar_execucao(engine, SCRIPT, {'reconciliar': False, 'base_path': '/a'}).retomada
+    assert not iniciar_execucao(engine, SCRIPT, {'reconciliar': True, 'base_path': '/b'}).retomada
+
+    # A ordem das chaves não importa
+    retomada = iniciar_execucao(engine, SCRIPT, {'base_path': '/a', 'reconciliar': True})
+    assert retomada.retomada and retomada.id == reconciliacao.id
+
+
+def test_tabela_antiga_ganha_a_coluna_parametros(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE {execucoes.name} (id INTEGER PRIMARY KEY, script VARCHAR(100), fase VARCHAR(100), "
+            "ultima_chave VARCHAR(100), processados INTEGER, estado CHAR(1), dono VARCHAR(255), "
+            "iniciado_em DATETIME, atualizado_em DATETIME, erro TEXT)"
+        ))
+        conn.execute(text(f"INSERT INTO {execucoes.name} (script, estado, processados) VALUES ('{SCRIPT}', 'F', 0)"))
+
+    execucao = iniciar_execucao(engine, SCRIPT)
+    assert 'parametros' in {coluna['name'] for coluna in inspect(engine).get_columns(execucoes.name)}
+    # A execução gravada sem parâmetros não é retomada
+    assert not execucao.retomada
@@ -0,0 +1,157 @@
+import os
+from collections import namedtuple
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select
+
+from armazenamento import ArmazenamentoMemoria
+from diario_renomeacoes import DiarioRenomeacoes, pendencias_diario
+from renomear_pastas import _confirmar_no_banco, _renomeacoes_de_topo, recuperar_diario
+
+Linha = namedtuple('Linha', ['id', 'old_path', 'caminho_completo'])
+RAIZ = os.path.join(os.sep, 'Arquivos')
+
+
+def _caminho(*partes):
+    return os.path.join(RAIZ, *partes)
+
+
+def _topo(linhas):
+    return [(linha.id, origem, destino) for linha, _, origem, destino in _renomeacoes_de_topo(linhas)]
+
+
+def test_descendentes_vao_junto_com_a_raiz():
+    linhas = [
+        Linha(3, _caminho('A', 'Fiscal', '2025'), _caminho('B', 'Fiscal', '2025')),
+        Linha(1, _caminho('A'), _caminho('B')),
+        Linha(2, _caminho('A', 'Fiscal'), _caminho('B', 'Fiscal')),
+    ]
+    assert _topo(linhas) == [(1, _caminho('A'), _caminho('B'))]
+
+
+def test_renomeacao_aninhada_parte_do_lugar_apos_o_pai():
+    linhas = [
+        Linha(1, _caminho('A'), _caminho('B')),
+        Linha(2, _caminho('A', 'Fiscal'), _caminho('B', 'Fiscal2')),
+        Linha(3, _caminho('A', 'Fiscal', '2025'), _caminho('B', 'Fiscal2', '2025')),
+    ]
+    assert _topo(linhas) == [
+        (1, _caminho('A'), _caminho('B')),
+        (2, _caminho('B', 'Fiscal'), _caminho('B', 'Fiscal2')),
+    ]
+
+
+def test_pastas_sem_ancestral_marcado_sao_independentes():
+    linhas = [
+        Linha(1, _caminho('A', 'Fiscal'), _caminho('A', 'Fiscal2')),
+        Linha(2, _caminho('A', 'RH'), _caminho('A', 'Pessoal')),
+    ]
+    assert _topo(linhas) == [
+        (1, _caminho('A', 'Fiscal'), _caminho('A', 'Fiscal2')),
+        (2, _caminho('A', 'RH'), _caminho('A', 'Pessoal')),
+    ]
+
+
+metadata = MetaData()
+empresas_estruturas = Table(
+    'WeBotPastasEmpresasEstruturas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('empresa_id', Integer),
+    Column('caminho_completo', String),
+    Column('old_path', String),
+    Column('razao_social_atualizar', String),
+)
+empresas = Table(
+    'WeBotPastasEmpresas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('razao_social_atualizar', String),
+)
+
+
+@pytest.fixture
+def cenario(tmp_path):
+    """Empresa 'A' renomeada para 'B' no disco, com o diário interrompido antes da confirmação no banco."""
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(empresas).values(id=7, razao_social_atualizar='S'))
+        conn.execute(insert(empresas_estruturas), [
+            {'id': 1, 'empresa_id': 7, 'caminho_completo': _caminho('B'), 'old_path': _caminho('A'),
+             'razao_social_atualizar': 'S'},
+            {'id': 2, 'empresa_id': 7, 'caminho_completo': _caminho('B', 'Fiscal'), 'old_path': _caminho('A', 'Fiscal'),
+             'razao_social_atualizar': 'S'},
+        ])
+
+    armazenamento = ArmazenamentoMemoria()
+    for caminho in (RAIZ, _caminho('A'), _caminho('A', 'Fiscal')):
+        armazenamento.criar_pasta(caminho)
+
+    caminho_diario = str(tmp_path / 'diario.jsonl')
+    diario = DiarioRenomeacoes(caminho_diario).iniciar('teste')
+    seq = diario.planejar(1, {'id': 1, 'empresa_id': 7, 'old_path': _caminho('A'),
+                              'origem': _caminho('A'), 'destino': _caminho('B')})
+    diario.sincronizar()
+    armazenamento.renomear(_caminho('A'), _caminho('B'))
+    diario.concluir(seq, 'renomeada')
+    diario.sincronizar()
+    # Interrompida aqui: sem 'confirmado' nem 'fim'
+    diario._arquivo.close()
+    return engine, armazenamento, caminho_diario
+
+
+def _linhas(engine):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(empresas_estruturas.c.caminho_completo, empresas_estruturas.c.razao_social_atualizar)
+            .order_by(empresas_estruturas.c.id)
+        ).all()
+
+
+def test_recuperacao_grava_no_banco_o_que_ja_foi_feito_no_disco(cenario):
+    engine, armazenamento, caminho_diario = cenario
+
+    recuperar_diario(engine, armazenamento, caminho_diario)
+
+    assert _linhas(engine) == [(_caminho('B'), 'N'), (_caminho('B', 'Fiscal'), 'N')]
+    with engine.connect() as conn:
+        assert conn.execute(select(empresas.c.razao_social_atualizar)).scalar() == 'N'
+    assert pendencias_diario(caminho_diario) is None
+
+
+def test_recuperacao_com_desfazer_volta_o_disco(cenario):
+    engine, armazenamento, caminho_diario = cenario
+
+    recuperar_diario(engine, armazenamento, caminho_diario, desfazer=True)
+
+    assert armazenamento.existe(_caminho('A', 'Fiscal')) and not armazenamento.existe(_caminho('B'))
+    assert [marcada for _, marcada in _linhas(engine)] == ['S', 'S']
+    assert pendencias_diario(caminho_diario) is None
+
+
+def test_desfazer_mantem_bloco_ja_gravado_no_banco(cenario):
+    engine, armazenamento, caminho_diario = cenario
+    # Interrompida entre o commit do bloco e o 'confirmado' no diário
+    with engine.begin() as conn:
+        _confirmar_no_banco(conn, [{'empresa_id': 7, 'old_path': _caminho('A'),
+                                    'origem': _caminho('A'), 'destino': _caminho('B')}])
+
+    recuperar_diario(engine, armazenamento, caminho_diario, desfazer=True)
+
+    assert armazenamento.existe(_caminho('B', 'Fiscal')) and not armazenamento.existe(_caminho('A'))
+    assert _linhas(engine) == [(_caminho('B'), 'N'), (_caminho('B', 'Fiscal'), 'N')]
+    assert pendencias_diario(caminho_diario) is None
+
+
+def test_rename_nao_registrado_no_diario_e_deduzido_do_disco(cenario, tmp_path):
+    engine, armazenamento, _ = cenario
+    # Interrompida entre o rename e a gravação de 'concluida'
+    caminho_diario = str(tmp_path / 'sem_conclusao.jsonl')
+    diario = DiarioRenomeacoes(caminho_diario).iniciar('teste')
+    diario.planejar(1, {'id': 1, 'empresa_id': 7, 'old_path': _caminho('A'),
+                        'origem': _caminho('A'), 'destino': _caminho('B')})
+    diario.sincronizar()
+    diario._arquivo.close()
+
+    recuperar_diario(engine, armazenamento, caminho_diario)
+
+    assert _linhas(engine) == [(_caminho('B'), 'N'), (_caminho('B', 'Fiscal'), 'N')]
@@ -0,0 +1,160 @@
+import importlib
+import os
+
+import pytest
+from sqlalchemy import (
+    CHAR, Column, Integer, MetaData, String, Table, Text, create_engine, func, insert, select
+)
+from sqlalchemy.orm import sessionmaker
+
+from fila_trabalho import TIPO_FILA_ESTRUTURA, criar_tabela_fila, enfileirar, fila_trabalho
+
+RAIZ = os.path.join(os.sep, 'arquivos', 'Arquivo Digital', 'Empresas')
+
+metadata = MetaData()
+pastas = Table(
+    'WeBotPastasPastas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('nomepasta', String(255)),
+)
+estruturas = Table(
+    'WeBotPastasEstruturas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('WeBotPastas_pasta_id', Integer),
+    Column('auto', String(10)),
+    Column('gerado', String(10)),
+    Column('pai_id', Integer),
+    Column('replicar_para_empresas', Integer, server_default='0'),
+)
+empresas = Table(
+    'WeBotPastasEmpresas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('nomepasta', String(255)),
+    Column('gerado', String(10)),
+)
+empresas_estruturas = Table(
+    'WeBotPastasEmpresasEstruturas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('empresa_id', Integer),
+    Column('estrutura_id', Integer),
+    Column('nomepasta', String(255)),
+    Column('caminho_completo', String(255)),
+    Column('nivel', Integer),
+    Column('gerado', CHAR(1), server_default='N'),
+    Column('razao_social_atualizar', CHAR(1), server_default='N'),
+    Column('old_path', Text),
+)
+for nome in ('WeBotPastasgrupos', 'WeBotPastastipos_permissao'):
+    Table(nome, metadata, Column('id', Integer, primary_key=True), Column('nome', String(255)))
+Table(
+    'WeBotPastasPermissoes', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('estrutura_id', Integer),
+    Column('grupo_id', Integer),
+    Column('permissao_id', Integer),
+)
+
+
+def _caminho(*partes):
+    return os.path.join(RAIZ, *partes)
+
+
+@pytest.fixture
+def automatica(tmp_path, monkeypatch):
+    """Script automático ligado a um banco SQLite com duas empresas já geradas (a segunda sem Fiscal)."""
+    monkeypatch.setenv('DATABASE_URI', 'sqlite://')
+    monkeypatch.setenv('ARQUIVOS_BACKEND', 'memoria')
+    modulo = importlib.import_module('criar_pastas_automatica_por_empresa')
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'banco.sqlite'}")
+    metadata.create_all(engine)
+    criar_tabela_fila(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(pastas), [
+            {'id': 1, 'nomepasta': 'Arquivo Digital'}, {'id': 2, 'nomepasta': 'Empresas'},
+            {'id': 102, 'nomepasta': 'AutoPastaWebot - Empresas'}, {'id': 3, 'nomepasta': 'Fiscal'},
+            {'id': 6, 'nomepasta': 'Contratos'}, {'id': 7, 'nomepasta': 'Assinados'},
+        ])
+        conn.execute(insert(estruturas), [
+            {'id': 1, 'WeBotPastas_pasta_id': 1, 'auto': 'N', 'pai_id': None},
+            {'id': 2, 'WeBotPastas_pasta_id': 2, 'auto': 'N', 'pai_id': 1},
+            {'id': 3, 'WeBotPastas_pasta_id': 102, 'auto': 'S', 'pai_id': 2},
+            {'id': 4, 'WeBotPastas_pasta_id': 3, 'auto': 'S', 'pai_id': 3},
+        ])
+        conn.execute(insert(empresas), [
+            {'id': 1, 'nomepasta': 'Empresa 1', 'gerado': 'S'},
+            {'id': 2, 'nomepasta': 'Empresa 2', 'gerado': 'S'},
+        ])
+        conn.execute(insert(empresas_estruturas), [
+            {'empresa_id': 1, 'estrutura_id': 3, 'caminho_completo': _caminho('Empresa 1'), 'nivel': 1, 'gerado': 'S'},
+            {'empresa_id': 1, 'estrutura_id': 4, 'caminho_completo': _caminho('Empresa 1', 'Fiscal'), 'nivel': 2, 'gerado': 'S'},
+            {'empresa_id': 2, 'estrutura_id': 3, 'caminho_completo': _caminho('Empresa 2'), 'nivel': 1, 'gerado': 'S'},
+        ])
+
+    monkeypatch.setattr(modulo, 'engine', engine)
+    monkeypatch.setattr(modulo, 'Session', sessionmaker(bind=engine))
+    indice = modulo._recarregar_indice()
+
+    # Estrutura nova (com um filho) criada pela API depois do carregamento do índice
+    with engine.begin() as conn:
+        conn.execute(insert(estruturas), [
+            {'id': 9, 'WeBotPastas_pasta_id': 6, 'auto': 'S', 'pai_id': 4, 'replicar_para_empresas': 1},
+            {'id': 10, 'WeBotPastas_pasta_id': 7, 'auto': 'S', 'pai_id': 9, 'replicar_para_empresas': 0},
+        ])
+    yield modulo, engine, indice
+    engine.dispose()
+
+
+def _linhas(engine):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(empresas_estruturas.c.empresa_id, empresas_estruturas.c.estrutura_id,
+                   empresas_estruturas.c.caminho_completo, empresas_estruturas.c.nivel, empresas_estruturas.c.gerado)
+            .order_by(empresas_estruturas.c.id)
+        ).all()
+
+
+def _estados_fila(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(
+            select(fila_trabalho.c.chave, fila_trabalho.c.estado).where(fila_trabalho.c.tipo == TIPO_FILA_ESTRUTURA)
+        ).all())
+
+
+def test_estrutura_nova_e_replicada_so_abaixo_dos_pais_existentes(automatica):
+    modulo, engine, indice = automatica
+    enfileirar(engine, TIPO_FILA_ESTRUTURA, [9])
+
+    indice_atual = modulo.processar_fila_estruturas(indice)
+
+    assert indice_atual is not indice and 9 in indice_atual.estruturas
+    assert _linhas(engine)[3:] == [
+        (1, 9, _caminho('Empresa 1', 'Fiscal', 'Contratos'), 3, 'N'),
+        (1, 10, _caminho('Empresa 1', 'Fiscal', 'Contratos', 'Assinados'), 4, 'N'),
+    ]
+    assert _estados_fila(engine) == {9: 'C'}
+
+
+def test_segunda_replicacao_nao_insere_nada(automatica):
+    modulo, engine, indice = automatica
+    enfileirar(engine, TIPO_FILA_ESTRUTURA, [9])
+    indice = modulo.processar_fila_estruturas(indice)
+    linhas = _linhas(engine)
+
+    enfileirar(engine, TIPO_FILA_ESTRUTURA, [9])
+    modulo.processar_fila_estruturas(indice)
+
+    assert _linhas(engine) == linhas
+    assert _estados_fila(engine) == {9: 'C'}
+
+
+def test_estrutura_excluida_e_concluida_sem_replicacao(automatica):
+    modulo, engine, indice = automatica
+    enfileirar(engine, TIPO_FILA_ESTRUTURA, [50])
+
+    modulo.processar_fila_estruturas(indice)
+
+    assert len(_linhas(engine)) == 3
+    assert _estados_fila(engine) == {50: 'C'}
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(empresas).where(empresas.c.gerado == 'N')).scalar() == 0
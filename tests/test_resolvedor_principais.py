@@ -0,0 +1,57 @@
+from resolvedor_principais import CacheResolvedor, ResolvedorFalso
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_grupo_em_cache_ate_o_ttl_expirar():
+    falso = ResolvedorFalso(['G-Fiscal'])
+    relogio = Relogio()
+    cache = CacheResolvedor(falso, ttl=10, ttl_negativo=2, relogio=relogio)
+
+    sid = cache.resolver('G-Fiscal')
+    assert sid == falso.sids['G-Fiscal']
+    relogio.agora = 9.9
+    assert cache.resolver('G-Fiscal') == sid
+    assert falso.consultas == 1
+
+    relogio.agora = 10
+    assert cache.resolver('G-Fiscal') == sid
+    assert falso.consultas == 2
+
+
+def test_grupo_inexistente_fica_em_cache_pelo_ttl_negativo():
+    falso = ResolvedorFalso()
+    relogio = Relogio()
+    cache = CacheResolvedor(falso, ttl=10, ttl_negativo=2, relogio=relogio)
+
+    assert cache.resolver('G-Novo') is None
+    assert cache.resolver('G-Novo') is None
+    assert falso.consultas == 1
+
+    # Criado no domínio: passa a ser encontrado quando o cache negativo expira
+    falso.adicionar('G-Novo')
+    relogio.agora = 2
+    assert cache.resolver('G-Novo') == falso.sids['G-Novo']
+    assert falso.consultas == 2
+
+
+def test_contadores_de_acertos_e_consultas():
+    falso = ResolvedorFalso(['G-Fiscal', 'G-RH'])
+    cache = CacheResolvedor(falso, relogio=Relogio())
+
+    for nome in ['G-Fiscal', 'G-RH', 'G-Fiscal', 'G-Inexistente', 'G-RH', 'G-Inexistente']:
+        cache.resolver(nome)
+
+    assert (cache.acertos, cache.falhas, cache.negativos) == (3, 3, 1)
+    assert falso.consultas == 3
+    assert cache.relatorio() == "3 acertos, 3 consultas ao resolvedor (1 grupos inexistentes)"
+
+    cache.limpar()
+    cache.resolver('G-Fiscal')
+    assert falso.consultas == 4